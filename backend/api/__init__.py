@@ -2,7 +2,9 @@
 API endpoints for Healing Bot backend.
 """
 
+from .admin import router as admin_router
 from .chat import router as chat_router
 from .conversations import router as conversations_router
+from .websocket import router as websocket_router
 
-__all__ = ["chat_router", "conversations_router"]
\ No newline at end of file
+__all__ = ["admin_router", "chat_router", "conversations_router", "websocket_router"]
\ No newline at end of file
@@ -0,0 +1,51 @@
+"""
+Admin API endpoints.
+
+Exposes the profiles saved by the slow request profiler
+(PROFILE_SLOW_REQUESTS=1). Stack samples show code paths and arguments, so
+every endpoint needs the ADMIN_TOKEN in the X-Admin-Token header, or, with
+no token configured, a request from localhost.
+"""
+
+import secrets
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from ragbase.config import Config
+
+from ..services import get_slow_request_profiler
+
+LOCAL_HOSTS = {"127.0.0.1", "::1", "localhost"}
+
+
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Allow the configured admin token, or only localhost when there is none"""
+    if Config.Admin.TOKEN:
+        if x_admin_token is None or not secrets.compare_digest(x_admin_token, Config.Admin.TOKEN):
+            raise HTTPException(status_code=401, detail="Invalid or missing admin token")
+    elif request.client is None or request.client.host not in LOCAL_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are only served to localhost")
+
+
+router = APIRouter(prefix="/api/admin", tags=["admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profiles", response_model=List[dict])
+async def list_profiles():
+    """List saved slow-request profiles, newest first"""
+    return get_slow_request_profiler().list_profiles()
+
+
+@router.get("/profiles/{name}")
+async def get_profile(name: str, top: int = Query(None, ge=1, le=500)):
+    """Get a profile in collapsed-stack format, or its `top` hottest functions"""
+    profiler = get_slow_request_profiler()
+    folded = profiler.read_profile(name)
+    if folded is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if top is not None:
+        return profiler.top_frames(folded, top)
+    return PlainTextResponse(folded)
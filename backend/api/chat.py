@@ -5,118 +5,226 @@ Provides endpoints for sending messages and streaming chat responses.
 """
 
 import datetime
-import json
-from typing import List, Optional
+import uuid
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Header, HTTPException, Response
 from fastapi.responses import StreamingResponse
 
+from ragbase.config import Config
+from ragbase.tracing import start_trace
+
 from ..models import ChatRequest, ChatResponse, StreamChunk
-from ..services import get_chat_service, get_conversation_service
+from ..services import (AdmissionRejected, ChatService, get_admission_controller,
+                        get_chat_service, get_conversation_service)
+from ..services.streaming import ChatStream, coalesce_tokens, get_stream_registry
 
 router = APIRouter(prefix="/api/chat", tags=["chat"])
 
+SSE_RETRY_MS = 3000
+
 
 @router.post("/stream")
-async def chat_stream(request: ChatRequest):
-    """Stream chat response"""
+async def chat_stream(
+    request: ChatRequest,
+    last_event_id: Optional[int] = Header(None)
+):
+    """Stream chat response as Server-Sent Events.
+
+    Each event carries an id; a client that lost the connection can resend
+    the same request (same message_id) with a Last-Event-ID header to
+    receive only the events it missed, or without it to receive them all.
+    A resume of a stream that is no longer kept gets 410: the client has
+    shown part of the answer, and a new generation would repeat it.
+    Responds 429 with Retry-After when too many requests are already in
+    progress.
+    """
     try:
+        stream_registry = get_stream_registry()
+        
+        if request.message_id:
+            # Attach to the in-flight or recently finished stream of this message
+            # instead of generating the same answer a second time
+            stream = stream_registry.get(request.message_id)
+            if stream is not None:
+                return _sse_response(stream, after=last_event_id or 0)
+            if last_event_id is not None:
+                raise HTTPException(
+                    status_code=410,
+                    detail="This response can no longer be resumed; send the message again with a new message_id"
+                )
+        
         chat_service = get_chat_service()
-        conversation_service = get_conversation_service()
+        _require_ready(chat_service)
         
-        # Create conversation if not exists
-        if not request.conversation_id:
-            request.conversation_id = conversation_service.create_conversation()
+        admission = get_admission_controller()
+        admission.admit()
+        try:
+            save_user_turn(request)
             
-            # Save initial assistant message
-            conversation_service.save_message(
-                request.conversation_id,
-                "assistant",
-                "Xin chào! Mình ở đây sẵn sàng lắng nghe và chia sẻ cùng bạn. Bạn đang nghĩ gì vậy?"
+            # Generate in the background so a reconnecting client can resume;
+            # the task inherits the trace started here
+            start_trace()
+            stream = stream_registry.start(
+                request.message_id,
+                coalesce_tokens(chat_service.process_message_stream(request))
             )
+        except BaseException:
+            admission.release()
+            raise
+        # The slot is held until generation ends, not until the client leaves
+        stream.task.add_done_callback(lambda _task: admission.release())
+        return _sse_response(stream)
+    
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _require_ready(chat_service: ChatService) -> None:
+    """Reject chat requests with 503 while models are still loading"""
+    if not chat_service.ready:
+        raise HTTPException(
+            status_code=503,
+            detail="Models are still loading, please retry shortly",
+            headers={"Retry-After": str(Config.Admission.RETRY_AFTER_SECONDS)}
+        )
+
+
+def _too_many_requests(error: AdmissionRejected) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail=str(error),
+        headers={"Retry-After": str(error.retry_after)}
+    )
+
+
+def save_user_turn(request: ChatRequest):
+    """Create the conversation if needed and record the user message.
+
+    Fills in request.conversation_id and request.message_id when missing.
+    """
+    conversation_service = get_conversation_service()
+    
+    # Create conversation if not exists
+    if not request.conversation_id:
+        request.conversation_id = conversation_service.create_conversation()
         
-        # Save user message
+        # Save initial assistant message
         conversation_service.save_message(
             request.conversation_id,
-            "user",
-            request.message
-        )
-        
-        # Update title if first user message
-        messages = conversation_service.get_conversation_messages(request.conversation_id)
-        user_messages = [msg for msg in messages if msg["role"] == "user"]
-        if len(user_messages) == 1:
-            title = _format_conversation_title(request.message)
-            conversation_service.update_conversation_title(request.conversation_id, title)
-        
-        async def generate():
-            async for chunk in chat_service.process_message_stream(request):
-                try:
-                    # Convert to dict and handle numpy types
-                    chunk_data = chunk.model_dump()
-                    yield f"data: {json.dumps(chunk_data)}\n\n"
-                except Exception as e:
-                    # Fallback for serialization errors
-                    error_chunk = {
-                        "type": "error", 
-                        "content": f"Serialization error: {str(e)}",
-                        "conversation_id": request.conversation_id
-                    }
-                    yield f"data: {json.dumps(error_chunk)}\n\n"
-            yield "data: [DONE]\n\n"
-        
-        return StreamingResponse(
-            generate(),
-            media_type="text/plain",
-            headers={
-                "Cache-Control": "no-cache",
-                "Connection": "keep-alive",
-                "Access-Control-Allow-Origin": "*",
-            }
+            "assistant",
+            "Xin chào! Mình ở đây sẵn sàng lắng nghe và chia sẻ cùng bạn. Bạn đang nghĩ gì vậy?"
         )
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not request.message_id:
+        request.message_id = str(uuid.uuid4())
+    
+    # Save user message; the title is set in the same commit if it is the first one
+    conversation_service.save_message(
+        request.conversation_id,
+        "user",
+        request.message,
+        first_user_title=_format_conversation_title(request.message),
+        message_id=request.message_id
+    )
+
+
+def _sse_response(stream: ChatStream, after: int = 0) -> StreamingResponse:
+    """Wrap a chat stream's events in a text/event-stream response"""
+    async def generate():
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        async for event in stream.subscribe(after):
+            if event is None:
+                # Comment line keeps proxies from closing an idle connection
+                yield ": ping\n\n"
+                continue
+            event_id, payload = event
+            yield f"id: {event_id}\ndata: {payload}\n\n"
+        yield "data: [DONE]\n\n"
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no",
+            "Access-Control-Allow-Origin": "*",
+        }
+    )
 
 
 @router.post("/message", response_model=ChatResponse)
-async def chat_message(request: ChatRequest):
-    """Non-streaming chat endpoint"""
+async def chat_message(request: ChatRequest, response: Response):
+    """Non-streaming chat endpoint; stage timings are in the body and in Server-Timing"""
+    chat_service = get_chat_service()
+    _require_ready(chat_service)
+    
+    admission = get_admission_controller()
+    try:
+        admission.admit()
+    except AdmissionRejected as e:
+        raise _too_many_requests(e)
+    
     try:
-        chat_service = get_chat_service()
         conversation_service = get_conversation_service()
         
         # Create conversation if not exists
         if not request.conversation_id:
             request.conversation_id = conversation_service.create_conversation()
         
+        if not request.message_id:
+            request.message_id = str(uuid.uuid4())
+        
         # Save user message
         conversation_service.save_message(
             request.conversation_id,
             "user",
-            request.message
+            request.message,
+            message_id=request.message_id
         )
         
         # Collect streaming response
         full_response = ""
         sources = []
+        end = None
         
         async for chunk in chat_service.process_message_stream(request):
             if chunk.type == "token":
                 full_response += chunk.content
             elif chunk.type == "sources":
                 sources = chunk.sources
+            elif chunk.type == "end":
+                end = chunk
+                if chunk.timings:
+                    response.headers["Server-Timing"] = _server_timing(chunk.timings)
             elif chunk.type == "error":
                 raise HTTPException(status_code=500, detail=chunk.content)
         
         return ChatResponse(
             response=full_response,
             conversation_id=request.conversation_id,
-            sources=sources
+            sources=sources,
+            timings=end.timings if end else None,
+            output_tokens=end.output_tokens if end else None,
+            tokens_per_second=end.tokens_per_second if end else None
         )
     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        admission.release()
+
+
+def _server_timing(timings: Dict[str, float]) -> str:
+    """Format a timing breakdown (milliseconds) as a Server-Timing header value"""
+    return ", ".join(f"{stage};dur={duration}" for stage, duration in timings.items())
 
 
 def _format_conversation_title(text: str, max_length: int = 30) -> str:
@@ -6,13 +6,18 @@ Provides endpoints for managing conversations and conversation history.
 
 from typing import List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 
 from ..models import Conversation, ConversationCreate
 from ..services import get_conversation_service
 
 router = APIRouter(prefix="/api/conversations", tags=["conversations"])
 
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
 
 @router.post("/", response_model=dict)
 async def create_conversation(request: ConversationCreate):
@@ -40,11 +45,26 @@ async def create_conversation(request: ConversationCreate):
 
 
 @router.get("/", response_model=List[dict])
-async def get_all_conversations():
-    """Get all conversations"""
+async def get_all_conversations(
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Get conversations, newest first. With `limit`, returns one page and
+    the cursor of the next page in the X-Next-Cursor header."""
     try:
         conversation_service = get_conversation_service()
-        return conversation_service.get_all_conversations()
+        if limit is None and cursor is None:
+            return conversation_service.get_all_conversations()
+        
+        conversations, next_cursor = conversation_service.get_conversations_page(
+            limit or DEFAULT_PAGE_SIZE, cursor
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        return conversations
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -54,7 +74,8 @@ async def get_conversation(conversation_id: str):
     """Get a specific conversation"""
     try:
         conversation_service = get_conversation_service()
-        conversation = conversation_service.get_conversation(conversation_id)
+        # Waits for the queued message writes: off the event loop
+        conversation = await run_in_threadpool(conversation_service.get_conversation, conversation_id)
         
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -88,7 +109,7 @@ async def delete_conversation(conversation_id: str):
     """Delete a conversation"""
     try:
         conversation_service = get_conversation_service()
-        success = conversation_service.delete_conversation(conversation_id)
+        success = await run_in_threadpool(conversation_service.delete_conversation, conversation_id)
         
         if not success:
             raise HTTPException(status_code=404, detail="Conversation not found")
@@ -101,11 +122,27 @@ async def delete_conversation(conversation_id: str):
 
 
 @router.get("/{conversation_id}/messages", response_model=List[dict])
-async def get_conversation_messages(conversation_id: str):
-    """Get messages for a conversation"""
+async def get_conversation_messages(
+    conversation_id: str,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None
+):
+    """Get messages for a conversation in order. With `limit`, returns one
+    page and the cursor of the next page in the X-Next-Cursor header."""
     try:
         conversation_service = get_conversation_service()
-        messages = conversation_service.get_conversation_messages(conversation_id)
+        if limit is None and cursor is None:
+            return await run_in_threadpool(conversation_service.get_conversation_messages, conversation_id)
+        
+        messages, next_cursor = await run_in_threadpool(
+            conversation_service.get_conversation_messages_page,
+            conversation_id, limit or DEFAULT_PAGE_SIZE, cursor
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return messages
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
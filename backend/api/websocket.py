@@ -0,0 +1,157 @@
+"""
+WebSocket chat endpoint.
+
+One persistent socket per client carries any number of concurrent chat
+requests. Client frames:
+
+    {"type": "chat", "request_id": "...", "message": "...",
+     "conversation_id": "...", "message_id": "..."}
+    {"type": "cancel", "request_id": "..."}
+
+Server frames are StreamChunk objects tagged with the request_id they
+belong to. A cancelled request ends with a "cancelled" chunk; a request
+refused by admission control gets a single "error" chunk, and so does a
+frame that is not a JSON object (with an empty request_id); the socket
+stays open either way.
+"""
+
+import asyncio
+import json
+from typing import Dict
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from ragbase.tracing import start_trace
+
+from ..models import ChatRequest, StreamChunk
+from ..services import AdmissionRejected, get_admission_controller, get_chat_service
+from ..services.streaming import coalesce_tokens, encode_json
+from .chat import save_user_turn
+
+router = APIRouter(tags=["chat"])
+
+# What sending on a socket the client has already closed raises: Starlette's
+# RuntimeError once closed, WebSocketDisconnect, or the server's I/O error
+SOCKET_GONE = (WebSocketDisconnect, RuntimeError, OSError)
+
+
+class _ChatConnection:
+    """Per-socket state: in-flight generations and a send lock"""
+
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, request_id: str, chunk: StreamChunk):
+        frame = encode_json({"request_id": request_id, **chunk.model_dump()})
+        async with self._send_lock:
+            await self.websocket.send_text(frame)
+
+    async def send_final(self, request_id: str, chunk: StreamChunk):
+        """Send the last chunk of a request, unless the client is already gone"""
+        try:
+            await self.send(request_id, chunk)
+        except SOCKET_GONE:
+            pass
+
+    def start(self, request_id: str, request: ChatRequest):
+        if request_id in self.tasks:
+            self.tasks[request_id].cancel()
+        self.tasks[request_id] = asyncio.create_task(self._run(request_id, request))
+
+    def cancel(self, request_id: str):
+        task = self.tasks.get(request_id)
+        if task is not None:
+            task.cancel()
+
+    def cancel_all(self):
+        for task in self.tasks.values():
+            task.cancel()
+
+    async def _run(self, request_id: str, request: ChatRequest):
+        try:
+            if not get_chat_service().ready:
+                await self.send(request_id, StreamChunk(
+                    type="error",
+                    content="Models are still loading, please retry shortly",
+                    conversation_id=request.conversation_id
+                ))
+                return
+            with get_admission_controller().slot():
+                save_user_turn(request)
+                start_trace()
+                chunks = get_chat_service().process_message_stream(request)
+                async for chunk in coalesce_tokens(chunks):
+                    await self.send(request_id, chunk)
+        except AdmissionRejected as e:
+            await self.send_final(request_id, StreamChunk(
+                type="error",
+                content=f"{e} (retry after {e.retry_after}s)",
+                conversation_id=request.conversation_id
+            ))
+        except asyncio.CancelledError:
+            await self.send_final(request_id, StreamChunk(
+                type="cancelled",
+                content="",
+                conversation_id=request.conversation_id
+            ))
+            raise
+        except Exception as e:
+            await self.send_final(request_id, StreamChunk(
+                type="error",
+                content=str(e),
+                conversation_id=request.conversation_id
+            ))
+        finally:
+            if self.tasks.get(request_id) is asyncio.current_task():
+                del self.tasks[request_id]
+
+
+@router.websocket("/ws/chat")
+async def chat_websocket(websocket: WebSocket):
+    """Multiplexed chat over a single WebSocket"""
+    await websocket.accept()
+    connection = _ChatConnection(websocket)
+
+    try:
+        while True:
+            try:
+                frame = json.loads(await websocket.receive_text())
+                if not isinstance(frame, dict):
+                    raise ValueError(f"expected a JSON object, got {type(frame).__name__}")
+            except ValueError as e:
+                # One bad frame is the client's bug; the socket and its other requests carry on
+                await connection.send("", StreamChunk(type="error", content=f"Invalid frame: {e}"))
+                continue
+            frame_type = frame.get("type")
+            request_id = str(frame.get("request_id") or "")
+
+            if not request_id:
+                await connection.send("", StreamChunk(type="error", content="Missing request_id"))
+                continue
+
+            if frame_type == "cancel":
+                connection.cancel(request_id)
+            elif frame_type == "chat":
+                try:
+                    request = ChatRequest(
+                        message=frame.get("message"),
+                        conversation_id=frame.get("conversation_id"),
+                        session_id=frame.get("session_id"),
+                        message_id=frame.get("message_id")
+                    )
+                except ValidationError as e:
+                    await connection.send(request_id, StreamChunk(type="error", content=str(e)))
+                    continue
+                connection.start(request_id, request)
+            else:
+                await connection.send(
+                    request_id,
+                    StreamChunk(type="error", content=f"Unknown frame type: {frame_type}")
+                )
+    except WebSocketDisconnect:
+        pass
+    finally:
+        connection.cancel_all()
@@ -13,10 +13,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from backend.api import chat_router, conversations_router
-from backend.services import get_chat_service
+from ragbase.config import Config
+from ragbase.tracing import render_prometheus, request_percentiles
+
+from backend.api import admin_router, chat_router, conversations_router, websocket_router
+from backend.services import (get_admission_controller, get_chat_service,
+                              get_conversation_service, get_slow_request_profiler)
 
 # Create FastAPI app
 app = FastAPI(
@@ -27,11 +31,19 @@ app = FastAPI(
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize services on startup"""
+    """Start loading models in the background; the server accepts traffic at once"""
     print("🚀 Initializing Healing Bot services...")
-    # This will trigger the initialization of chat service and all models
-    chat_service = get_chat_service()
-    print("✅ All services initialized successfully!")
+    # /health and /ready answer while models load; /ready reports each component
+    get_chat_service().start_initialization()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush pending writes and snapshot warm caches before the process exits"""
+    print("💾 Flushing queued chat messages...")
+    get_conversation_service().close()
+    get_chat_service().save_warm_cache()
+    print("👋 Healing Bot services stopped")
 
 # Configure CORS
 app.add_middleware(
@@ -40,11 +52,40 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
+
+class SlowRequestProfilingMiddleware:
+    """Profile /api/chat requests, keeping profiles of the slow ones.
+
+    Plain ASGI rather than BaseHTTPMiddleware: the app call returns only once
+    a streamed response has been fully sent, and disconnects still reach the
+    stream generator.
+    """
+
+    def __init__(self, app, path_prefix: str = "/api/chat"):
+        self.app = app
+        self.path_prefix = path_prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+        with get_slow_request_profiler().session(f"{scope['method']} {scope['path']}"):
+            await self.app(scope, receive, send)
+
+
+# Opt-in profiling mode (PROFILE_SLOW_REQUESTS=1)
+if Config.Profiling.ENABLED:
+    app.add_middleware(SlowRequestProfilingMiddleware)
+
 # Include routers
 app.include_router(chat_router)
 app.include_router(conversations_router)
+app.include_router(websocket_router)
+if Config.Profiling.ENABLED:
+    app.include_router(admin_router)
 
 
 @app.get("/")
@@ -54,39 +95,49 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check with model status"""
+    """Health check with model status, admission metrics and latency percentiles"""
     chat_service = get_chat_service()
-    is_ready = (
-        chat_service.embedding_model is not None and 
-        chat_service.chain is not None and 
-        chat_service.hyde_transformer is not None
-    )
+    is_ready = chat_service.ready
     
     return {
         "status": "healthy" if is_ready else "initializing",
         "models_loaded": is_ready,
         "services": {
-            "embedding_model": chat_service.embedding_model is not None,
-            "chain": chat_service.chain is not None,
-            "hyde_transformer": chat_service.hyde_transformer is not None
-        }
+            name: component["status"] == "ready"
+            for name, component in chat_service.component_status().items()
+        },
+        "admission": get_admission_controller().metrics(),
+        "latency": request_percentiles()
     }
 
 
 @app.get("/ready")
 async def readiness_check():
-    """Check if all models are loaded and ready"""
+    """Check if all models are loaded and ready (503 until they are)"""
     chat_service = get_chat_service()
-    is_ready = (
-        chat_service.embedding_model is not None and 
-        chat_service.chain is not None and 
-        chat_service.hyde_transformer is not None
-    )
+    components = chat_service.component_status()
     
-    if is_ready:
-        return {"status": "ready", "message": "All models loaded successfully"}
-    else:
-        return {"status": "not_ready", "message": "Models are still loading..."}
+    if chat_service.ready:
+        return {"status": "ready", "message": "All models loaded successfully", "components": components}
+    
+    failed = any(component["status"] == "failed" for component in components.values())
+    return JSONResponse(
+        status_code=503,
+        content={
+            "status": "failed" if failed else "not_ready",
+            "message": "Model loading failed" if failed else "Models are still loading...",
+            "components": components
+        }
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms and admission gauges in Prometheus text format"""
+    return PlainTextResponse(
+        render_prometheus() + get_admission_controller().render_prometheus(),
+        media_type="text/plain; version=0.0.4"
+    )
 
 
 @app.exception_handler(Exception)
@@ -3,7 +3,7 @@ Pydantic models for chat functionality.
 """
 
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from pydantic import BaseModel, ConfigDict, Field
 
 
@@ -20,6 +20,7 @@ class Message(BaseModel):
     content: str = Field(..., description="Message content")
     timestamp: str = Field(..., description="Message timestamp")
     conversation_id: str = Field(..., description="Conversation ID")
+    is_partial: bool = Field(default=False, description="Reply was cut short by a disconnect")
 
 
 class ConversationCreate(BaseModel):
@@ -41,6 +42,9 @@ class ChatRequest(BaseModel):
     message: str = Field(..., description="User message")
     conversation_id: Optional[str] = Field(None, description="Conversation ID")
     session_id: Optional[str] = Field(None, description="Session ID")
+    message_id: Optional[str] = Field(
+        None, description="Client message ID; resending the same ID does not duplicate history"
+    )
 
 
 class ChatResponse(BaseModel):
@@ -48,13 +52,31 @@ class ChatResponse(BaseModel):
     response: str = Field(..., description="AI response")
     conversation_id: str = Field(..., description="Conversation ID")
     sources: List[dict] = Field(default=[], description="Source documents")
+    timings: Optional[Dict[str, float]] = Field(
+        None,
+        description="Per-stage durations of this request in milliseconds, e.g. queue_wait, hyde, "
+                    "route, retrieval, rerank, ttft"
+    )
+    output_tokens: Optional[int] = Field(None, description="Tokens generated for this response")
+    tokens_per_second: Optional[float] = Field(
+        None, description="Generation rate of this response after the first token"
+    )
 
 
 class StreamChunk(BaseModel):
     """Model for streaming response chunks."""
     model_config = ConfigDict(arbitrary_types_allowed=True)
     
-    type: str = Field(..., description="Chunk type: token/sources/error/end")
+    type: str = Field(..., description="Chunk type: token/sources/error/end/cancelled")
     content: str = Field(..., description="Chunk content")
     conversation_id: Optional[str] = Field(None, description="Conversation ID")
     sources: List[dict] = Field(default=[], description="Source documents")
+    timings: Optional[Dict[str, float]] = Field(
+        None,
+        description="Per-stage durations in milliseconds, e.g. queue_wait, hyde, route, "
+                    "retrieval, rerank, ttft (on the end chunk)"
+    )
+    output_tokens: Optional[int] = Field(None, description="Generated tokens (on the end chunk)")
+    tokens_per_second: Optional[float] = Field(
+        None, description="Generation rate after the first token (on the end chunk)"
+    )
@@ -0,0 +1,144 @@
+"""
+Pre-fork server: load the models once, then fork the uvicorn workers.
+
+`uvicorn --workers N` spawns N fresh interpreters, and each one loads its
+own embedding model and reranker. Here the parent loads them, freezes the
+garbage collector and forks the workers, which share the weight pages
+copy-on-write. The parent loads nothing else: each worker builds its own
+network clients (Qdrant, LLM, HyDE) and the chain once (see
+ChatService.load_worker_components), warms up, and serves on the socket the
+parent bound. The parent restarts workers that die and forwards
+SIGTERM/SIGINT for a graceful shutdown.
+
+The parent must not run inference before forking: torch/OpenMP thread pools
+do not survive fork.
+
+Usage (from the project root, Linux/macOS only):
+
+    python -m backend.prefork --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import uvicorn
+
+from backend.main import app
+from backend.services import get_chat_service
+
+
+def freeze_weights(service):
+    """Put the local torch model in inference mode so nothing writes to its weights"""
+    model = getattr(service.base_embeddings(), "client", None)  # SentenceTransformer behind HuggingFaceEmbeddings
+    if hasattr(model, "parameters"):
+        model.eval()
+        for parameter in model.parameters():
+            parameter.requires_grad_(False)
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock: socket.socket, log_level: str):
+    """Body of a forked worker; never returns"""
+    status = 1
+    try:
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        get_chat_service().load_worker_components()
+        server = uvicorn.Server(uvicorn.Config(app, log_level=log_level))
+        server.run(sockets=[sock])
+        status = 0
+    except Exception as e:
+        print(f"❌ Worker {os.getpid()} failed: {e}")
+    finally:
+        # Skip the parent's atexit handlers and buffered state
+        sys.stdout.flush()
+        os._exit(status)
+
+
+def spawn(sock: socket.socket, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        run_worker(sock, log_level)
+    print(f"👷 Started worker {pid}")
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", "2")))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if not hasattr(os, "fork"):
+        sys.exit("Pre-fork mode needs os.fork(); use `uvicorn --workers` on this platform")
+
+    # Collect as little as possible while loading, then move everything loaded
+    # so far out of the collector's reach: a collection in a worker would
+    # otherwise write to (and so copy) every page holding a tracked object.
+    gc.disable()
+    service = get_chat_service()
+    print("🚀 Loading models in the parent process...")
+    # Network clients, the chain and warmup (an inference) are left to the workers
+    try:
+        service.load_shared_models()
+    except Exception:
+        sys.exit(f"❌ Model loading failed: {service.load_errors}")
+    freeze_weights(service)
+    gc.collect()
+    gc.freeze()
+    gc.enable()
+
+    sock = bind_socket(args.host, args.port)
+    print(f"🔌 Listening on {args.host}:{args.port} with {args.workers} workers")
+
+    workers = set()
+    stopping = False
+
+    def stop(signum, _frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for _ in range(args.workers):
+        workers.add(spawn(sock, args.log_level))
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        workers.discard(pid)
+        if not stopping:
+            print(f"⚠️ Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, restarting")
+            time.sleep(1)  # Avoid a tight restart loop if workers die on startup
+            workers.add(spawn(sock, args.log_level))
+
+    sock.close()
+    print("👋 All workers stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,28 @@
 Business logic services for Healing Bot backend.
 """
 
+from .admission import AdmissionController, AdmissionRejected, get_admission_controller
 from .chat_service import ChatService, get_chat_service
 from .conversation_service import ConversationService, get_conversation_service
+from .message_writer import MessageWriteQueue, QueuedMessage
+from .profiling import SlowRequestProfiler, get_slow_request_profiler
+from .streaming import StreamRegistry, get_stream_registry
+from .warm_cache import WarmCacheSnapshot, get_warm_cache_snapshot
 
 __all__ = [
+    "AdmissionController",
+    "AdmissionRejected",
+    "get_admission_controller",
     "ChatService",
     "get_chat_service",
     "ConversationService", 
-    "get_conversation_service"
+    "get_conversation_service",
+    "MessageWriteQueue",
+    "QueuedMessage",
+    "SlowRequestProfiler",
+    "get_slow_request_profiler",
+    "StreamRegistry",
+    "get_stream_registry",
+    "WarmCacheSnapshot",
+    "get_warm_cache_snapshot"
 ]
\ No newline at end of file
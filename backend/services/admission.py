@@ -0,0 +1,102 @@
+"""
+Admission control for chat requests.
+
+A chat request is admitted only while fewer than MAX_ACTIVE_REQUESTS are in
+progress; inside the pipeline each stage (embed, rerank, llm) has its own
+concurrency limit and admitted requests wait in line there. Anything beyond
+that bounded queue is rejected up front so the caller can answer 429 with
+Retry-After instead of letting latency grow without bound.
+"""
+
+from contextlib import contextmanager
+
+from ragbase.config import Config
+from ragbase.limits import stage_metrics
+
+
+class AdmissionRejected(Exception):
+    """Too many chat requests in progress"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Server is busy, please retry later")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_active: int = Config.Admission.MAX_ACTIVE_REQUESTS,
+        retry_after: int = Config.Admission.RETRY_AFTER_SECONDS
+    ):
+        self.max_active = max_active
+        self.retry_after = retry_after
+        self.active = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def admit(self):
+        """Take a request slot or raise AdmissionRejected"""
+        if self.active >= self.max_active:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after)
+        self.active += 1
+        self.admitted += 1
+
+    def release(self):
+        """Give back a slot taken by admit()"""
+        self.active -= 1
+
+    @contextmanager
+    def slot(self):
+        """Hold a request slot for the duration of the block"""
+        self.admit()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def metrics(self) -> dict:
+        """Request counters plus per-stage queue depth and wait times"""
+        stages = stage_metrics()
+        return {
+            "active_requests": self.active,
+            "max_active_requests": self.max_active,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "queue_depth": sum(stage["queue_depth"] for stage in stages.values()),
+            "stages": stages,
+        }
+
+    def render_prometheus(self) -> str:
+        """Queue gauges and counters in the Prometheus text format"""
+        metrics = self.metrics()
+        lines = [
+            "# HELP healingbot_active_requests Chat requests in progress",
+            "# TYPE healingbot_active_requests gauge",
+            f"healingbot_active_requests {metrics['active_requests']}",
+            "# HELP healingbot_rejected_requests_total Chat requests answered with 429",
+            "# TYPE healingbot_rejected_requests_total counter",
+            f"healingbot_rejected_requests_total {metrics['rejected']}",
+            "# HELP healingbot_stage_queue_depth Callers waiting for a stage slot",
+            "# TYPE healingbot_stage_queue_depth gauge",
+        ]
+        for stage, values in metrics["stages"].items():
+            lines.append(f'healingbot_stage_queue_depth{{stage="{stage}"}} {values["queue_depth"]}')
+        lines += [
+            "# HELP healingbot_stage_in_flight Calls holding a stage slot",
+            "# TYPE healingbot_stage_in_flight gauge",
+        ]
+        for stage, values in metrics["stages"].items():
+            lines.append(f'healingbot_stage_in_flight{{stage="{stage}"}} {values["in_flight"]}')
+        return "\n".join(lines) + "\n"
+
+
+# Global controller instance
+admission_controller = None
+
+def get_admission_controller() -> AdmissionController:
+    """Get or create admission controller instance"""
+    global admission_controller
+    if admission_controller is None:
+        admission_controller = AdmissionController()
+    return admission_controller
@@ -4,34 +4,64 @@ Chat service for handling AI processing and streaming responses.
 
 import asyncio
 import os
-import re
 import sys
+import threading
 import time
 import json
+from concurrent.futures import ThreadPoolExecutor
 from typing import AsyncGenerator, List, Optional
 
 import numpy as np
 from dotenv import load_dotenv
 from langchain.retrievers import ContextualCompressionRetriever
-from langchain.retrievers.document_compressors.chain_filter import LLMChainFilter
 from langchain_qdrant import QdrantVectorStore
 from qdrant_client import QdrantClient
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 
+from ragbase.cache import CachedQueryEmbeddings
 from ragbase.chain import ask_question, create_chain
 from ragbase.config import Config
 from ragbase.hyde import QueryTransformationHyDE
+from ragbase.limits import LimitedCompressor, LimitedEmbeddings
 from ragbase.model import create_embeddings, create_llm, create_reranker
 from ragbase.retriever import create_optimized_retriever
-from ragbase.session_history import add_message_to_history
+from ragbase.session_history import add_message_to_history, get_session_history
+from ragbase.stream_filter import ThinkTagFilter
+from ragbase.tracing import (Trace, current_trace, observe_request, record,
+                             span, start_trace)
 
 from backend.models import ChatRequest, StreamChunk
+from backend.services.conversation_service import get_conversation_service
+from backend.services.warm_cache import get_warm_cache_snapshot
 
 load_dotenv()
 
 
+def format_sources(documents: List, limit: int = 3) -> List[dict]:
+    """Source entries for the first `limit` documents, with JSON-safe metadata"""
+    sources = []
+    for doc in documents[:limit]:
+        # Clean metadata to avoid numpy serialization issues
+        metadata = {}
+        if hasattr(doc, 'metadata') and doc.metadata:
+            for key, value in doc.metadata.items():
+                # Convert numpy types to Python types
+                if isinstance(value, (np.integer, np.floating)):
+                    metadata[key] = value.item()
+                elif isinstance(value, np.ndarray):
+                    metadata[key] = value.tolist()
+                else:
+                    metadata[key] = value
+        
+        sources.append({
+            "content": doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
+            "metadata": metadata
+        })
+    return sources
+
+
 class ChatService:
     _instance = None
     _initialized = False
@@ -41,111 +71,296 @@ class ChatService:
             cls._instance = super(ChatService, cls).__new__(cls)
         return cls._instance
     
+    # Startup components in load order; readiness of each is reported by /ready
+    COMPONENTS = ("embedding_model", "reranker", "llm", "hyde_transformer", "vector_stores", "chain", "warmup")
+    
     def __init__(self):
         if not self._initialized:
-            self.client = QdrantClient(host="localhost", port=6333, timeout=300)
+            self.client = None
             self.embedding_model = None
-            self.chain = None
+            self.reranker = None
+            self.llm = None
             self.hyde_transformer = None
-            self._initialize()
+            self.vector_stores = None
+            self.chain = None
+            self.warmup = None
+            self.load_seconds = {}
+            self.load_errors = {}
+            self._loading = set()
+            self._init_thread = None
+            self._init_lock = threading.Lock()
             ChatService._initialized = True
     
-    def _initialize(self):
-        """Initialize all required components"""
+    @property
+    def ready(self) -> bool:
+        """Whether chat requests can be served"""
+        return self.chain is not None and self.hyde_transformer is not None and self.warmup is not None
+    
+    def component_status(self) -> dict:
+        """Per-component state: pending/loading/ready/failed/disabled"""
+        status = {}
+        for name in self.COMPONENTS:
+            if name == "reranker" and not Config.Retriever.USE_RERANKER:
+                state = "disabled"
+            elif getattr(self, name) is not None:
+                state = "ready"
+            elif name in self.load_errors:
+                state = "failed"
+            elif name in self._loading:
+                state = "loading"
+            else:
+                state = "pending"
+            status[name] = {"status": state}
+            if name in self.load_seconds:
+                status[name]["load_seconds"] = round(self.load_seconds[name], 2)
+            if name in self.load_errors:
+                status[name]["error"] = self.load_errors[name]
+        return status
+    
+    def start_initialization(self, warm_up: bool = True):
+        """Load all components in a background thread; returns immediately.
+        
+        With warm_up=False the warm-cache restore and warmup query are skipped.
+        """
+        with self._init_lock:
+            if self.ready or (self._init_thread is not None and self._init_thread.is_alive()):
+                return
+            self.load_errors.clear()
+            self._init_thread = threading.Thread(
+                target=self._initialize, args=(warm_up,), name="chat-service-init", daemon=True
+            )
+            self._init_thread.start()
+    
+    def wait_until_ready(self, timeout: Optional[float] = None, warm_up: bool = True) -> bool:
+        """Start initialization if needed and block until it finishes"""
+        self.start_initialization(warm_up)
+        if self._init_thread is not None:
+            self._init_thread.join(timeout)
+        return self.ready
+    
+    def _load(self, name: str, factory):
+        """Run one loading stage, recording its state and duration"""
+        self._loading.add(name)
+        start = time.time()
+        try:
+            setattr(self, name, factory())
+        except Exception as e:
+            self.load_errors[name] = str(e)
+            print(f"❌ Failed to load {name}: {e}")
+            raise
+        finally:
+            self._loading.discard(name)
+        self.load_seconds[name] = time.time() - start
+        print(f"✅ {name} loaded in {self.load_seconds[name]:.2f}s")
+    
+    def _initialize(self, warm_up: bool = True):
+        """Load components in stages, independent ones in parallel threads.
+        
+        Stage 1: embedding model, reranker, LLM and HyDE (independent)
+        Stage 2: vector stores (need the embedding model)
+        Stage 3: chain (needs vector stores, LLM and reranker)
+        Stage 4: warm caches and model kernels (needs everything)
+        """
         print("🚀 Initializing ChatService...")
         start = time.time()
         
-        print("📚 Loading embedding model...")
-        # Initialize embedding model
-        self.embedding_model = create_embeddings()
-        print("✅ Embedding model loaded")
-        
-        print("🗃️ Connecting to vector stores...")
-        # Initialize vector stores
-        vector_store = QdrantVectorStore(
-            client=self.client,
-            collection_name="documents", 
-            embedding=self.embedding_model
-        )
+        try:
+            with ThreadPoolExecutor(max_workers=4, thread_name_prefix="model-loader") as pool:
+                embeddings, reranker = self._submit_shared_models(pool)
+                llm = pool.submit(self._load, "llm", create_llm)
+                hyde = pool.submit(self._load, "hyde_transformer", QueryTransformationHyDE)
+                
+                embeddings.result()
+                self._load("vector_stores", self._connect_vector_stores)
+                
+                llm.result()
+                if reranker is not None:
+                    reranker.result()
+                self._load("chain", self._create_chain)
+                hyde.result()
+            
+            if warm_up:
+                self._load("warmup", self._warm_up)
+        except Exception as e:
+            print(f"❌ ChatService initialization failed: {e}")
+            return
         
-        summary_vector_store = QdrantVectorStore(
-            client=self.client,
-            collection_name="summary",
-            embedding=self.embedding_model
+        end = time.time()
+        print(f"⚡ ChatService initialized in: {end - start:.2f} seconds")
+        print("🎉 Ready to process chat requests!")
+    
+    def _submit_shared_models(self, pool: ThreadPoolExecutor):
+        """Start loading the local models; returns the (embedding, reranker) futures"""
+        # Query embedding runs under the "embed" stage limit; repeated queries skip it
+        embeddings = pool.submit(
+            self._load, "embedding_model",
+            lambda: CachedQueryEmbeddings(LimitedEmbeddings(create_embeddings()))
         )
-        print("✅ Vector stores connected")
+        # One reranker instance serves both retrievers
+        reranker = (
+            pool.submit(self._load, "reranker", create_reranker)
+            if Config.Retriever.USE_RERANKER else None
+        )
+        return embeddings, reranker
+    
+    def load_shared_models(self):
+        """Load only the embedding model and reranker (pre-fork parent).
         
-        print("🤖 Loading LLM...")
-        # Initialize LLM
-        llm = create_llm()
-        print("✅ LLM loaded")
+        No network client is created and no inference runs, so the result
+        can be forked; each worker then calls load_worker_components().
+        """
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader") as pool:
+            embeddings, reranker = self._submit_shared_models(pool)
+            embeddings.result()
+            if reranker is not None:
+                reranker.result()
+    
+    def load_worker_components(self):
+        """Build the rest of the service in a forked worker, once.
+        
+        The embedding model and reranker come from the parent (shared
+        copy-on-write); the Qdrant connection pool, the LLM and HyDE clients
+        must not be shared between processes, so only the worker creates them.
+        """
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader") as pool:
+            llm = pool.submit(self._load, "llm", create_llm)
+            hyde = pool.submit(self._load, "hyde_transformer", QueryTransformationHyDE)
+            self._load("vector_stores", self._connect_vector_stores)
+            llm.result()
+            self._load("chain", self._create_chain)
+            hyde.result()
+        self._load("warmup", self._warm_up)
+    
+    def base_embeddings(self):
+        """The embedding model itself, below the cache and limiter wrappers"""
+        embeddings = self.embedding_model
+        while hasattr(embeddings, "embeddings"):
+            embeddings = embeddings.embeddings
+        return embeddings
+    
+    def _warm_up(self) -> dict:
+        """Restore the warm-cache snapshot and run a synthetic query through
+        the embedding model, Qdrant and the reranker, so the first user
+        request does not pay for lazy kernel and connection setup."""
+        summary = {}
+        if Config.WarmCache.ENABLED:
+            try:
+                summary["restored"] = get_warm_cache_snapshot().restore(self)
+                print(f"♻️ Warm cache restored: {summary['restored']}")
+            except (OSError, ValueError) as e:
+                print(f"⚠️ Could not restore warm cache: {e}")
+        
+        # Straight to the models: a warmup must not be a cache hit or a latency sample
+        query = Config.WarmCache.WARMUP_QUERY
+        vector = self.base_embeddings().embed_query(query)
+        documents = self.vector_stores["full"].similarity_search_by_vector(
+            vector, k=Config.Retriever.FULL_RETRIEVAL_K
+        )
+        if self.reranker is not None and documents:
+            self.reranker.compress_documents(documents, query)
+        summary["warmup_documents"] = len(documents)
+        return summary
+    
+    def save_warm_cache(self):
+        """Snapshot the query-path caches for the next start"""
+        if not Config.WarmCache.ENABLED or not self.ready:
+            return
+        try:
+            saved = get_warm_cache_snapshot().save(self)
+            print(f"💾 Warm cache saved: {saved}")
+        except OSError as e:
+            print(f"❌ Failed to save warm cache: {e}")
+
+    def _connect_vector_stores(self) -> dict:
+        self.client = QdrantClient(host="localhost", port=6333, timeout=300)
+        return {
+            "full": QdrantVectorStore(
+                client=self.client,
+                collection_name="documents", 
+                embedding=self.embedding_model
+            ),
+            "summary": QdrantVectorStore(
+                client=self.client,
+                collection_name="summary",
+                embedding=self.embedding_model
+            ),
+        }
+    
+    def _create_chain(self):
+        llm = self.llm
         
-        print("🔍 Setting up retrievers...")
         # Create optimized retrievers
-        retriever_full = create_optimized_retriever(llm, vector_store, "full")
-        retriever_summary = create_optimized_retriever(llm, summary_vector_store, "summary")
+        retriever_full = create_optimized_retriever(llm, self.vector_stores["full"], "full")
+        retriever_summary = create_optimized_retriever(llm, self.vector_stores["summary"], "summary")
         
         # Apply reranker or chain filter if needed
         if Config.Retriever.USE_RERANKER:
-            print("🎯 Applying reranker...")
             retriever_full = ContextualCompressionRetriever(
-                base_compressor=create_reranker(), base_retriever=retriever_full
+                base_compressor=LimitedCompressor(base_compressor=self.reranker),
+                base_retriever=retriever_full
             )
             retriever_summary = ContextualCompressionRetriever(
-                base_compressor=create_reranker(), base_retriever=retriever_summary
+                base_compressor=LimitedCompressor(base_compressor=self.reranker),
+                base_retriever=retriever_summary
             )
         
         if Config.Retriever.USE_CHAIN_FILTER:
-            print("🔗 Applying chain filter...")
+            from langchain.retrievers.document_compressors.chain_filter import LLMChainFilter
+            
             retriever_full = ContextualCompressionRetriever(
                 base_compressor=LLMChainFilter.from_llm(llm), base_retriever=retriever_full
             )
             retriever_summary = ContextualCompressionRetriever(
                 base_compressor=LLMChainFilter.from_llm(llm), base_retriever=retriever_summary
             )
-        print("✅ Retrievers configured")
-        
-        print("⛓️ Creating chain...")
-        # Create chain
-        self.chain = create_chain(llm, retriever_full, retriever_summary)
-        print("✅ Chain created")
         
-        print("🔄 Initializing HyDE transformer...")
-        # Initialize HyDE transformer
-        self.hyde_transformer = QueryTransformationHyDE()
-        print("✅ HyDE transformer ready")
-        
-        end = time.time()
-        print(f"⚡ ChatService initialized in: {end - start:.2f} seconds")
-        print("🎉 Ready to process chat requests!")
+        return create_chain(llm, retriever_full, retriever_summary)
     
     async def process_message_stream(
         self, 
         request: ChatRequest
     ) -> AsyncGenerator[StreamChunk, None]:
-        """Process message and yield streaming response"""
+        """Process message and yield streaming response.
+
+        Cancelling the consumer (client disconnect) cancels the HyDE call and
+        the chain run; whatever was generated so far is saved as a partial reply.
+        """
+        # Use session_id or conversation_id
+        session_id = request.session_id or request.conversation_id or "temp_session"
+        full_response = ""
+        # Stages run from here on (including in worker threads) report into the
+        # request's trace. Callers that consume this generator from other tasks
+        # (coalesce_tokens) must start the trace before spawning them.
+        trace = current_trace() or start_trace()
+        
         try:
-            # Transform query with HyDE
-            hyde_start = time.time()
-            question_transformed = self.hyde_transformer.transform_query(
-                request.message, 
-                fast_mode=True
-            )
-            hyde_end = time.time()
-            print(f"⚡ HyDE took: {hyde_end - hyde_start:.2f}s")
+            # Transform query with HyDE (async, so it can be cancelled)
+            with span("hyde"):
+                question_transformed = await self.hyde_transformer.atransform_query(
+                    request.message, 
+                    fast_mode=True
+                )
             
-            # Use session_id or conversation_id
-            session_id = request.session_id or request.conversation_id or "temp_session"
+            # Prior turns only: the current user message was already recorded
+            chat_history = [
+                msg for msg in get_session_history(session_id).messages
+                if not request.message_id or msg.id != request.message_id
+            ]
             
-            full_response = ""
             documents = []
+            think_filter = ThinkTagFilter()
             
             # Stream response from chain
-            async for event in ask_question(self.chain, question_transformed, session_id=session_id):
-                if isinstance(event, str) and event.strip():
-                    # Remove thinking tags before yielding
-                    clean_event = re.sub(r"<think>.*?</think>", "", event, flags=re.DOTALL)
-                    if clean_event.strip():
+            async for event in ask_question(
+                self.chain, question_transformed, session_id=session_id, chat_history=chat_history
+            ):
+                if isinstance(event, str) and event:
+                    # Remove thinking spans before yielding, even when tags span chunks
+                    clean_event = think_filter.feed(event)
+                    if clean_event:
+                        if not full_response:
+                            # Time to first visible token, from the start of the request
+                            record("ttft", trace.elapsed())
                         full_response += clean_event
                         yield StreamChunk(
                             type="token",
@@ -156,47 +371,36 @@ class ChatService:
                 elif isinstance(event, list):
                     documents.extend(event)
             
+            # Text held back as a possible partial tag at end of stream
+            tail = think_filter.flush()
+            if tail:
+                full_response += tail
+                yield StreamChunk(
+                    type="token",
+                    content=tail,
+                    conversation_id=request.conversation_id
+                )
+            
             # Yield sources if available
             if documents:
-                sources = []
-                for doc in documents[:3]:
-                    # Clean metadata to avoid numpy serialization issues
-                    metadata = {}
-                    if hasattr(doc, 'metadata') and doc.metadata:
-                        for key, value in doc.metadata.items():
-                            # Convert numpy types to Python types
-                            if isinstance(value, (np.integer, np.floating)):
-                                metadata[key] = value.item()
-                            elif isinstance(value, np.ndarray):
-                                metadata[key] = value.tolist()
-                            else:
-                                metadata[key] = value
-                    
-                    sources.append({
-                        "content": doc.page_content[:500] + "..." if len(doc.page_content) > 500 else doc.page_content,
-                        "metadata": metadata
-                    })
-                
                 yield StreamChunk(
                     type="sources",
                     content="",
                     conversation_id=request.conversation_id,
-                    sources=sources
+                    sources=format_sources(documents)
                 )
             
-            # Save message to history if conversation_id exists
-            if request.conversation_id and request.conversation_id != "temp_session":
-                # Clean final response
-                final_response = re.sub(r"<think>.*?</think>", "", full_response, flags=re.DOTALL)
-                add_message_to_history(request.conversation_id, "assistant", final_response)
+            self._save_reply(request, session_id, full_response)
             
-            # End stream
-            yield StreamChunk(
-                type="end",
-                content="",
-                conversation_id=request.conversation_id
-            )
+            # End stream; the timing breakdown is the trailer of the response
+            yield self._end_chunk(request, trace)
             
+        except asyncio.CancelledError:
+            print(f"🛑 Generation cancelled after {len(full_response)} chars")
+            if full_response:
+                self._save_reply(request, session_id, full_response, is_partial=True)
+            raise
+        
         except Exception as e:
             print(f"Error in process_message_stream: {e}")
             yield StreamChunk(
@@ -204,6 +408,58 @@ class ChatService:
                 content=f"Xin lỗi, mình đang gặp vấn đề kỹ thuật: {str(e)}",
                 conversation_id=request.conversation_id
             )
+    
+    def _end_chunk(self, request: ChatRequest, trace: Trace) -> StreamChunk:
+        """Close the request's trace and build the end chunk carrying its breakdown"""
+        record("total", trace.elapsed())
+        
+        # Providers that do not report usage are measured in stream chunks
+        output_tokens = trace.counts.get("output_tokens") or trace.counts.get("llm_chunks", 0)
+        generation_seconds = trace.get("llm") - trace.get("llm_ttft")
+        tokens_per_second = (
+            round(output_tokens / generation_seconds, 1)
+            if output_tokens and generation_seconds > 0 else None
+        )
+        
+        observe_request({
+            "ttft_seconds": trace.timings.get("ttft"),
+            "total_seconds": trace.get("total"),
+            "queue_wait_seconds": trace.get("queue_wait"),
+            "tokens_per_second": tokens_per_second,
+        })
+        
+        return StreamChunk(
+            type="end",
+            content="",
+            conversation_id=request.conversation_id,
+            timings=trace.as_milliseconds(),
+            output_tokens=output_tokens,
+            tokens_per_second=tokens_per_second
+        )
+    
+    def _save_reply(
+        self,
+        request: ChatRequest,
+        session_id: str,
+        content: str,
+        is_partial: bool = False
+    ):
+        """Record the assistant reply for this request"""
+        # Save message to history if conversation_id exists
+        if request.conversation_id and request.conversation_id != "temp_session":
+            # Single write path: chain history + write-behind queue. The reply id is
+            # derived from the user message id so a retried request is a no-op.
+            get_conversation_service().save_message(
+                request.conversation_id,
+                "assistant",
+                content,
+                message_id=f"{request.message_id}:assistant" if request.message_id else None,
+                is_partial=is_partial
+            )
+        else:
+            # Unsaved session: keep the turn in memory only
+            add_message_to_history(session_id, "user", request.message, persist=False)
+            add_message_to_history(session_id, "assistant", content, persist=False)
 
 
 # Global service instance
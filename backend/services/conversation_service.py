@@ -2,22 +2,28 @@
 Conversation service for managing chat conversations and message history.
 """
 
+import base64
 import datetime
+import json
 import uuid
-import os
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
+from ragbase.session_history import add_message_to_history, clear_session_history
 from shared.chat_storage import ChatStorage
 from backend.models import Conversation, Message, ConversationCreate
+from backend.services.message_writer import MessageWriteQueue, QueuedMessage
 
 
 class ConversationService:
     def __init__(self, db_file: str = None):
-        if db_file is None:
-            # Use database in project root
-            project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-            db_file = os.path.join(project_root, "chat_history.db")
+        # Default: $CHAT_DB_PATH, else chat_history.db in the project root
         self.storage = ChatStorage(db_file=db_file)
+        self.writer = MessageWriteQueue(self.storage)
+        self.writer.start()
+    
+    def close(self):
+        """Flush queued messages and stop the background writer"""
+        self.writer.stop()
     
     def create_conversation(self, title: Optional[str] = None) -> str:
         """Create a new conversation and return its ID"""
@@ -25,19 +31,15 @@ class ConversationService:
     
     def get_conversation(self, conversation_id: str) -> Optional[Conversation]:
         """Get a conversation by ID"""
-        # Get conversation info
-        conversations = self.storage.get_all_conversations()
-        conversation_data = next(
-            (conv for conv in conversations if conv["id"] == conversation_id), 
-            None
-        )
-        
+        # Conversation info and messages in one keyed query
+        self.writer.flush()
+        conversation_data = self.storage.get_conversation_with_messages(conversation_id)
+
         if not conversation_data:
             return None
-        
-        # Get messages
-        messages = self.storage.get_conversation_messages(conversation_id)
-        
+
+        messages = conversation_data["messages"]
+
         return Conversation(
             id=conversation_data["id"],
             title=conversation_data["title"],
@@ -45,10 +47,12 @@ class ConversationService:
             updated_at=conversation_data["updated_at"],
             messages=[
                 Message(
+                    id=msg["id"],
                     role=msg["role"],
                     content=msg["content"],
                     timestamp=msg["timestamp"],
-                    conversation_id=conversation_id
+                    conversation_id=conversation_id,
+                    is_partial=msg["is_partial"]
                 )
                 for msg in messages
             ]
@@ -58,6 +62,18 @@ class ConversationService:
         """Get all conversations"""
         return self.storage.get_all_conversations()
     
+    def get_conversations_page(
+        self,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one page of conversations (most recently updated first) and the next cursor"""
+        after = _decode_cursor(cursor) if cursor else None
+        if after is not None and not (isinstance(after, list) and len(after) == 2):
+            raise ValueError("Invalid cursor")
+        conversations, next_key = self.storage.get_conversations_page(limit, after)
+        return conversations, _encode_cursor(next_key) if next_key else None
+    
     def update_conversation_title(self, conversation_id: str, title: str) -> bool:
         """Update conversation title"""
         try:
@@ -69,7 +85,10 @@ class ConversationService:
     def delete_conversation(self, conversation_id: str) -> bool:
         """Delete a conversation"""
         try:
+            # Queued messages must not land after the conversation is gone
+            self.writer.flush()
             self.storage.delete_conversation(conversation_id)
+            clear_session_history(conversation_id)
             return True
         except Exception:
             return False
@@ -79,20 +98,63 @@ class ConversationService:
         conversation_id: str, 
         role: str, 
         content: str, 
-        timestamp: Optional[str] = None
+        timestamp: Optional[str] = None,
+        first_user_title: Optional[str] = None,
+        message_id: Optional[str] = None,
+        is_partial: bool = False
     ) -> bool:
-        """Save a message to conversation"""
+        """Record a message in the chain history and queue it for the next
+        group commit. This is the only write path for conversation history;
+        repeating a `message_id` is a no-op in both places.
+        If `first_user_title` is given and this is the first user message, it
+        becomes the conversation title without an extra read. `is_partial`
+        marks a reply that was interrupted before it finished."""
         try:
             if not timestamp:
                 timestamp = datetime.datetime.now().strftime("%H:%M")
-            self.storage.save_message(conversation_id, role, content, timestamp)
+            if not message_id:
+                message_id = str(uuid.uuid4())
+            add_message_to_history(conversation_id, role, content, persist=False, message_id=message_id)
+            self.writer.put(QueuedMessage(
+                conversation_id, role, content, timestamp, first_user_title, message_id, is_partial
+            ))
             return True
         except Exception:
             return False
     
     def get_conversation_messages(self, conversation_id: str) -> List[dict]:
         """Get messages for a conversation"""
+        self.writer.flush()
         return self.storage.get_conversation_messages(conversation_id)
+    
+    def get_conversation_messages_page(
+        self,
+        conversation_id: str,
+        limit: int,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[dict], Optional[str]]:
+        """Get one page of messages in conversation order and the next cursor"""
+        self.writer.flush()
+        after_order = _decode_cursor(cursor) if cursor else None
+        if after_order is not None and not isinstance(after_order, int):
+            raise ValueError("Invalid cursor")
+        messages, next_order = self.storage.get_conversation_messages_page(
+            conversation_id, limit, after_order
+        )
+        return messages, _encode_cursor(next_order) if next_order is not None else None
+
+
+def _encode_cursor(key) -> str:
+    """Encode a keyset position as an opaque URL-safe cursor"""
+    return base64.urlsafe_b64encode(json.dumps(key).encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    """Decode a cursor produced by _encode_cursor, raising ValueError if malformed"""
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
 
 
 # Global service instance
@@ -0,0 +1,155 @@
+"""
+Write-behind queue for chat message persistence.
+
+Message inserts from all conversations are queued and written by a single
+background thread, one group commit per interval, instead of one SQLite
+commit per message on the request path.
+
+A group commit that fails is logged and its messages are kept, in order,
+and retried ahead of newer ones every interval; flush() reports whether
+everything queued so far reached the database.
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from ragbase.config import Config
+from ragbase.tracing import span
+from shared.chat_storage import ChatStorage
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class QueuedMessage(NamedTuple):
+    """One message insert, in the field order ChatStorage.save_messages expects"""
+    conversation_id: str
+    role: str
+    content: str
+    timestamp: Optional[str] = None
+    # Applied as the conversation title if this is its first user message
+    first_user_title: Optional[str] = None
+    # A message whose id is already stored is skipped
+    message_id: Optional[str] = None
+    is_partial: bool = False
+
+
+class MessageWriteQueue:
+    def __init__(
+        self,
+        storage: ChatStorage,
+        interval_ms: int = Config.Storage.WRITE_BEHIND_INTERVAL_MS,
+        max_batch: int = Config.Storage.WRITE_BEHIND_MAX_BATCH
+    ):
+        self.storage = storage
+        self.interval = interval_ms / 1000
+        self.max_batch = max_batch
+        self._queue = queue.Queue()
+        self._pending = 0
+        # Messages of failed group commits, retried first (writer thread only)
+        self._failed: list = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def pending(self) -> int:
+        """Number of queued messages not yet committed"""
+        return self._pending
+
+    def start(self):
+        """Start the background writer thread"""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(
+                target=self._run, name="message-writer", daemon=True
+            )
+            self._thread.start()
+
+    def put(self, message: QueuedMessage):
+        """Queue a message for the next group commit"""
+        if self._thread is None or not self._thread.is_alive():
+            # Writer not running (not started or already stopped): write
+            # through, so a failure reaches the caller
+            with span("db_write"):
+                self.storage.save_messages([message])
+            return
+        with self._lock:
+            self._pending += 1
+        self._queue.put(message)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every message queued so far is committed.
+        
+        Returns False if some could not be written (they stay queued for
+        retry) or the timeout expired first.
+        """
+        if self._thread is None or not self._thread.is_alive():
+            return not self._failed
+        if self._pending == 0:
+            return True
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout) and not self._failed
+
+    def stop(self, timeout: Optional[float] = None):
+        """Flush remaining messages and stop the writer thread"""
+        if self._thread is None:
+            return
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            try:
+                # With failed messages kept, wake up every interval to retry them
+                batch = [self._queue.get(timeout=self.interval if self._failed else None)]
+            except queue.Empty:
+                self._write([])
+                continue
+            deadline = time.monotonic() + self.interval
+
+            # Collect more messages until the interval elapses, the batch is
+            # full, or someone is waiting on a flush/stop
+            while (
+                len(batch) < self.max_batch
+                and isinstance(batch[-1], QueuedMessage)
+            ):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            self._write([item for item in batch if isinstance(item, QueuedMessage)])
+
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if batch[-1] is _STOP:
+                if self._failed:
+                    logger.error(f"Writer stopped, {len(self._failed)} queued messages were not persisted")
+                return
+
+    def _write(self, messages: list):
+        """Group-commit the kept failed messages, then `messages`"""
+        batch = self._failed + messages
+        if not batch:
+            return
+        try:
+            with span("db_write"):
+                self.storage.save_messages(batch)
+        except Exception:
+            # Already stored message ids are skipped, so retrying the whole batch is safe
+            if not self._failed:  # Log the first failure, not every retry
+                logger.exception(f"Failed to persist {len(batch)} queued messages, retrying")
+            self._failed = batch
+            return
+        self._failed = []
+        with self._lock:
+            self._pending -= len(batch)
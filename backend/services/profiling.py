@@ -0,0 +1,190 @@
+"""
+Sampling profiler for slow chat requests.
+
+While at least one profiled request is in flight, a background thread
+samples the stacks of all threads every SAMPLE_INTERVAL_MS. Each request
+collects the samples taken during its lifetime; if it ends up slower than
+SLOW_REQUEST_SECONDS they are written to the profile directory in the
+collapsed-stack ("folded") format read by flamegraph.pl and speedscope.
+Only the newest MAX_PROFILES files are kept.
+
+Samples are wall-clock and process-wide: under concurrent load a profile
+also shows what other requests were doing while this one was slow.
+"""
+
+import datetime
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ragbase.config import Config
+
+PROFILE_SUFFIX = ".folded"
+# <timestamp>_<duration>ms_<label>.folded
+_PROFILE_NAME = re.compile(r"^(\d{8}T\d{6}_\d{6})_(\d+)ms_([\w.-]+)\.folded$")
+
+
+def _fold(thread_name: str, frame) -> str:
+    """One stack as "thread;outer;...;inner", functions named by definition site"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})")
+        frame = frame.f_back
+    names.append(thread_name)
+    return ";".join(reversed(names))
+
+
+class ProfileSession:
+    def __init__(self, label: str):
+        self.label = label
+        self.started = time.perf_counter()
+        self.samples: Counter = Counter()
+
+    def add(self, stacks: List[str]):
+        self.samples.update(stacks)
+
+
+class _StackSampler:
+    """Samples all threads while any session is active"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, session: ProfileSession):
+        with self._lock:
+            self._sessions.add(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+
+    def remove(self, session: ProfileSession):
+        with self._lock:
+            self._sessions.discard(session)
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                if not self._sessions:
+                    self._thread = None
+                    return
+                sessions = list(self._sessions)
+
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            stacks = [
+                _fold(thread_names.get(ident, f"thread-{ident}"), frame)
+                for ident, frame in sys._current_frames().items()
+                if ident != own_ident
+            ]
+            for session in sessions:
+                session.add(stacks)
+            time.sleep(self.interval)
+
+
+class SlowRequestProfiler:
+    def __init__(
+        self,
+        directory: Path = Config.Path.PROFILES_DIR,
+        threshold: float = Config.Profiling.SLOW_REQUEST_SECONDS,
+        max_profiles: int = Config.Profiling.MAX_PROFILES,
+        interval_ms: int = Config.Profiling.SAMPLE_INTERVAL_MS
+    ):
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.max_profiles = max_profiles
+        self._sampler = _StackSampler(interval_ms / 1000)
+
+    @contextmanager
+    def session(self, label: str):
+        """Sample for the duration of the block; keep the profile if it was slow"""
+        session = ProfileSession(label)
+        self._sampler.add(session)
+        try:
+            yield session
+        finally:
+            self._sampler.remove(session)
+            duration = time.perf_counter() - session.started
+            if duration >= self.threshold and session.samples:
+                try:
+                    self._save(session, duration)
+                except OSError as e:
+                    print(f"❌ Failed to save profile for {label}: {e}")
+
+    def _save(self, session: ProfileSession, duration: float):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        timestamp = datetime.datetime.now().strftime("%Y%m%dT%H%M%S_%f")
+        label = re.sub(r"[^\w.-]+", "-", session.label).strip("-") or "request"
+        path = self.directory / f"{timestamp}_{int(duration * 1000)}ms_{label}{PROFILE_SUFFIX}"
+        path.write_text(
+            "".join(f"{stack} {count}\n" for stack, count in session.samples.most_common()),
+            encoding="utf-8"
+        )
+        print(f"🐢 Slow request {session.label} took {duration:.2f}s, profile saved to {path.name}")
+        self._rotate()
+
+    def _rotate(self):
+        profiles = sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"))
+        for path in profiles[:-self.max_profiles]:
+            path.unlink(missing_ok=True)
+
+    def list_profiles(self) -> List[Dict]:
+        """Saved profiles, newest first"""
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in sorted(self.directory.glob(f"*{PROFILE_SUFFIX}"), reverse=True):
+            match = _PROFILE_NAME.match(path.name)
+            if match is None:
+                continue
+            profiles.append({
+                "name": path.name,
+                "created_at": datetime.datetime.strptime(match.group(1), "%Y%m%dT%H%M%S_%f").isoformat(),
+                "duration_ms": int(match.group(2)),
+                "request": match.group(3),
+                "size_bytes": path.stat().st_size,
+            })
+        return profiles
+
+    def read_profile(self, name: str) -> Optional[str]:
+        """Contents of a saved profile, or None if there is no such profile"""
+        # Only names produced by _save are served, so no path can escape the directory
+        if _PROFILE_NAME.match(name) is None:
+            return None
+        path = self.directory / name
+        return path.read_text(encoding="utf-8") if path.exists() else None
+
+    @staticmethod
+    def top_frames(folded: str, limit: int = 30) -> List[Dict]:
+        """Hottest functions of a folded profile by self samples (innermost frame)"""
+        self_samples: Counter = Counter()
+        total = 0
+        for line in folded.splitlines():
+            stack, _, count = line.rpartition(" ")
+            if not stack:
+                continue
+            self_samples[stack.rsplit(";", 1)[-1]] += int(count)
+            total += int(count)
+        return [
+            {"frame": frame, "samples": samples, "percent": round(100 * samples / total, 1)}
+            for frame, samples in self_samples.most_common(limit)
+        ]
+
+
+# Global profiler instance
+slow_request_profiler = None
+
+def get_slow_request_profiler() -> SlowRequestProfiler:
+    """Get or create slow request profiler instance"""
+    global slow_request_profiler
+    if slow_request_profiler is None:
+        slow_request_profiler = SlowRequestProfiler()
+    return slow_request_profiler
@@ -0,0 +1,248 @@
+"""
+Streaming helpers for chat responses.
+
+Provides token coalescing, a fast JSON encoder and a registry of in-flight
+chat streams whose encoded events can be replayed when a client reconnects
+with Last-Event-ID.
+"""
+
+import asyncio
+import json
+import time
+from typing import AsyncGenerator, AsyncIterator, Dict, List, Optional, Tuple
+
+from ragbase.config import Config
+
+from backend.models import StreamChunk
+
+try:
+    import orjson
+
+    def encode_json(data: dict) -> str:
+        """Serialize to compact JSON (orjson)"""
+        return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+except ImportError:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def encode_json(data: dict) -> str:
+        """Serialize to compact JSON (stdlib fallback)"""
+        return _encoder.encode(data)
+
+
+def encode_chunk(chunk: StreamChunk) -> str:
+    """Encode a StreamChunk once, falling back to an error chunk if it cannot be serialized"""
+    try:
+        return encode_json(chunk.model_dump())
+    except Exception as e:
+        return encode_json({
+            "type": "error",
+            "content": f"Serialization error: {str(e)}",
+            "conversation_id": chunk.conversation_id
+        })
+
+
+async def coalesce_tokens(
+    chunks: AsyncIterator[StreamChunk],
+    max_delay_ms: int = Config.Streaming.COALESCE_MS,
+    max_chars: int = Config.Streaming.COALESCE_CHARS
+) -> AsyncGenerator[StreamChunk, None]:
+    """Merge consecutive token chunks, flushing every `max_delay_ms` or `max_chars`.
+
+    Non-token chunks flush pending tokens first and are passed through as-is.
+    """
+    loop = asyncio.get_running_loop()
+    iterator = chunks.__aiter__()
+    pending: List[str] = []
+    pending_chars = 0
+    conversation_id = None
+    deadline = None
+    next_chunk = None
+
+    def merged() -> StreamChunk:
+        return StreamChunk(type="token", content="".join(pending), conversation_id=conversation_id)
+
+    try:
+        while True:
+            if next_chunk is None:
+                next_chunk = asyncio.ensure_future(iterator.__anext__())
+
+            timeout = None if deadline is None else max(0.0, deadline - loop.time())
+            done, _ = await asyncio.wait({next_chunk}, timeout=timeout)
+            if not done:
+                # Flush interval elapsed while waiting for the next token
+                yield merged()
+                pending, pending_chars, deadline = [], 0, None
+                continue
+
+            try:
+                chunk = next_chunk.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                next_chunk = None
+
+            if chunk.type == "token":
+                if not pending:
+                    deadline = loop.time() + max_delay_ms / 1000
+                pending.append(chunk.content)
+                pending_chars += len(chunk.content)
+                conversation_id = chunk.conversation_id
+                if pending_chars >= max_chars:
+                    yield merged()
+                    pending, pending_chars, deadline = [], 0, None
+                continue
+
+            if pending:
+                yield merged()
+                pending, pending_chars, deadline = [], 0, None
+            yield chunk
+
+        if pending:
+            yield merged()
+    finally:
+        if next_chunk is not None:
+            next_chunk.cancel()
+
+
+class ChatStream:
+    """Encoded events of one chat response; event ids are 1-based positions.
+
+    When the last subscriber detaches before the stream is done and nobody
+    re-attaches within `abandon_grace` seconds, the producer task is cancelled.
+    """
+
+    def __init__(self, key: str, abandon_grace: float = Config.Streaming.ABANDON_GRACE_SECONDS):
+        self.key = key
+        self.events: List[str] = []
+        self.done = False
+        self.finished_at: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+        self.abandon_grace = abandon_grace
+        self.subscribers = 0
+        self._abandon_timer: Optional[asyncio.TimerHandle] = None
+        self._changed = asyncio.Condition()
+
+    async def append(self, payload: str):
+        async with self._changed:
+            self.events.append(payload)
+            self._changed.notify_all()
+
+    async def finish(self):
+        async with self._changed:
+            self.done = True
+            self.finished_at = time.monotonic()
+            self._changed.notify_all()
+
+    async def subscribe(
+        self,
+        after: int = 0,
+        heartbeat: float = Config.Streaming.HEARTBEAT_SECONDS
+    ) -> AsyncGenerator[Optional[Tuple[int, str]], None]:
+        """Yield (event_id, payload) for events after `after`, or None as a heartbeat tick"""
+        self._attach()
+        try:
+            position = after
+            while True:
+                timed_out = False
+                async with self._changed:
+                    if position >= len(self.events) and not self.done:
+                        try:
+                            await asyncio.wait_for(self._changed.wait(), heartbeat)
+                        except asyncio.TimeoutError:
+                            timed_out = True
+                    new_events = self.events[position:]
+                    done = self.done
+
+                for payload in new_events:
+                    position += 1
+                    yield position, payload
+
+                if done and position >= len(self.events):
+                    return
+                if timed_out and not new_events:
+                    yield None
+        finally:
+            # Runs when the response generator is closed, e.g. on client disconnect
+            self._detach()
+
+    def _attach(self):
+        self.subscribers += 1
+        if self._abandon_timer is not None:
+            self._abandon_timer.cancel()
+            self._abandon_timer = None
+
+    def _detach(self):
+        self.subscribers -= 1
+        if self.subscribers == 0:
+            self.arm_abandon_timer()
+
+    def arm_abandon_timer(self):
+        """Cancel the producer unless a subscriber attaches within the grace period"""
+        if not self.done and self._abandon_timer is None:
+            self._abandon_timer = asyncio.get_running_loop().call_later(
+                self.abandon_grace, self._cancel_if_abandoned
+            )
+
+    def _cancel_if_abandoned(self):
+        self._abandon_timer = None
+        if self.subscribers == 0 and not self.done and self.task is not None:
+            print(f"🔌 Client gone, cancelling generation {self.key}")
+            self.task.cancel()
+
+
+class StreamRegistry:
+    """In-flight and recently finished chat streams, keyed by user message id"""
+
+    def __init__(self, resume_ttl: float = Config.Streaming.RESUME_TTL_SECONDS):
+        self.resume_ttl = resume_ttl
+        self._streams: Dict[str, ChatStream] = {}
+
+    def get(self, key: str) -> Optional[ChatStream]:
+        """Get a stream that can still be resumed"""
+        self._evict_expired()
+        return self._streams.get(key)
+
+    def start(self, key: str, chunks: AsyncIterator[StreamChunk]) -> ChatStream:
+        """Run `chunks` in a background task, recording encoded events on a new stream"""
+        self._evict_expired()
+        stream = ChatStream(key)
+        self._streams[key] = stream
+        stream.task = asyncio.create_task(self._produce(stream, chunks))
+        # Also covers a client that disconnects before the response starts
+        stream.arm_abandon_timer()
+        return stream
+
+    async def _produce(self, stream: ChatStream, chunks: AsyncIterator[StreamChunk]):
+        try:
+            async for chunk in chunks:
+                await stream.append(encode_chunk(chunk))
+        except asyncio.CancelledError:
+            pass  # Abandoned by the client; the reply was saved as partial
+        except Exception as e:
+            await stream.append(encode_json({
+                "type": "error",
+                "content": f"Stream error: {str(e)}",
+                "conversation_id": None
+            }))
+        finally:
+            await stream.finish()
+
+    def _evict_expired(self):
+        now = time.monotonic()
+        expired = [
+            key for key, stream in self._streams.items()
+            if stream.done and now - stream.finished_at > self.resume_ttl
+        ]
+        for key in expired:
+            del self._streams[key]
+
+
+# Global registry instance
+stream_registry = None
+
+def get_stream_registry() -> StreamRegistry:
+    """Get or create stream registry instance"""
+    global stream_registry
+    if stream_registry is None:
+        stream_registry = StreamRegistry()
+    return stream_registry
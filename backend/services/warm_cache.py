@@ -0,0 +1,111 @@
+"""
+Warm-cache snapshot: keep the query-path caches across backend restarts.
+
+On shutdown the HyDE results, cached query embeddings and LLM routing
+decisions are written to Config.Path.WARM_CACHE_FILE; on startup they are
+loaded back before /ready turns green. Query vectors are stored as base64
+float32 and dropped if the snapshot was taken with another embedding model.
+A cache is only saved if the service loaded the model that fills it, so
+entries from stand-ins set on the service by hand (benchmark fakes) never
+reach the snapshot.
+"""
+
+import array
+import base64
+import datetime
+import json
+import os
+from pathlib import Path
+from typing import Dict, List
+
+from ragbase.chain import ROUTE_CACHE
+from ragbase.config import Config
+
+SNAPSHOT_VERSION = 1
+
+# Snapshotted cache -> ChatService component that produces its entries
+CACHE_PRODUCERS = {
+    "hyde": "hyde_transformer",
+    "query_embeddings": "embedding_model",
+    "routes": "llm",
+}
+
+
+def _encode_vector(vector: List[float]) -> str:
+    return base64.b64encode(array.array("f", vector).tobytes()).decode("ascii")
+
+
+def _decode_vector(encoded: str) -> List[float]:
+    vector = array.array("f")
+    vector.frombytes(base64.b64decode(encoded))
+    return vector.tolist()
+
+
+class WarmCacheSnapshot:
+    def __init__(self, path: Path = Config.Path.WARM_CACHE_FILE):
+        self.path = Path(path)
+
+    @staticmethod
+    def _caches(chat_service) -> Dict:
+        """The snapshotted caches of a service; fakes without a cache are skipped"""
+        return {
+            "hyde": getattr(chat_service.hyde_transformer, "cache", None),
+            "query_embeddings": getattr(chat_service.embedding_model, "cache", None),
+            "routes": ROUTE_CACHE,
+        }
+
+    def save(self, chat_service) -> Dict[str, int]:
+        """Write the caches to the snapshot file; entry counts per cache"""
+        caches = self._caches(chat_service)
+        for name, producer in CACHE_PRODUCERS.items():
+            if producer not in chat_service.load_seconds:
+                caches[name] = None  # Not filled by a model the service loaded
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "saved_at": datetime.datetime.now().isoformat(),
+            "embeddings_model": Config.Model.EMBEDDINGS,
+        }
+        for name, cache in caches.items():
+            items = cache.items() if cache is not None else []
+            if name == "query_embeddings":
+                items = [(text, _encode_vector(vector)) for text, vector in items]
+            snapshot[name] = [list(item) for item in items]
+
+        # Write then rename, so a crash (or another worker saving) never leaves a torn file
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(snapshot, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        return {name: len(snapshot[name]) for name in caches}
+
+    def restore(self, chat_service) -> Dict[str, int]:
+        """Load the snapshot file into the caches; entry counts per cache"""
+        if not self.path.exists():
+            return {}
+        snapshot = json.loads(self.path.read_text(encoding="utf-8"))
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            return {}
+
+        restored = {}
+        for name, cache in self._caches(chat_service).items():
+            items = snapshot.get(name, [])
+            if cache is None or not items:
+                continue
+            if name == "query_embeddings":
+                if snapshot.get("embeddings_model") != Config.Model.EMBEDDINGS:
+                    continue
+                items = [(text, _decode_vector(encoded)) for text, encoded in items]
+            cache.load(items)
+            restored[name] = len(items)
+        return restored
+
+
+# Global snapshot instance
+warm_cache_snapshot = None
+
+def get_warm_cache_snapshot() -> WarmCacheSnapshot:
+    """Get or create warm cache snapshot instance"""
+    global warm_cache_snapshot
+    if warm_cache_snapshot is None:
+        warm_cache_snapshot = WarmCacheSnapshot()
+    return warm_cache_snapshot
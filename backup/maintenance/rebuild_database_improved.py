@@ -4,8 +4,11 @@ Script để rebuild toàn bộ vector database với format mới
 Includes improved best answer matching và clean text formatting
 """
 
+import argparse
+import numpy as np
 import pandas as pd
 import logging
+import time
 from datetime import datetime
 import ast
 import json
@@ -29,9 +32,27 @@ logger = logging.getLogger(__name__)
 class ImprovedIngestor:
     """Improved ingestor với clean formatting và best answer matching"""
     
-    def __init__(self):
+    def __init__(self, embed_batch_size=Config.Ingestion.EMBED_BATCH_SIZE):
         self.ingestor = Ingestor()
         self.client = QdrantClient(host="localhost", port=6333, prefer_grpc=False)
+        # Texts per embed_documents call (one batched forward pass each)
+        self.embed_batch_size = embed_batch_size
+        self.stats = {}
+    
+    def _reset_stats(self):
+        self.stats = {"documents": 0, "points": 0, "embed_seconds": 0.0, "upsert_seconds": 0.0,
+                      "started": time.perf_counter()}
+    
+    def _log_throughput(self, label, total_rows, processed_rows):
+        """Progress line with throughput since the collection started"""
+        elapsed = time.perf_counter() - self.stats["started"]
+        rate = self.stats["documents"] / elapsed if elapsed else 0.0
+        eta = (total_rows - processed_rows) / (processed_rows / elapsed) if processed_rows and elapsed else 0.0
+        logger.info(
+            f"📈 {label}: {processed_rows}/{total_rows} rows, {self.stats['points']} points - "
+            f"{rate:.1f} docs/s, embed {self.stats['embed_seconds']:.0f}s, "
+            f"upsert {self.stats['upsert_seconds']:.0f}s, ETA {eta / 60:.1f} min"
+        )
         
     def clean_answer_text(self, answer_text):
         """Clean answer text bỏ brackets và format lại"""
@@ -51,24 +72,54 @@ class ImprovedIngestor:
         return answer_text.strip()
     
     def find_best_answer_match(self, best_answer, answers, threshold=0.8):
-        """Tìm best answer trong danh sách answers với similarity matching"""
+        """Tìm best answer trong danh sách answers với similarity matching
+        
+        Returns (index, SequenceMatcher ratio) of the first exact match, else of
+        the most similar answer if its ratio reaches threshold, else (-1, ratio).
+        Below the threshold the ratio is the best one computed, not necessarily
+        the best overall: answers that cannot reach the threshold are skipped.
+        """
         if not best_answer or not answers:
             return -1, 0.0
         
         best_answer = self.clean_answer_text(best_answer)
+        answers = [self.clean_answer_text(answer) for answer in answers]
+        
+        # Exact match first
+        if best_answer in answers:
+            return answers.index(best_answer), 1.0
+        
+        return self._most_similar_answer(best_answer, enumerate(answers), threshold)
+    
+    @staticmethod
+    def _most_similar_answer(best_answer, candidates, threshold):
+        """Highest SequenceMatcher ratio among (index, answer) candidates, pruned by upper bounds.
+        
+        real_quick_ratio (lengths) and quick_ratio (character counts) bound
+        ratio() from above, so answers whose bound is under the threshold are
+        never scored, and the rest are scored in decreasing bound order until
+        no bound can beat the best ratio. Ties go to the lowest index, as in a
+        plain left-to-right scan.
+        """
+        # best_answer is seq1 and each answer seq2, as before: ratio() is not symmetric
+        matcher = difflib.SequenceMatcher(None, best_answer)
+        bounded = []
+        for i, answer in candidates:
+            matcher.set_seq2(answer)
+            if matcher.real_quick_ratio() < threshold:
+                continue
+            bound = matcher.quick_ratio()
+            if bound >= threshold and bound > 0:
+                bounded.append((-bound, i, answer))
+        
         max_ratio = 0.0
         best_index = -1
-        
-        for i, answer in enumerate(answers):
-            answer = self.clean_answer_text(answer)
-            
-            # Exact match first
-            if answer == best_answer:
-                return i, 1.0
-            
-            # Similarity matching
-            ratio = difflib.SequenceMatcher(None, best_answer, answer).ratio()
-            if ratio > max_ratio:
+        for negative_bound, i, answer in sorted(bounded):
+            if -negative_bound < max_ratio or (-negative_bound == max_ratio and i > best_index):
+                break
+            matcher.set_seq2(answer)
+            ratio = matcher.ratio()
+            if ratio > max_ratio or (ratio == max_ratio and i < best_index):
                 max_ratio = ratio
                 best_index = i
         
@@ -77,39 +128,89 @@ class ImprovedIngestor:
         
         return -1, max_ratio
     
-    def create_regular_document(self, row, doc_id):
-        """Tạo document cho regular collection với format mới"""
+    def match_best_answers(self, best_answers, answers_lists, threshold=0.8):
+        """find_best_answer_match for whole columns, one (index, ratio) per row.
+        
+        Answers of all rows are exploded into one frame, so exact matches and
+        the length bound are computed column-wise; SequenceMatcher only runs on
+        the rows without an exact match that still have candidates.
+        """
+        rows = pd.DataFrame({"best_answer": list(best_answers), "answers": list(answers_lists)})
+        results = [(-1, 0.0)] * len(rows)
+        rows = rows[rows["best_answer"].map(bool) & rows["answers"].map(bool)].reset_index()
+        if rows.empty:
+            return results
+        
+        exploded = rows["answers"].explode()
+        pairs = pd.DataFrame({
+            "row": exploded.index,
+            "position": exploded.groupby(level=0).cumcount().to_numpy(),
+            "answer": exploded.map(self.clean_answer_text).to_numpy(),
+            "best_answer": rows["best_answer"].map(self.clean_answer_text).to_numpy()[exploded.index.to_numpy()],
+        })
+        
+        # Exact match first: the first exact position of a row wins outright
+        exact = pairs[pairs["answer"] == pairs["best_answer"]].groupby("row")["position"].min()
+        for row, position in exact.items():
+            results[rows.at[row, "index"]] = (int(position), 1.0)
+        
+        # Length bound (real_quick_ratio) for every remaining pair at once
+        best_lengths = pairs["best_answer"].str.len().to_numpy()
+        answer_lengths = pairs["answer"].str.len().to_numpy()
+        with np.errstate(invalid="ignore"):
+            bound = 2.0 * np.minimum(best_lengths, answer_lengths) / (best_lengths + answer_lengths)
+        candidates = pairs[~pairs["row"].isin(exact.index) & (bound >= threshold)]
+        
+        for row, group in candidates.groupby("row", sort=False):
+            results[rows.at[row, "index"]] = self._most_similar_answer(
+                group["best_answer"].iat[0], zip(group["position"].tolist(), group["answer"]), threshold
+            )
+        return results
+    
+    def parse_answers(self, row):
+        """Answers of a row: the 'answers' list column, else the answer1..answer5 columns"""
+        answers = []
+        if 'answers' in row and pd.notna(row['answers']):
+            answers_raw = str(row['answers'])
+            try:
+                if answers_raw.startswith('[') and answers_raw.endswith(']'):
+                    answers = ast.literal_eval(answers_raw)
+                else:
+                    answers = [answers_raw]
+            except:
+                answers = [answers_raw]
+        else:
+            # Get from individual answer columns
+            for col in ['answer1', 'answer2', 'answer3', 'answer4', 'answer5']:
+                if col in row and pd.notna(row.get(col)):
+                    answer_text = str(row.get(col))
+                    if answer_text.strip():
+                        answers.append(answer_text.strip())
+        return answers
+    
+    def create_regular_document(self, row, doc_id, answers=None, match=None):
+        """Tạo document cho regular collection với format mới
+        
+        answers and match (see match_best_answers) may be precomputed for the
+        whole dataframe; they are parsed and matched here otherwise.
+        """
         try:
             # Extract data
             question = str(row.get('question', ''))
             labels = str(row.get('labels', ''))
             best_answer = str(row.get('best_answer', ''))
             
-            # Parse answers
-            answers = []
-            if 'answers' in row and pd.notna(row['answers']):
-                answers_raw = str(row['answers'])
-                try:
-                    if answers_raw.startswith('[') and answers_raw.endswith(']'):
-                        answers = ast.literal_eval(answers_raw)
-                    else:
-                        answers = [answers_raw]
-                except:
-                    answers = [answers_raw]
-            else:
-                # Get from individual answer columns
-                for col in ['answer1', 'answer2', 'answer3', 'answer4', 'answer5']:
-                    if col in row and pd.notna(row.get(col)):
-                        answer_text = str(row.get(col))
-                        if answer_text.strip():
-                            answers.append(answer_text.strip())
+            # Parse answers (a copy: the best answer may be appended below)
+            answers = list(self.parse_answers(row) if answers is None else answers)
             
             if not answers:
                 logger.warning(f"No answers found for row {doc_id}")
                 return None
             
             # Find best answer match
-            best_index, similarity = self.find_best_answer_match(best_answer, answers)
+            if match is None:
+                match = self.find_best_answer_match(best_answer, answers)
+            best_index, similarity = match
             
             # If no good match found, add best answer to list
             if best_index < 0 and best_answer:
@@ -225,17 +326,25 @@ class ImprovedIngestor:
         )
         logger.info("Created new 'summary' collection")
     
-    def ingest_regular_documents(self, excel_path, batch_size=100):
+    def ingest_regular_documents(self, excel_path, batch_size=500):
         """Ingest regular documents"""
         logger.info(f"📄 Loading regular data from {excel_path}")
         df = pd.read_excel(excel_path)
         logger.info(f"📊 Loaded {len(df)} regular records")
         
+        # Best answers are matched for all rows up front
+        match_start = time.perf_counter()
+        answers_lists = [self.parse_answers(row) for _, row in df.iterrows()]
+        best_answers = [str(value) for value in df['best_answer']] if 'best_answer' in df else [''] * len(df)
+        matches = self.match_best_answers(best_answers, answers_lists)
+        logger.info(f"🎯 Matched best answers in {time.perf_counter() - match_start:.1f}s")
+        
         documents = []
         failed_count = 0
         processed_count = 0
         
         logger.info(f"🔄 Starting processing with batch size {batch_size}...")
+        self._reset_stats()
         
         for i, row in df.iterrows():
             # Log progress every 1000 records
@@ -243,7 +352,7 @@ class ImprovedIngestor:
                 progress = (i / len(df)) * 100
                 logger.info(f"📈 Progress: {i}/{len(df)} ({progress:.1f}%) - Success: {processed_count}, Failed: {failed_count}")
             
-            doc = self.create_regular_document(row, i)
+            doc = self.create_regular_document(row, i, answers_lists[i], matches[i])
             if doc:
                 documents.append(doc)
                 processed_count += 1
@@ -259,17 +368,17 @@ class ImprovedIngestor:
                 if i < 10:  # Log first few failures
                     logger.warning(f"❌ Failed to create document for row {i+1}")
             
-            # Process in batches
-            if len(documents) >= batch_size:
+            # Process in batches; the last rows go to the final (waiting) batch
+            if len(documents) >= batch_size and i < len(df) - 1:
                 logger.info(f"🚀 Ingesting batch: {len(documents)} documents (rows {i-len(documents)+2}-{i+1})")
                 self._ingest_batch(documents, "documents")
-                logger.info(f"✅ Batch completed. Total processed: {i+1}/{len(df)}")
+                self._log_throughput("Regular", len(df), i + 1)
                 documents = []
         
-        # Process remaining documents
-        if documents:
-            logger.info(f"🚀 Ingesting final batch: {len(documents)} documents")
-            self._ingest_batch(documents, "documents")
+        # Final batch waits for Qdrant to apply all queued upserts before counting
+        logger.info(f"🚀 Ingesting final batch: {len(documents)} documents")
+        self._ingest_batch(documents, "documents", wait=True)
+        self._log_throughput("Regular", len(df), len(df))
         
         logger.info(f"✅ Regular documents ingestion completed!")
         logger.info(f"📊 Results: Success: {processed_count}, Failed: {failed_count}, Total: {len(df)}")
@@ -278,7 +387,7 @@ class ImprovedIngestor:
         collection_info = self.client.get_collection("documents")
         logger.info(f"🎯 Final 'documents' collection size: {collection_info.points_count} points")
     
-    def ingest_summary_documents(self, excel_path, batch_size=100):
+    def ingest_summary_documents(self, excel_path, batch_size=500):
         """Ingest summary documents"""
         logger.info(f"📋 Loading summary data from {excel_path}")
         
@@ -294,6 +403,7 @@ class ImprovedIngestor:
         processed_count = 0
         
         logger.info(f"🔄 Starting summary processing with batch size {batch_size}...")
+        self._reset_stats()
         
         for i, row in df.iterrows():
             # Log progress every 1000 records
@@ -316,17 +426,17 @@ class ImprovedIngestor:
                 if i < 10:  # Log first few failures
                     logger.warning(f"❌ Failed to create summary document for row {i+1}")
             
-            # Process in batches
-            if len(documents) >= batch_size:
+            # Process in batches; the last rows go to the final (waiting) batch
+            if len(documents) >= batch_size and i < len(df) - 1:
                 logger.info(f"🚀 Ingesting summary batch: {len(documents)} documents (rows {i-len(documents)+2}-{i+1})")
                 self._ingest_batch(documents, "summary")
-                logger.info(f"✅ Summary batch completed. Total processed: {i+1}/{len(df)}")
+                self._log_throughput("Summary", len(df), i + 1)
                 documents = []
         
-        # Process remaining documents
-        if documents:
-            logger.info(f"🚀 Ingesting final summary batch: {len(documents)} documents")
-            self._ingest_batch(documents, "summary")
+        # Final batch waits for Qdrant to apply all queued upserts before counting
+        logger.info(f"🚀 Ingesting final summary batch: {len(documents)} documents")
+        self._ingest_batch(documents, "summary", wait=True)
+        self._log_throughput("Summary", len(df), len(df))
         
         logger.info(f"✅ Summary documents ingestion completed!")
         logger.info(f"📊 Summary Results: Success: {processed_count}, Failed: {failed_count}, Total: {len(df)}")
@@ -335,9 +445,19 @@ class ImprovedIngestor:
         collection_info = self.client.get_collection("summary")
         logger.info(f"🎯 Final 'summary' collection size: {collection_info.points_count} points")
     
-    def _ingest_batch(self, documents, collection_name):
-        """Ingest a batch of documents"""
+    def _ingest_batch(self, documents, collection_name, wait=False):
+        """Ingest a batch of documents.
+        
+        Texts are embedded embed_batch_size at a time with embed_documents, and
+        the upsert does not wait for Qdrant to apply it (wait=False), so Qdrant
+        indexes this batch while the next one is embedded. Pass wait=True on the
+        last batch: Qdrant applies updates in order, so it returns once all
+        earlier ones are applied too.
+        """
         if not documents:
+            if wait:
+                # Nothing left to write, but still wait for the queued upserts
+                self.client.upsert(collection_name=collection_name, points=[], wait=True)
             return
         
         batch_start_time = datetime.now()
@@ -353,19 +473,17 @@ class ImprovedIngestor:
             
             logger.info(f"📄 After splitting: {len(documents)} → {len(final_documents)} documents")
             
-            # Create embeddings and points
+            # Create embeddings in batches (same vectors as embed_query, one forward pass per batch)
             logger.info(f"🧠 Creating embeddings for {len(final_documents)} documents...")
-            points = []
+            embed_start = time.perf_counter()
+            embeddings = []
+            for start in range(0, len(final_documents), self.embed_batch_size):
+                texts = [doc.page_content for doc in final_documents[start:start + self.embed_batch_size]]
+                embeddings.extend(self.ingestor.embeddings.embed_documents(texts))
+            self.stats["embed_seconds"] += time.perf_counter() - embed_start
             
-            for i, doc in enumerate(final_documents):
-                if i > 0 and i % 50 == 0:  # Log every 50 embeddings
-                    logger.info(f"   📊 Embedded {i}/{len(final_documents)} documents...")
-                
-                # Create embedding
-                embedding = self.ingestor.embeddings.embed_query(doc.page_content)
-                
-                # Create point
-                point = PointStruct(
+            points = [
+                PointStruct(
                     id=str(uuid.uuid4()),
                     vector=embedding,
                     payload={
@@ -373,17 +491,24 @@ class ImprovedIngestor:
                         **doc.metadata
                     }
                 )
-                points.append(point)
+                for doc, embedding in zip(final_documents, embeddings)
+            ]
             
             # Upsert to Qdrant
             logger.info(f"💾 Upserting {len(points)} points to Qdrant '{collection_name}'...")
+            upsert_start = time.perf_counter()
             self.client.upsert(
                 collection_name=collection_name,
-                points=points
+                points=points,
+                wait=wait
             )
+            self.stats["upsert_seconds"] += time.perf_counter() - upsert_start
+            self.stats["documents"] += len(documents)
+            self.stats["points"] += len(points)
             
             batch_time = (datetime.now() - batch_start_time).total_seconds()
-            logger.info(f"✅ Batch completed in {batch_time:.2f}s - {len(points)} points added to '{collection_name}'")
+            logger.info(f"✅ Batch completed in {batch_time:.2f}s - {len(points)} points added to '{collection_name}' "
+                        f"({len(documents) / batch_time:.1f} docs/s)")
             
         except Exception as e:
             logger.error(f"❌ Error ingesting batch to {collection_name}: {e}")
@@ -391,13 +516,20 @@ class ImprovedIngestor:
 
 def main():
     """Main rebuild function"""
+    parser = argparse.ArgumentParser(description="Rebuild the documents and summary collections")
+    parser.add_argument("--batch-size", type=int, default=500,
+                        help="Rows split, embedded and upserted per batch")
+    parser.add_argument("--embed-batch-size", type=int, default=Config.Ingestion.EMBED_BATCH_SIZE,
+                        help="Texts per embedding forward pass")
+    args = parser.parse_args()
+    
     start_time = datetime.now()
     logger.info("🚀 Starting complete database rebuild with new format")
     logger.info(f"⏰ Start time: {start_time.strftime('%Y-%m-%d %H:%M:%S')}")
     
     # Initialize ingestor
     logger.info("🔧 Initializing improved ingestor...")
-    ingestor = ImprovedIngestor()
+    ingestor = ImprovedIngestor(embed_batch_size=args.embed_batch_size)
     
     # Recreate collections
     logger.info("🗑️  Recreating collections...")
@@ -414,7 +546,7 @@ def main():
     # Ingest regular documents
     if regular_excel.exists():
         logger.info("📄 ========== STARTING REGULAR DOCUMENTS INGESTION ==========")
-        ingestor.ingest_regular_documents(regular_excel)
+        ingestor.ingest_regular_documents(regular_excel, batch_size=args.batch_size)
         logger.info("📄 ========== REGULAR DOCUMENTS COMPLETED ==========")
     else:
         logger.error(f"❌ Regular excel file not found: {regular_excel}")
@@ -423,7 +555,7 @@ def main():
     # Ingest summary documents
     if summary_excel.exists():
         logger.info("📋 ========== STARTING SUMMARY DOCUMENTS INGESTION ==========")
-        ingestor.ingest_summary_documents(summary_excel)
+        ingestor.ingest_summary_documents(summary_excel, batch_size=args.batch_size)
         logger.info("📋 ========== SUMMARY DOCUMENTS COMPLETED ==========")
     else:
         logger.warning(f"⚠️  Summary excel file not found: {summary_excel}")
@@ -0,0 +1,117 @@
+"""
+Best-answer matching of the rebuild tool: results and time against difflib.
+
+backup/maintenance/rebuild_database_improved.py marks the best answer of
+each row by matching the best_answer column against the row's answers.
+This compares, on every row of a workbook:
+
+    reference    the previous matcher (SequenceMatcher.ratio against every answer)
+    per_row      ImprovedIngestor.find_best_answer_match (exact lookup, bound pruning)
+    vectorized   ImprovedIngestor.match_best_answers over the whole dataframe
+
+The best index must be identical on every row, and so must the ratio of
+every row with a match; any difference fails the run. Rows without a match
+report their best computed ratio, which the rebuild tool does not use.
+
+Usage (from the project root):
+
+    python -m benchmarks.best_answer_match            # sample dataset
+    python -m benchmarks.best_answer_match --file data/mental_health_data_official.xlsx
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from backup.maintenance.rebuild_database_improved import ImprovedIngestor
+from ragbase.config import Config
+
+
+def reference_find_best_answer_match(matcher, best_answer, answers, threshold=0.8):
+    """The matcher as it was before: score every answer until an exact match"""
+    if not best_answer or not answers:
+        return -1, 0.0
+
+    best_answer = matcher.clean_answer_text(best_answer)
+    max_ratio = 0.0
+    best_index = -1
+
+    for i, answer in enumerate(answers):
+        answer = matcher.clean_answer_text(answer)
+        if answer == best_answer:
+            return i, 1.0
+        ratio = difflib.SequenceMatcher(None, best_answer, answer).ratio()
+        if ratio > max_ratio:
+            max_ratio = ratio
+            best_index = i
+
+    if max_ratio >= threshold:
+        return best_index, max_ratio
+    return -1, max_ratio
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - started
+
+
+def mismatches(expected, actual):
+    """Rows whose best index differs, or whose ratio differs on a match"""
+    return [
+        row for row, ((expected_index, expected_ratio), (index, ratio)) in enumerate(zip(expected, actual))
+        if expected_index != index or (index >= 0 and expected_ratio != ratio)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", type=Path, default=Config.Path.MINI_EXCEL_FILE, help="Excel file to match")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    args = parser.parse_args()
+
+    # Matching needs neither the embedding model nor Qdrant, so skip __init__
+    matcher = ImprovedIngestor.__new__(ImprovedIngestor)
+
+    df = pd.read_excel(args.file)
+    answers_lists = [matcher.parse_answers(row) for _, row in df.iterrows()]
+    best_answers = [str(value) for value in df['best_answer']]
+    pairs = list(zip(best_answers, answers_lists))
+
+    expected, reference_seconds = timed(lambda: [
+        reference_find_best_answer_match(matcher, best, answers, args.threshold) for best, answers in pairs
+    ])
+    results = {
+        "per_row": timed(lambda: [
+            matcher.find_best_answer_match(best, answers, args.threshold) for best, answers in pairs
+        ]),
+        "vectorized": timed(lambda: matcher.match_best_answers(best_answers, answers_lists, args.threshold)),
+    }
+
+    matched = sum(index >= 0 for index, _ in expected)
+    print(f"📊 {args.file.name}: {len(df)} rows, {sum(map(len, answers_lists))} answers, {matched} matched")
+    print(f"{'method':<12}{'seconds':>10}{'speedup':>10}{'mismatches':>12}")
+    print(f"{'reference':<12}{reference_seconds:>10.3f}{1:>9.1f}x{0:>12}")
+    failed = False
+    for method, (actual, seconds) in results.items():
+        rows = mismatches(expected, actual)
+        failed = failed or bool(rows)
+        print(f"{method:<12}{seconds:>10.3f}{reference_seconds / seconds:>9.1f}x{len(rows):>12}")
+        for row in rows[:5]:
+            print(f"   row {row}: expected {expected[row]}, got {actual[row]}")
+
+    if failed:
+        print("❌ Matchers disagree")
+        sys.exit(1)
+    print("✅ Identical best answers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Offline stand-ins for the paid or heavy models, for benchmarks.
+
+The fakes keep the interfaces the chat pipeline uses (langchain chat model,
+Embeddings, document compressor, HyDE transformer) and simulate their
+latency, so throughput can be measured without Gemini quota or GPU/CPU
+model weights.
+"""
+
+import asyncio
+import hashlib
+import math
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+FILLER_WORDS = "mình hiểu cảm giác của bạn lúc này và luôn ở đây lắng nghe bạn nhé".split()
+
+
+class FakeStreamingChatModel(BaseChatModel):
+    """Chat model that streams `response_tokens` words at `tokens_per_second`
+    after `first_token_latency` seconds. Non-streaming calls (LLM routing)
+    answer "full" after the first-token latency."""
+
+    first_token_latency: float = 0.3
+    tokens_per_second: float = 50.0
+    response_tokens: int = 120
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-streaming"
+
+    def _tokens(self) -> List[str]:
+        return [FILLER_WORDS[i % len(FILLER_WORDS)] + " " for i in range(self.response_tokens)]
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        time.sleep(self.first_token_latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="full"))])
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.first_token_latency)
+        for token in self._tokens():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            time.sleep(1 / self.tokens_per_second)
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.first_token_latency)
+        for token in self._tokens():
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            await asyncio.sleep(1 / self.tokens_per_second)
+
+
+class FakeEmbeddings(Embeddings):
+    """Deterministic hash-based vectors, `latency` seconds per call.
+
+    Blocking sleep stands in for the CPU-bound model, which holds a worker
+    thread for the same time (but, unlike the real model, not the GIL).
+    """
+
+    def __init__(self, size: int = 384, latency: float = 0.05):
+        self.size = size
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        values = [digest[i % len(digest)] / 255 - 0.5 + 0.001 * i for i in range(self.size)]
+        norm = math.sqrt(sum(v * v for v in values))
+        return [v / norm for v in values]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+
+class FakeReranker(BaseDocumentCompressor):
+    """Keeps the first `top_n` documents after `latency` seconds"""
+
+    latency: float = 0.03
+    top_n: int = 3
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        time.sleep(self.latency)
+        return list(documents)[:self.top_n]
+
+
+class FakeHyDE:
+    """HyDE transformer stand-in: returns the query unchanged after `latency` seconds"""
+
+    def __init__(self, latency: float = 0.2):
+        self.latency = latency
+
+    def transform_query(self, query: str, fast_mode: bool = False) -> str:
+        time.sleep(self.latency)
+        return query
+
+    async def atransform_query(self, query: str, fast_mode: bool = False) -> str:
+        await asyncio.sleep(self.latency)
+        return query
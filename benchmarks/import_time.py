@@ -0,0 +1,159 @@
+"""
+Import-time check for the backend process.
+
+Imports a module (backend.main by default) in a fresh interpreter under
+`python -X importtime`, then reports the slowest imports and the top-level
+packages that cost the most. The run fails if:
+
+- the total import time exceeds the budget (IMPORT_BUDGET_SECONDS, or --budget), or
+- any module in EAGER_FORBIDDEN gets imported. These are the model and
+  provider stacks that must only load inside the model factories, after the
+  server is already accepting connections. A module counts as imported if
+  it is in sys.modules after the import: -X importtime also lists imports
+  that failed (optional-dependency probes, absent packages), which do not.
+
+Timings vary between machines and with a cold disk cache, so the best of
+--repeat runs is used.
+
+Usage (from the project root):
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --module ragbase.chain --top 30
+
+tests/test_import_time.py runs the same checks under pytest.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Set, Tuple
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Printed before the sys.modules listing, after anything the module prints
+MODULES_MARKER = "--- sys.modules ---"
+
+# Budget for `import backend.main`, in seconds (server ready to bind the port)
+IMPORT_BUDGET_SECONDS = 3.0
+
+# Heavy provider modules that must not be imported by `import backend.main`
+EAGER_FORBIDDEN = (
+    "torch",
+    "transformers",
+    "sentence_transformers",
+    "flashrank",
+    "onnxruntime",
+    "google.generativeai",
+    "langchain_google_genai",
+    "langchain_groq",
+    "langchain_community.chat_models.ollama",
+)
+
+
+@dataclass
+class ImportRecord:
+    module: str
+    depth: int
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> List[ImportRecord]:
+    """Records of the `import time: self [us] | cumulative | imported package` lines"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue  # Header line
+        name = fields[2].rstrip()
+        module = name.lstrip()
+        # Nested imports are indented by two spaces per level
+        depth = (len(name) - len(module) - 1) // 2
+        records.append(ImportRecord(module, depth, int(fields[0]), int(fields[1])))
+    return records
+
+
+def measure(module: str, cwd: str = PROJECT_ROOT) -> Tuple[List[ImportRecord], Set[str]]:
+    """Import records and the modules loaded (sys.modules) after `import module`"""
+    # sys is always loaded, so listing sys.modules adds no import records
+    code = f"import {module}\nimport sys\nprint({MODULES_MARKER!r}, *sys.modules, sep='\\n')"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=cwd,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        error = result.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f"import {module} failed")
+    loaded = set(result.stdout.rsplit(MODULES_MARKER, 1)[-1].split())
+    return parse_importtime(result.stderr), loaded
+
+
+def total_seconds(records: List[ImportRecord]) -> float:
+    return sum(r.cumulative_us for r in records if r.depth == 0) / 1e6
+
+
+def by_package(records: List[ImportRecord]) -> Dict[str, int]:
+    """Self time in µs per top-level package"""
+    totals: Dict[str, int] = defaultdict(int)
+    for record in records:
+        totals[record.module.split(".", 1)[0]] += record.self_us
+    return totals
+
+
+def forbidden_imports(loaded: Iterable[str], forbidden: Iterable[str] = EAGER_FORBIDDEN) -> List[str]:
+    """Forbidden modules that were imported successfully"""
+    loaded = set(loaded)
+    return [name for name in forbidden if name in loaded]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.main", help="Module to import")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_SECONDS,
+                        help="Maximum total import time in seconds")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs; the fastest one is reported")
+    parser.add_argument("--top", type=int, default=15, help="Rows in each table")
+    args = parser.parse_args()
+
+    try:
+        runs = [measure(args.module) for _ in range(args.repeat)]
+    except RuntimeError as e:
+        print(f"❌ import {args.module} failed: {e}")
+        sys.exit(2)
+    records, loaded = min(runs, key=lambda run: total_seconds(run[0]))
+    total = total_seconds(records)
+
+    print(f"⏱️ import {args.module}: {total * 1000:.0f} ms "
+          f"(budget {args.budget * 1000:.0f} ms, best of {args.repeat})")
+
+    print(f"\n{'slowest imports (cumulative)':<60}{'ms':>10}")
+    for record in sorted(records, key=lambda r: r.cumulative_us, reverse=True)[:args.top]:
+        print(f"{record.module:<60}{record.cumulative_us / 1000:>10.1f}")
+
+    print(f"\n{'top-level packages (self)':<60}{'ms':>10}")
+    packages = sorted(by_package(records).items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in packages[:args.top]:
+        print(f"{package:<60}{self_us / 1000:>10.1f}")
+
+    failed = False
+    eager = forbidden_imports(loaded)
+    if eager:
+        print(f"\n❌ Imported eagerly (should load inside the model factories): {', '.join(eager)}")
+        failed = True
+    if total > args.budget:
+        print(f"\n❌ Import time {total:.2f}s is over the {args.budget:.2f}s budget")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("\n✅ Within budget, no eager provider imports")
+
+
+if __name__ == "__main__":
+    main()
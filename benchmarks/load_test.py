@@ -0,0 +1,263 @@
+"""
+Load test for the chat backend without external services.
+
+Boots backend.main:app under uvicorn with a fake streaming LLM, a fake HyDE
+transformer, fake embeddings/reranker (or the real local models with
+--real-models) and an in-memory Qdrant seeded from
+data/mental_health_data_official_mini.xlsx, then drives concurrent
+/api/chat/stream clients and reports TTFT, latency percentiles and
+requests/sec.
+
+Usage (from the project root):
+
+    python -m benchmarks.load_test --clients 16 --requests 10
+    python -m benchmarks.load_test --clients 32 --ttft-ms 800 --tokens-per-second 30 --json result.json
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from typing import List, Optional, Tuple
+
+import requests
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain.retrievers import ContextualCompressionRetriever
+from langchain_core.documents import Document
+from langchain_qdrant import QdrantVectorStore
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, VectorParams
+
+from ragbase.chain import create_chain
+from ragbase.config import Config
+from ragbase.limits import LimitedCompressor, LimitedEmbeddings
+from ragbase.retriever import create_optimized_retriever
+from ragbase.utils import load_documents_from_excel
+
+import backend.services.chat_service as chat_service_module
+import backend.services.conversation_service as conversation_service_module
+from backend.services.chat_service import ChatService
+from backend.services.conversation_service import ConversationService
+
+from benchmarks.fakes import FakeEmbeddings, FakeHyDE, FakeReranker, FakeStreamingChatModel
+
+
+@dataclass
+class RequestResult:
+    status: str  # ok / rejected / error
+    total: float
+    ttft: Optional[float] = None
+    tokens_per_second: Optional[float] = None
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered)) - 1))]
+
+
+def build_chat_service(args) -> Tuple[ChatService, List[Document]]:
+    """Wire a ChatService like ChatService._create_chain, but on fakes and an in-memory Qdrant"""
+    if args.real_models:
+        from ragbase.model import create_embeddings, create_reranker
+        embeddings, reranker = create_embeddings(), create_reranker()
+    else:
+        embeddings = FakeEmbeddings(latency=args.embed_ms / 1000)
+        reranker = FakeReranker(latency=args.rerank_ms / 1000)
+    embedding_model = LimitedEmbeddings(embeddings)
+
+    documents = load_documents_from_excel(Config.Path.MINI_EXCEL_FILE)
+    vector_size = len(embeddings.embed_query("probe"))
+    client = QdrantClient(":memory:")
+    stores = {}
+    for collection in (Config.Database.DOCUMENTS_COLLECTION, Config.Database.SUMMARY_COLLECTION):
+        client.create_collection(
+            collection, vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+        )
+        stores[collection] = QdrantVectorStore(
+            client=client, collection_name=collection, embedding=embedding_model
+        )
+        stores[collection].add_documents(documents)
+    print(f"📚 Seeded {len(documents)} documents into in-memory Qdrant")
+
+    llm = FakeStreamingChatModel(
+        first_token_latency=args.ttft_ms / 1000,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+    )
+    retriever_full = create_optimized_retriever(llm, stores[Config.Database.DOCUMENTS_COLLECTION], "full")
+    retriever_summary = create_optimized_retriever(llm, stores[Config.Database.SUMMARY_COLLECTION], "summary")
+    if Config.Retriever.USE_RERANKER:
+        retriever_full = ContextualCompressionRetriever(
+            base_compressor=LimitedCompressor(base_compressor=reranker), base_retriever=retriever_full
+        )
+        retriever_summary = ContextualCompressionRetriever(
+            base_compressor=LimitedCompressor(base_compressor=reranker), base_retriever=retriever_summary
+        )
+
+    # Components set up front: the service is ready and startup loads nothing
+    service = ChatService()
+    service.client = client
+    service.embedding_model = embedding_model
+    service.reranker = reranker
+    service.llm = llm
+    service.vector_stores = {"full": stores[Config.Database.DOCUMENTS_COLLECTION],
+                             "summary": stores[Config.Database.SUMMARY_COLLECTION]}
+    service.chain = create_chain(llm, retriever_full, retriever_summary)
+    service.hyde_transformer = FakeHyDE(latency=args.hyde_ms / 1000)
+    service.warmup = {}
+    return service, documents
+
+
+def start_server(port: int):
+    import uvicorn
+
+    from backend.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, name="uvicorn", daemon=True)
+    thread.start()
+    while not server.started:
+        if not thread.is_alive():
+            raise RuntimeError("uvicorn failed to start")
+        time.sleep(0.05)
+    return server, thread
+
+
+def run_client(base_url: str, questions: List[str], count: int) -> List[RequestResult]:
+    """Send `count` streamed chat requests one after another"""
+    session = requests.Session()
+    results = []
+    for _ in range(count):
+        started = time.perf_counter()
+        ttft, tokens_per_second, status = None, None, "ok"
+        try:
+            with session.post(
+                f"{base_url}/api/chat/stream",
+                json={"message": random.choice(questions)},
+                headers={"Accept": "text/event-stream"},
+                stream=True,
+                timeout=300,
+            ) as response:
+                if response.status_code == 429:
+                    status = "rejected"
+                elif response.status_code != 200:
+                    status = "error"
+                else:
+                    for line in response.iter_lines():
+                        if not line.startswith(b"data: "):
+                            continue
+                        data = line[6:]
+                        if data == b"[DONE]":
+                            break
+                        event = json.loads(data)
+                        if event["type"] == "token" and ttft is None:
+                            ttft = time.perf_counter() - started
+                        elif event["type"] == "end":
+                            tokens_per_second = event.get("tokens_per_second")
+                        elif event["type"] == "error":
+                            status = "error"
+        except requests.RequestException:
+            status = "error"
+        results.append(RequestResult(status, time.perf_counter() - started, ttft, tokens_per_second))
+    return results
+
+
+def summarize(results: List[RequestResult], wall_seconds: float) -> dict:
+    ok = [r for r in results if r.status == "ok"]
+    ttfts = [r.ttft for r in ok if r.ttft is not None]
+    totals = [r.total for r in ok]
+    rates = [r.tokens_per_second for r in ok if r.tokens_per_second]
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": sum(r.status == "rejected" for r in results),
+        "errors": sum(r.status == "error" for r in results),
+        "wall_seconds": round(wall_seconds, 2),
+        "requests_per_second": round(len(ok) / wall_seconds, 2) if wall_seconds else None,
+        "ttft_p50": percentile(ttfts, 0.5),
+        "ttft_p99": percentile(ttfts, 0.99),
+        "latency_p50": percentile(totals, 0.5),
+        "latency_p99": percentile(totals, 0.99),
+        "tokens_per_second_avg": round(sum(rates) / len(rates), 1) if rates else None,
+    }
+
+
+def print_report(summary: dict):
+    def seconds(value):
+        return "-" if value is None else f"{value * 1000:.0f} ms"
+
+    print("\n📊 Load test results")
+    print(f"   requests      {summary['requests']} (ok {summary['ok']}, "
+          f"429 {summary['rejected']}, errors {summary['errors']})")
+    print(f"   throughput    {summary['requests_per_second']} req/s over {summary['wall_seconds']} s")
+    print(f"   TTFT          p50 {seconds(summary['ttft_p50'])}   p99 {seconds(summary['ttft_p99'])}")
+    print(f"   latency       p50 {seconds(summary['latency_p50'])}   p99 {seconds(summary['latency_p99'])}")
+    print(f"   generation    {summary['tokens_per_second_avg']} tok/s per stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent clients")
+    parser.add_argument("--requests", type=int, default=10, help="Requests per client")
+    parser.add_argument("--ttft-ms", type=float, default=300, help="Fake LLM time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="Fake LLM generation rate")
+    parser.add_argument("--response-tokens", type=int, default=120, help="Fake LLM tokens per answer")
+    parser.add_argument("--hyde-ms", type=float, default=200, help="Fake HyDE latency")
+    parser.add_argument("--embed-ms", type=float, default=50, help="Fake query embedding latency")
+    parser.add_argument("--rerank-ms", type=float, default=30, help="Fake reranker latency")
+    parser.add_argument("--real-models", action="store_true",
+                        help="Use the configured local embedding model and reranker instead of fakes")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args()
+
+    # Fake HyDE/LLM outputs must not end up in the real warm-cache snapshot
+    Config.WarmCache.ENABLED = False
+
+    # Chat history goes to a throwaway database (conversations and chain history)
+    db_dir = tempfile.mkdtemp(prefix="healing-bot-load-")
+    os.environ["CHAT_DB_PATH"] = os.path.join(db_dir, "chat_history.db")
+    conversation_service_module.conversation_service = ConversationService()
+    chat_service_module.chat_service, documents = build_chat_service(args)
+    questions = [doc.page_content.split("\n", 1)[0].removeprefix("Question: ") for doc in documents]
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    server, thread = start_server(port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    # Warm-up request (first-call imports, connection setup)
+    run_client(base_url, questions, 1)
+
+    print(f"🚀 {args.clients} clients × {args.requests} requests")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as pool:
+        futures = [pool.submit(run_client, base_url, questions, args.requests) for _ in range(args.clients)]
+        results = [result for future in futures for result in future.result()]
+    wall_seconds = time.perf_counter() - started
+
+    summary = summarize(results, wall_seconds)
+    print_report(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "summary": summary,
+                       "results": [asdict(r) for r in results]}, f, indent=2)
+
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
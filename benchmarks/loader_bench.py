@@ -0,0 +1,139 @@
+"""
+Load time and peak memory of the Excel document loaders.
+
+Compares the streaming loader in ragbase.utils (openpyxl read-only rows,
+Documents yielded one at a time) and the compiled Arrow corpus
+(ragbase.corpus, compiled before the run so the warm load is timed) with
+the previous pandas path (read_excel + iterrows), each in a fresh
+subprocess so their peak RSS does not mix. Peak memory is reported above
+the RSS at the start of the load, so it includes importing the loader's
+libraries (pandas for the old path). All loaders must produce the same
+page_content and metadata; a mismatch fails the run. Methods whose
+libraries are not installed are skipped.
+
+Usage (from the project root):
+
+    python -m benchmarks.loader_bench                    # full dataset
+    python -m benchmarks.loader_bench --file data/mental_health_data_official_mini.xlsx
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ragbase.config import Config
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METHODS = ("pandas_iterrows", "streaming", "streaming_count", "corpus")
+# Libraries a method needs beyond the streaming loader's
+REQUIRES = {"pandas_iterrows": "pandas", "corpus": "pyarrow"}
+
+
+def pandas_iterrows(excel_path: Path) -> list:
+    """The loader as it was before streaming: whole DataFrame, then iterrows"""
+    import pandas as pd
+    from langchain_core.documents import Document
+
+    from ragbase.utils import format_qa_content, safe_parse_answers
+
+    df = pd.read_excel(excel_path)
+    df['answers'] = df['answers'].apply(safe_parse_answers)
+    documents = []
+    for _, row in df.iterrows():
+        content = format_qa_content(row['question'], row['answers'], str(row['best_answer']).strip())
+        documents.append(Document(page_content=content, metadata={"labels": row['labels'], "source": str(excel_path)}))
+    return documents
+
+
+def run_method(method: str, excel_path: Path) -> dict:
+    """Body of the child process"""
+    from ragbase.utils import iter_documents_from_excel
+
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    digest = hashlib.sha256()
+
+    def add(doc):
+        digest.update(doc.page_content.encode("utf-8"))
+        digest.update(json.dumps(doc.metadata, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+
+    started = time.perf_counter()
+    if method == "streaming_count":
+        # Consume one Document at a time without keeping them: the ingestion-style use
+        count = 0
+        for doc in iter_documents_from_excel(excel_path):
+            add(doc)
+            count += 1
+    else:
+        if method == "pandas_iterrows":
+            documents = pandas_iterrows(excel_path)
+        elif method == "corpus":
+            from ragbase.corpus import load_corpus_documents
+            documents = load_corpus_documents(excel_path)
+        else:
+            documents = list(iter_documents_from_excel(excel_path))
+        count = len(documents)
+        for doc in documents:
+            add(doc)
+    seconds = time.perf_counter() - started
+
+    return {
+        "method": method,
+        "documents": count,
+        "seconds": seconds,
+        "peak_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_kb) / 1024,
+        "digest": digest.hexdigest(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", type=Path, default=Config.Path.EXCEL_FILE, help="Excel file to load")
+    parser.add_argument("--methods", nargs="+", default=list(METHODS), choices=METHODS)
+    parser.add_argument("--child", choices=METHODS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_method(args.child, args.file)))
+        return
+
+    methods = []
+    for method in args.methods:
+        if method in REQUIRES and importlib.util.find_spec(REQUIRES[method]) is None:
+            print(f"⚠️ Skipping {method}: {REQUIRES[method]} is not installed")
+        else:
+            methods.append(method)
+
+    if "corpus" in methods:
+        from ragbase.corpus import open_corpus
+        open_corpus(args.file)  # Compile (if stale) outside the timed child
+
+    results = []
+    for method in methods:
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.loader_bench", "--child", method, "--file", str(args.file)],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"📊 {args.file.name}")
+    print(f"{'method':<20}{'documents':>11}{'seconds':>10}{'peak MB':>10}")
+    for result in results:
+        print(f"{result['method']:<20}{result['documents']:>11}{result['seconds']:>10.2f}{result['peak_mb']:>10.1f}")
+
+    if len({result["digest"] for result in results}) > 1:
+        print("❌ Loaders produced different page_content or metadata")
+        sys.exit(1)
+    print("✅ Identical page_content and metadata")
+
+
+if __name__ == "__main__":
+    main()
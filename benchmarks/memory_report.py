@@ -0,0 +1,152 @@
+"""
+Memory per worker: `uvicorn --workers N` vs the pre-fork server.
+
+Starts the backend in each mode on a free port, waits until /ready answers
+200, lets it settle, then reads /proc/<pid>/smaps_rollup of every process
+in the server's tree:
+
+- RSS counts shared pages in full for every process, so summing it
+  overstates the real footprint.
+- PSS splits each shared page between the processes that map it, so the PSS
+  total is what the deployment actually costs.
+
+Needs the real models, Qdrant and Linux (/proc).
+
+Usage (from the project root):
+
+    python -m benchmarks.memory_report --workers 4
+    python -m benchmarks.memory_report --workers 4 --modes prefork
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SMAPS_FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def server_command(mode: str, workers: int, port: int) -> List[str]:
+    if mode == "prefork":
+        return [sys.executable, "-m", "backend.prefork", "--workers", str(workers),
+                "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+    return [sys.executable, "-m", "uvicorn", "backend.main:app", "--workers", str(workers),
+            "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"]
+
+
+def descendants(root: int) -> List[int]:
+    """root and all its descendant pids"""
+    children: Dict[int, List[int]] = {}
+    for stat in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            fields = stat.read_text().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(stat.parent.name))
+    pids, pending = [], [root]
+    while pending:
+        pid = pending.pop()
+        pids.append(pid)
+        pending.extend(children.get(pid, []))
+    return sorted(pids)
+
+
+def smaps(pid: int) -> Dict[str, int]:
+    """smaps_rollup fields in kB"""
+    values = {}
+    for line in Path(f"/proc/{pid}/smaps_rollup").read_text().splitlines():
+        name, _, rest = line.partition(":")
+        if name in SMAPS_FIELDS:
+            values[name] = int(rest.split()[0])
+    return values
+
+
+def wait_ready(base_url: str, process: subprocess.Popen, workers: int, timeout: float):
+    """Wait until enough consecutive /ready calls answer 200 to have reached every worker"""
+    deadline = time.time() + timeout
+    streak = 0
+    while streak < 4 * workers:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with status {process.returncode}")
+        if time.time() > deadline:
+            raise RuntimeError(f"not ready after {timeout:.0f}s")
+        try:
+            ok = requests.get(f"{base_url}/ready", timeout=5).status_code == 200
+        except requests.RequestException:
+            ok = False
+        streak = streak + 1 if ok else 0
+        time.sleep(0.1 if ok else 1)
+
+
+def measure(mode: str, workers: int, timeout: float, settle: float) -> List[dict]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(server_command(mode, workers, port), cwd=PROJECT_ROOT, start_new_session=True)
+    try:
+        wait_ready(f"http://127.0.0.1:{port}", process, workers, timeout)
+        time.sleep(settle)
+        rows = []
+        for pid in descendants(process.pid):
+            try:
+                rows.append({"pid": pid, "role": "parent" if pid == process.pid else "child", **smaps(pid)})
+            except OSError:
+                continue  # Exited meanwhile
+        return rows
+    finally:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+
+
+def print_table(mode: str, rows: List[dict]):
+    def mb(kb):
+        return f"{kb / 1024:.0f}"
+
+    print(f"\n📦 {mode}")
+    print(f"   {'pid':>8} {'role':<7}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}")
+    for row in rows:
+        shared = row.get("Shared_Clean", 0) + row.get("Shared_Dirty", 0)
+        private = row.get("Private_Clean", 0) + row.get("Private_Dirty", 0)
+        print(f"   {row['pid']:>8} {row['role']:<7}{mb(row.get('Rss', 0)):>10}{mb(row.get('Pss', 0)):>10}"
+              f"{mb(shared):>11}{mb(private):>12}")
+    print(f"   {'total':>16}{mb(sum(r.get('Rss', 0) for r in rows)):>10}"
+          f"{mb(sum(r.get('Pss', 0) for r in rows)):>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--modes", nargs="+", default=["uvicorn", "prefork"], choices=["uvicorn", "prefork"])
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for /ready")
+    parser.add_argument("--settle", type=float, default=5, help="Seconds to wait after /ready before measuring")
+    args = parser.parse_args()
+
+    if not Path("/proc/self/smaps_rollup").exists():
+        sys.exit("❌ /proc/<pid>/smaps_rollup is not available (Linux 4.14+ only)")
+
+    totals = {}
+    for mode in args.modes:
+        rows = measure(mode, args.workers, args.timeout, args.settle)
+        print_table(mode, rows)
+        totals[mode] = sum(r.get("Pss", 0) for r in rows)
+
+    if len(totals) == 2:
+        saved = totals["uvicorn"] - totals["prefork"]
+        print(f"\n💾 Pre-fork saves {saved / 1024:.0f} MB PSS with {args.workers} workers "
+              f"({saved / totals['uvicorn']:.0%})")
+
+
+if __name__ == "__main__":
+    main()
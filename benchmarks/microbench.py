@@ -0,0 +1,235 @@
+"""
+Microbenchmarks for per-request hot paths, with stored baselines.
+
+Runs offline (no LLM, Qdrant or network). Each benchmark is timed with
+timeit (best of several repeats) and compared against
+benchmarks/baselines/microbench.json; a benchmark slower than its baseline
+by more than --tolerance fails the run, so regressions show up before
+deploy. Baselines are machine-specific, so none are committed: the first
+run on a machine (no baseline file) records them and exits 0, and a new
+benchmark without a baseline is recorded the same way; both are reported.
+
+Usage (from the project root):
+
+    python -m benchmarks.microbench --save-baseline   # (re)record baselines
+    python -m benchmarks.microbench               # compare, exit 1 on regression
+    python -m benchmarks.microbench -k storage    # only matching benchmarks
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import uuid
+from pathlib import Path
+from typing import Callable, Dict
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from langchain_core.documents import Document
+
+from ragbase.cache import LRUCache
+from ragbase.chain import create_router, format_documents, remove_links
+from ragbase.config import Config
+from ragbase.hyde import QueryTransformationHyDE
+from ragbase.stream_filter import ThinkTagFilter
+from ragbase.utils import load_documents_from_excel
+from shared.chat_storage import ChatStorage
+
+from backend.services.chat_service import format_sources
+
+from benchmarks.fakes import FakeStreamingChatModel
+
+BASELINE_FILE = Path(__file__).parent / "baselines" / "microbench.json"
+
+# name -> setup function returning the zero-argument callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+
+def benchmark(name: str):
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def _sample_documents(count: int = 5) -> list:
+    answer = "Mình hiểu cảm giác của bạn. Tham khảo thêm tại https://example.com/bai-viet nhé. " * 8
+    return [
+        Document(
+            page_content=f"Question: câu hỏi số {i}\n\nAnswers:\n⭐ BEST: {answer}",
+            metadata={"labels": np.int64(i), "score": np.float32(0.5), "vector": np.zeros(4)}
+        )
+        for i in range(count)
+    ]
+
+
+@benchmark("remove_links")
+def bench_remove_links():
+    text = "\n".join(doc.page_content for doc in _sample_documents())
+    return lambda: remove_links(text)
+
+
+@benchmark("format_documents")
+def bench_format_documents():
+    documents = _sample_documents()
+    return lambda: format_documents(documents)
+
+
+# No routing keyword: both keyword lists are scanned before the cache or the LLM
+UNROUTED_QUESTION = "Mình cảm thấy chênh vênh ở tuổi hai mươi lăm, không biết mình muốn gì nữa"
+
+
+@benchmark("smart_route_keywords")
+def bench_smart_route_keywords():
+    route = create_router(FakeStreamingChatModel(first_token_latency=0), LRUCache(10))
+    return lambda: route("Làm thế nào để ngủ ngon hơn?")
+
+
+@benchmark("smart_route_cached")
+def bench_smart_route_cached():
+    route = create_router(FakeStreamingChatModel(first_token_latency=0), LRUCache(10))
+    route(UNROUTED_QUESTION)  # The LLM decision is cached from here on
+    return lambda: route(UNROUTED_QUESTION)
+
+
+@benchmark("smart_route_llm")
+def bench_smart_route_llm():
+    # Cache of size 0: every call goes through the prompt, the (instant) LLM and the stage limiter
+    route = create_router(FakeStreamingChatModel(first_token_latency=0), LRUCache(0))
+    return lambda: route(UNROUTED_QUESTION)
+
+
+@benchmark("hyde_cache_hit")
+def bench_hyde_cache_hit():
+    hyde = QueryTransformationHyDE()  # Configures the client only; no request is made
+    query = "Làm sao để vượt qua cảm giác cô đơn khi sống xa nhà?"
+    hyde._store_result(query, "Mình từng sống xa nhà và hiểu cảm giác đó.")
+    return lambda: hyde._cached_or_skipped(query, fast_mode=True)
+
+
+@benchmark("think_tag_filter_stream")
+def bench_think_tag_filter_stream():
+    # One streamed answer: a 1000-chunk reasoning span, then 3000 answer chunks
+    chunks = (["<thi", "nk>"] + ["suy nghĩ "] * 1000 + ["</th", "ink>"]
+              + ["mình hiểu ", "cảm giác < ", "của bạn "] * 1000)
+
+    def run():
+        think_filter = ThinkTagFilter()
+        for chunk in chunks:
+            think_filter.feed(chunk)
+        think_filter.flush()
+    return run
+
+
+@benchmark("format_sources")
+def bench_format_sources():
+    documents = _sample_documents()
+    return lambda: format_sources(documents)
+
+
+@benchmark("storage_save_message")
+def bench_storage_save_message():
+    storage = ChatStorage(os.path.join(tempfile.mkdtemp(prefix="microbench-"), "chat.db"))
+    conversation_id = storage.create_conversation("bench")
+    return lambda: storage.save_message(
+        conversation_id, "user", "Hôm nay mình thấy hơi mệt", message_id=str(uuid.uuid4())
+    )
+
+
+@benchmark("storage_read_page")
+def bench_storage_read_page():
+    storage = ChatStorage(os.path.join(tempfile.mkdtemp(prefix="microbench-"), "chat.db"))
+    conversation_id = storage.create_conversation("bench")
+    storage.save_messages([
+        (conversation_id, "user" if i % 2 else "assistant", f"tin nhắn {i}", None, None, str(uuid.uuid4()), False)
+        for i in range(500)
+    ])
+    return lambda: storage.get_conversation_messages_page(conversation_id, Config.CONVERSATION_MESSAGES_LIMIT)
+
+
+@benchmark("load_documents_from_excel")
+def bench_load_documents_from_excel():
+    return lambda: load_documents_from_excel(Config.Path.MINI_EXCEL_FILE)
+
+
+def measure(fn: Callable[[], object], repeat: int = 5, min_seconds: float = 0.2) -> float:
+    """Best-of-`repeat` seconds per call"""
+    timer = timeit.Timer(fn)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_seconds / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def machine_info() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "node": platform.node()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--save-baseline", "--save", dest="save", action="store_true",
+                        help="Store results as the new baselines")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Allowed slowdown vs baseline before failing (0.25 = 25%%)")
+    parser.add_argument("-k", dest="pattern", default="", help="Only run benchmarks containing this text")
+    args = parser.parse_args()
+
+    # load_documents_from_excel is timed parsing the workbook, not reading the compiled corpus
+    Config.Corpus.ENABLED = False
+
+    baseline, baseline_machine = {}, machine_info()
+    if BASELINE_FILE.exists():
+        stored = json.loads(BASELINE_FILE.read_text(encoding="utf-8"))
+        baseline = stored.get("results", {})
+        baseline_machine = stored.get("machine")
+        if baseline_machine != machine_info():
+            print(f"⚠️ Baselines were recorded on {stored.get('machine')}; comparisons may not be meaningful")
+
+    results, regressions, missing = {}, [], []
+    print(f"{'benchmark':<28}{'per call':>14}{'baseline':>14}{'change':>10}")
+    for name, setup in BENCHMARKS.items():
+        if args.pattern not in name:
+            continue
+        fn = setup()
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            seconds = measure(fn)
+        results[name] = seconds
+
+        reference = baseline.get(name)
+        change = ""
+        if not reference:
+            missing.append(name)
+        else:
+            ratio = seconds / reference - 1
+            change = f"{ratio:+.0%}"
+            if ratio > args.tolerance:
+                regressions.append(name)
+                change += " ❌"
+        print(f"{name:<28}{seconds * 1e6:>11.1f} µs"
+              f"{(f'{reference * 1e6:.1f} µs' if reference else '-'):>14}{change:>10}")
+
+    if args.save or missing:
+        # Missing baselines (first run on this machine, new benchmarks) are recorded, not compared
+        stored_results = dict(baseline)
+        stored_results.update(results if args.save else {name: results[name] for name in missing})
+        BASELINE_FILE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE_FILE.write_text(
+            json.dumps({"machine": machine_info() if args.save else baseline_machine,
+                        "results": stored_results}, indent=2),
+            encoding="utf-8"
+        )
+        if not args.save:
+            print(f"⚠️ No baseline yet, recorded this run's: {', '.join(missing)}")
+        print(f"💾 Baselines saved to {BASELINE_FILE}")
+    if regressions and not args.save:
+        print(f"❌ Slower than baseline by more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -46,9 +46,23 @@ def check_backend_status():
                     st.experimental_rerun()
                     return True
                 
-                progress = min(95, (i + 1) * 3)  # Progress up to 95%
+                if ready.get("status") == "failed":
+                    progress_bar.empty()
+                    status_text.empty()
+                    st.error("❌ Backend failed to load models. Please check the backend logs.")
+                    return False
+                
+                components = ready.get("components") or {}
+                if components:
+                    loaded = sum(c.get("status") in ("ready", "disabled") for c in components.values())
+                    progress = min(95, int(100 * loaded / len(components)))
+                    loading = [name for name, c in components.items() if c.get("status") == "loading"]
+                    detail = f" ({', '.join(loading)})" if loading else ""
+                else:
+                    progress = min(95, (i + 1) * 3)  # Progress up to 95%
+                    detail = ""
                 progress_bar.progress(progress)
-                status_text.info(f"⏳ Loading models... {progress}%")
+                status_text.info(f"⏳ Loading models... {progress}%{detail}")
                 time.sleep(1)
             
             st.error("❌ Backend took too long to start. Please check the backend service.")
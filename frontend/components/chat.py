@@ -4,6 +4,7 @@ Chat components for handling user interactions and message display.
 
 import datetime
 import os
+import time
 from typing import Optional
 
 import streamlit as st
@@ -50,10 +51,15 @@ async def handle_chat_message(message: str, conversation_id: Optional[str] = Non
         full_response = ""
         sources = []
         response_started = False
+        sent_at = time.perf_counter()
+        client_ttft = None
+        end_chunk = None
         
         # Stream response from API
         for chunk in api_client.chat_stream(message, conversation_id):
             if chunk.get("type") == "token":
+                if client_ttft is None:
+                    client_ttft = time.perf_counter() - sent_at
                 content = chunk.get("content", "")
                 full_response += content
                 
@@ -75,6 +81,7 @@ async def handle_chat_message(message: str, conversation_id: Optional[str] = Non
                 return None
             
             elif chunk.get("type") == "end":
+                end_chunk = chunk
                 # Update conversation_id if it was created
                 new_conversation_id = chunk.get("conversation_id")
                 if new_conversation_id and not conversation_id:
@@ -86,6 +93,9 @@ async def handle_chat_message(message: str, conversation_id: Optional[str] = Non
         if full_response:
             message_placeholder.markdown(full_response)
         
+        if Config.DEBUG and end_chunk is not None:
+            st.caption(_format_timing(client_ttft, end_chunk))
+        
         # # Show sources if available
         # if sources:
         #     for i, source in enumerate(sources[:3]):
@@ -104,6 +114,22 @@ async def handle_chat_message(message: str, conversation_id: Optional[str] = Non
     return conversation_id
 
 
+def _format_timing(client_ttft: Optional[float], end_chunk: dict) -> str:
+    """One-line TTFT / generation-rate summary of a finished response"""
+    timings = end_chunk.get("timings") or {}
+    parts = []
+    if client_ttft is not None:
+        parts.append(f"TTFT {client_ttft:.2f}s")
+    if "ttft" in timings:
+        parts.append(f"server TTFT {timings['ttft'] / 1000:.2f}s")
+    if end_chunk.get("tokens_per_second"):
+        parts.append(f"{end_chunk['tokens_per_second']:.0f} tok/s")
+    for stage in ("queue_wait", "hyde", "route", "retrieval", "rerank"):
+        if stage in timings:
+            parts.append(f"{stage} {timings[stage]:.0f}ms")
+    return " · ".join(parts)
+
+
 def show_message_history():
     """Display message history"""
     for message in st.session_state.messages:
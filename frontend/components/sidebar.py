@@ -44,9 +44,18 @@ def create_sidebar():
         
         st.markdown(f"### {UIConstants.CONVERSATION_HISTORY_TITLE}")
         
-        # Load conversations from API
+        # Load conversations from API, one keyset page per "load more" click
         api_client = get_api_client()
-        all_conversations = api_client.get_conversations()
+        pages_to_show = st.session_state.get("conversation_pages", 1)
+        all_conversations = []
+        cursor = None
+        for _ in range(pages_to_show):
+            page, cursor = api_client.get_conversations_page(
+                Config.CONVERSATIONS_PAGE_SIZE, cursor
+            )
+            all_conversations.extend(page)
+            if not cursor:
+                break
         
         if all_conversations:
             for conv in all_conversations:
@@ -63,6 +72,10 @@ def create_sidebar():
                     with col2:
                         if st.button("🗑️", key=f"del_{conv['id']}", help="Xóa cuộc trò chuyện này"):
                             delete_conversation(conv['id'])
+            
+            if cursor and st.button("Xem thêm", key="load_more_conversations", use_container_width=True):
+                st.session_state.conversation_pages = pages_to_show + 1
+                st.rerun()
         else:
             st.caption("Chưa có cuộc trò chuyện nào")
 
@@ -1,7 +1,8 @@
 import base64
 import json
 import os
-from typing import Dict, List, Optional
+import uuid
+from typing import Dict, List, Optional, Tuple
 
 import requests
 import streamlit as st
@@ -24,9 +25,12 @@ class APIClient:
             return None
     
     def check_backend_ready(self) -> dict:
-        """Check if backend is ready"""
-        response = self._make_request("GET", "/ready")
-        return response.json() if response else {"status": "error"}
+        """Check if backend is ready (503 with per-component status while loading)"""
+        try:
+            response = self.session.get(f"{self.base_url}/ready", timeout=5)
+            return response.json()
+        except (requests.RequestException, ValueError):
+            return {"status": "error"}
     
     def get_health_status(self) -> dict:
         """Get health status"""
@@ -44,6 +48,32 @@ class APIClient:
         response = self._make_request("GET", "/api/conversations/")
         return response.json() if response else []
     
+    def get_conversations_page(
+        self, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of conversations and the cursor of the next page"""
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = self._make_request("GET", "/api/conversations/", params=params)
+        if not response:
+            return [], None
+        return response.json(), response.headers.get("X-Next-Cursor")
+    
+    def get_conversation_messages_page(
+        self, conversation_id: str, limit: int, cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """Get one page of messages and the cursor of the next page"""
+        params = {"limit": limit}
+        if cursor:
+            params["cursor"] = cursor
+        response = self._make_request(
+            "GET", f"/api/conversations/{conversation_id}/messages", params=params
+        )
+        if not response:
+            return [], None
+        return response.json(), response.headers.get("X-Next-Cursor")
+    
     def get_conversation(self, conversation_id: str) -> Optional[Dict]:
         """Get a specific conversation"""
         response = self._make_request("GET", f"/api/conversations/{conversation_id}")
@@ -63,37 +93,71 @@ class APIClient:
         )
         return response is not None
     
-    def chat_stream(self, message: str, conversation_id: Optional[str] = None):
-        """Stream chat response"""
+    def chat_stream(
+        self,
+        message: str,
+        conversation_id: Optional[str] = None,
+        max_resumes: int = 2
+    ):
+        """Stream chat response (Server-Sent Events), resuming after dropped connections"""
         url = f"{self.base_url}/api/chat/stream"
         payload = {
             "message": message,
-            "conversation_id": conversation_id
+            "conversation_id": conversation_id,
+            "message_id": str(uuid.uuid4())
         }
+        last_event_id = None
+        resumes = 0
         
-        try:
-            response = requests.post(
-                url, 
-                json=payload, 
-                stream=True,
-                headers={"Accept": "text/plain"}
-            )
-            response.raise_for_status()
+        while True:
+            headers = {"Accept": "text/event-stream"}
+            if last_event_id is not None:
+                headers["Last-Event-ID"] = last_event_id
             
-            for line in response.iter_lines():
-                if line:
+            try:
+                response = requests.post(url, json=payload, stream=True, headers=headers)
+                if response.status_code == 429:
+                    retry_after = response.headers.get("Retry-After", "?")
+                    yield {
+                        "type": "error",
+                        "content": f"Máy chủ đang bận, bạn thử lại sau {retry_after} giây nhé."
+                    }
+                    return
+                if response.status_code == 410:
+                    # The server no longer has this response; what was shown is all we get
+                    yield {
+                        "type": "error",
+                        "content": "Mất kết nối và không thể tiếp tục câu trả lời, bạn gửi lại tin nhắn nhé."
+                    }
+                    return
+                response.raise_for_status()
+                
+                for line in response.iter_lines():
+                    if not line:
+                        continue
                     line = line.decode('utf-8')
-                    if line.startswith('data: '):
+                    if line.startswith('id: '):
+                        last_event_id = line[4:]
+                    elif line.startswith('data: '):
                         data = line[6:]  # Remove 'data: ' prefix
                         if data == '[DONE]':
-                            break
+                            return
                         try:
                             yield json.loads(data)
                         except json.JSONDecodeError:
                             continue
-        except requests.RequestException as e:
-            st.error(f"Streaming Error: {str(e)}")
-            yield {"type": "error", "content": str(e)}
+                return
+            except (requests.ConnectionError, requests.exceptions.ChunkedEncodingError) as e:
+                # Reconnect and ask the server for the events we missed
+                if last_event_id is None or resumes >= max_resumes:
+                    st.error(f"Streaming Error: {str(e)}")
+                    yield {"type": "error", "content": str(e)}
+                    return
+                resumes += 1
+            except requests.RequestException as e:
+                st.error(f"Streaming Error: {str(e)}")
+                yield {"type": "error", "content": str(e)}
+                return
     
     def chat_message(self, message: str, conversation_id: Optional[str] = None) -> Optional[Dict]:
         """Send chat message (non-streaming)"""
@@ -0,0 +1,76 @@
+"""
+Bounded in-process caches for the query path.
+
+The caches are plain LRU mappings so they can be snapshotted as (key, value)
+pairs on shutdown and loaded back on startup (see backend.services.warm_cache).
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, List, Optional, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from ragbase.config import Config
+
+
+class LRUCache:
+    """Thread-safe mapping that evicts the least recently used entry past maxsize"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        """Entries from least to most recently used"""
+        with self._lock:
+            return list(self._data.items())
+
+    def load(self, items: Iterable[Tuple[Hashable, Any]]):
+        """Add entries in order, so the last ones end up most recently used"""
+        for key, value in items:
+            self.put(key, value)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class CachedQueryEmbeddings(Embeddings):
+    """Embeddings wrapper that caches query vectors by text.
+
+    Repeated questions (and HyDE cache hits, which return the same text) skip
+    the embedding model; document embedding is passed through uncached.
+    """
+
+    def __init__(self, embeddings: Embeddings, maxsize: int = Config.WarmCache.MAX_QUERY_EMBEDDINGS):
+        self.embeddings = embeddings
+        self.cache = LRUCache(maxsize)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(text)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.cache.put(text, vector)
+        return vector
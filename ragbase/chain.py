@@ -1,20 +1,25 @@
 import re
 import time
 from operator import itemgetter
-from typing import List
+from typing import AsyncIterator, Iterator, List, Optional
 
 from langchain.schema.runnable import RunnablePassthrough
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage, BaseMessageChunk
+from langchain_core.prompt_values import PromptValue
 from langchain_core.prompts import (ChatPromptTemplate, MessagesPlaceholder,
                                     PromptTemplate)
-from langchain_core.runnables import Runnable, RunnableLambda
-from langchain_core.runnables.history import RunnableWithMessageHistory
+from langchain_core.runnables import (Runnable, RunnableConfig,
+                                      RunnableGenerator, RunnableLambda)
 from langchain_core.tracers.stdout import ConsoleCallbackHandler
 from langchain_core.vectorstores import VectorStoreRetriever
 
+from ragbase.cache import LRUCache
 from ragbase.config import Config
+from ragbase.limits import get_stage_limiter
 from ragbase.session_history import get_session_history
+from ragbase.tracing import count, current_trace, record, span
 
 SYSTEM_PROMPT = """
 Bạn là một người bạn thân ảo – như tri kỷ online – luôn đồng hành cùng người dùng qua những tâm sự cảm xúc (buồn, vui, stress, thất tình, gia đình, tình bạn), những câu hỏi triết lý sâu sắc, hoặc chỉ đơn giản là một lời khuyên ngắn gọn. Mục tiêu là tạo cảm giác như đang trò chuyện với một người thật – có thể đùa giỡn, thủ thỉ, cà khịa nhẹ nhàng, hoặc vỗ về yêu thương – chứ không phải nói chuyện với máy.
@@ -86,9 +91,30 @@ Chỉ trả lời một từ: "summary" hoặc "full".
 Câu hỏi: {question}
 """)
 
+URL_PATTERN = re.compile(r"https?://\S+|www\.\S+")
+
+
 def remove_links(text: str) -> str:
-    url_pattern = r"https?://\S+|www\.\S+"
-    return re.sub(url_pattern, "", text)
+    return URL_PATTERN.sub("", text)
+
+
+# Simple heuristics to avoid an LLM call for routing
+SUMMARY_ROUTE_KEYWORDS = ['là gì', 'nghĩa là gì', 'định nghĩa', 'khái niệm', 'ý nghĩa của']
+FULL_ROUTE_KEYWORDS = ['tại sao', 'làm thế nào', 'phải làm gì', 'cách nào', 'giải quyết']
+ROUTES = ("summary", "full")
+DEFAULT_ROUTE = "full"
+
+
+def route_by_keywords(question: str) -> Optional[str]:
+    """Quick route ("summary"/"full") from keywords, or None if the LLM has to decide"""
+    question_lower = question.lower()
+    for keyword in SUMMARY_ROUTE_KEYWORDS:
+        if keyword in question_lower:
+            return "summary"
+    for keyword in FULL_ROUTE_KEYWORDS:
+        if keyword in question_lower:
+            return "full"
+    return None
 
 
 def format_documents(documents: List[Document]) -> str:
@@ -100,32 +126,51 @@ def format_documents(documents: List[Document]) -> str:
     return remove_links("\n".join(texts))
 
 
-def create_chain(llm: BaseLanguageModel, retriever_full: VectorStoreRetriever, retriever_summary: VectorStoreRetriever) -> Runnable:
-    # Step 1: Optimized routing - use simple heuristics for common cases
+def _count_output(chunk: BaseMessageChunk):
+    """Count generated output: provider-reported tokens when available, and chunks"""
+    count("llm_chunks")
+    usage = getattr(chunk, "usage_metadata", None)
+    if usage and usage.get("output_tokens"):
+        count("output_tokens", usage["output_tokens"])
+
+
+# LLM routing decisions by question, kept across restarts by the warm-cache snapshot
+ROUTE_CACHE = LRUCache(Config.WarmCache.MAX_ROUTES)
+
+
+def create_router(llm: BaseLanguageModel, route_cache: LRUCache = ROUTE_CACHE):
+    """Route a question to "summary" or "full": keywords, then cached LLM decisions, then the LLM"""
+    routing_chain = ROUTING_PROMPT | llm | RunnableLambda(lambda output: output.content.strip().lower())
+
+    # Optimized routing - use simple heuristics for common cases
     def smart_route(question: str) -> str:
-        question_lower = question.lower()
-        
-        # Simple heuristics to avoid LLM call for routing
-        simple_keywords = ['là gì', 'nghĩa là gì', 'định nghĩa', 'khái niệm', 'ý nghĩa của']
-        complex_keywords = ['tại sao', 'làm thế nào', 'phải làm gì', 'cách nào', 'giải quyết']
+        route = route_by_keywords(question)
+        if route is not None:
+            print(f"🚀 Quick route: {route}")
+            return route
         
-        # Quick routing based on keywords
-        for keyword in simple_keywords:
-            if keyword in question_lower:
-                print(f"🚀 Quick route: summary (keyword: {keyword})")
-                return "summary"
-                
-        for keyword in complex_keywords:
-            if keyword in question_lower:
-                print(f"🚀 Quick route: full (keyword: {keyword})")
-                return "full"
+        route = route_cache.get(question)
+        if route is not None:
+            print(f"🚀 Cached route: {route}")
+            return route
         
         # Fallback to LLM routing for unclear cases
-        routing_chain = ROUTING_PROMPT | llm | RunnableLambda(lambda output: output.content.strip().lower())
-        result = routing_chain.invoke({"question": question})
+        with get_stage_limiter("llm"), span("route_llm"):
+            result = routing_chain.invoke({"question": question})
         print(f"🧭 LLM Route: {result}")
+        if result not in ROUTES:
+            # Not a route: answer from the full collection, and ask again next time
+            return DEFAULT_ROUTE
+        route_cache.put(question, result)
         return result
 
+    return smart_route
+
+
+def create_chain(llm: BaseLanguageModel, retriever_full: VectorStoreRetriever, retriever_summary: VectorStoreRetriever) -> Runnable:
+    # Step 1: routing
+    smart_route = create_router(llm)
+
     # Step 2: dynamic retriever routing with timing
     def get_retriever(routing_output: str) -> VectorStoreRetriever:
         return retriever_summary if routing_output == "summary" else retriever_full
@@ -133,24 +178,68 @@ def create_chain(llm: BaseLanguageModel, retriever_full: VectorStoreRetriever, r
     def retrieve_context(inputs: dict) -> List[Document]:
         question = inputs["question"]
         
-        routing_start = time.time()
-        routing_output = smart_route(question)
-        routing_end = time.time()
-        print(f"⚡ Routing took: {routing_end - routing_start:.2f}s")
+        with span("route"):
+            routing_output = smart_route(question)
         
         retriever = get_retriever(routing_output)
         retriever_config = retriever.with_config({"run_name": f"context_retriever_{routing_output}"})
         
-        # Retrieval with timing
-        retrieval_start = time.time()
-        docs = retriever_config.invoke(question)
-        retrieval_end = time.time()
-        print(f"⚡ Retrieval took: {retrieval_end - retrieval_start:.2f}s")
+        trace = current_trace()
+        embed_before = trace.get("embed") if trace else 0.0
+        rerank_before = trace.get("rerank") if trace else 0.0
+        retrieval_start = time.perf_counter()
+        with span("retrieval"):
+            docs = retriever_config.invoke(question)
+        if trace:
+            # Vector search has no hook of its own: it is what remains of the
+            # retrieval after query embedding and reranking
+            vector_search = (
+                time.perf_counter() - retrieval_start
+                - (trace.get("embed") - embed_before)
+                - (trace.get("rerank") - rerank_before)
+            )
+            record("vector_search", max(vector_search, 0.0))
         
         print(f"📄 Retrieved {len(docs)} documents from {routing_output}")
         
         return docs
 
+    # History is read-only here: turns are recorded once by the caller
+    # (ConversationService.save_message), never by the chain itself
+    def load_chat_history(inputs: dict, config: RunnableConfig) -> List[BaseMessage]:
+        if inputs.get("chat_history") is not None:
+            return inputs["chat_history"]
+        session_id = config.get("configurable", {}).get("session_id")
+        return list(get_session_history(session_id).messages) if session_id else []
+
+    # The answer is generated under the "llm" stage limit; the slot is held
+    # until the last token so concurrent streams never exceed the limit.
+    # "llm_ttft" is the provider's time to first token, "llm" the whole call.
+    def generate_answer(prompts: Iterator[PromptValue]) -> Iterator[BaseMessageChunk]:
+        for prompt_value in prompts:
+            with get_stage_limiter("llm"), span("llm"):
+                start = time.perf_counter()
+                first = True
+                for chunk in llm.stream(prompt_value):
+                    if first:
+                        record("llm_ttft", time.perf_counter() - start)
+                        first = False
+                    _count_output(chunk)
+                    yield chunk
+
+    async def agenerate_answer(prompts: AsyncIterator[PromptValue]) -> AsyncIterator[BaseMessageChunk]:
+        async for prompt_value in prompts:
+            async with get_stage_limiter("llm"):
+                with span("llm"):
+                    start = time.perf_counter()
+                    first = True
+                    async for chunk in llm.astream(prompt_value):
+                        if first:
+                            record("llm_ttft", time.perf_counter() - start)
+                            first = False
+                        _count_output(chunk)
+                        yield chunk
+
     prompt = ChatPromptTemplate.from_messages(
         [
             ("system", SYSTEM_PROMPT),
@@ -161,22 +250,26 @@ def create_chain(llm: BaseLanguageModel, retriever_full: VectorStoreRetriever, r
 
     chain = (
         RunnablePassthrough.assign(
-            context=RunnableLambda(retrieve_context) | format_documents
+            chat_history=RunnableLambda(load_chat_history),
+            context=RunnableLambda(retrieve_context) | format_documents,
         )
         | prompt
-        | llm
+        | RunnableGenerator(generate_answer, agenerate_answer)
     )
 
-    return RunnableWithMessageHistory(
-        chain,
-        get_session_history,
-        input_messages_key="question",
-        history_messages_key="chat_history",
-    ).with_config({"run_name": "chain_answer"})
-
-async def ask_question(chain: Runnable, question: str, session_id: str):
+    return chain.with_config({"run_name": "chain_answer"})
+
+async def ask_question(
+    chain: Runnable,
+    question: str,
+    session_id: str,
+    chat_history: Optional[List[BaseMessage]] = None,
+):
+    inputs = {"question": question}
+    if chat_history is not None:
+        inputs["chat_history"] = chat_history
     async for event in chain.astream_events(
-        {"question": question},
+        inputs,
         config={
             "callbacks": [ConsoleCallbackHandler()] if Config.DEBUG else [],
             "configurable": {"session_id": session_id},
@@ -11,6 +11,9 @@ class Config:
         EXCEL_FILE = APP_HOME / "data" / "mental_health_data_official.xlsx"
         SUMMARY_EXCEL_FILE = APP_HOME / "data" / "summary_mental_health_data_official.xlsx"  
         MINI_EXCEL_FILE = APP_HOME / "data" / "mental_health_data_official_mini.xlsx"  
+        PROFILES_DIR = APP_HOME / "profiles"
+        WARM_CACHE_FILE = APP_HOME / "cache" / "warm_cache.json"
+        CORPUS_DIR = APP_HOME / "cache" / "corpus"
 
     class Database:
         DOCUMENTS_COLLECTION = "documents"
@@ -32,6 +35,74 @@ class Config:
         FULL_RETRIEVAL_K = 5  # Reduced from default 5
         SUMMARY_RETRIEVAL_K = 3  # Reduced for summary queries
 
+    class Corpus:
+        # Load the Excel datasets from a compiled, memory-mapped Arrow copy (optional, needs pyarrow)
+        ENABLED = os.getenv("CORPUS_CACHE", "0") == "1"
+
+    class Ingestion:
+        # Pipelined ingestion: split -> embed (EMBED_WORKERS threads) -> upsert,
+        # with at most QUEUE_SIZE chunks waiting between stages. Each extra embed
+        # worker loads its own copy of the embedding model (~2 GB for e5-large).
+        EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "1"))
+        UPSERT_WORKERS = 1  # Local (path) Qdrant takes one writer; raise for a Qdrant server
+        QUEUE_SIZE = 4
+        EMBED_BATCH_SIZE = 64  # Texts per embed_documents call in the rebuild tool
+        UPSERT_BATCH_SIZE = 256
+
+    class Storage:
+        # Write-behind queue: group message inserts into one commit per interval
+        WRITE_BEHIND_INTERVAL_MS = 50
+        WRITE_BEHIND_MAX_BATCH = 256
+
+    class Streaming:
+        # Merge LLM tokens into one SSE event every COALESCE_MS or COALESCE_CHARS
+        COALESCE_MS = 40
+        COALESCE_CHARS = 64
+        HEARTBEAT_SECONDS = 15
+        # How long a finished stream can still be resumed with Last-Event-ID
+        RESUME_TTL_SECONDS = 120
+        # Cancel generation if no client is attached for this long (disconnect)
+        ABANDON_GRACE_SECONDS = 10
+
+    class Admission:
+        # Chat requests admitted at once (running + queued at a stage); more get 429
+        MAX_ACTIVE_REQUESTS = 32
+        RETRY_AFTER_SECONDS = 5
+        # Concurrent calls per pipeline stage; extra callers wait in line
+        STAGE_CONCURRENCY = {
+            "embed": 2,
+            "rerank": 2,
+            "llm": 8,
+        }
+        STAGE_WAIT_TIMEOUT_SECONDS = 60
+
+    class Metrics:
+        # Rolling per-request percentiles are computed over the last N requests
+        PERCENTILE_WINDOW = 1000
+        PERCENTILES = (0.5, 0.9, 0.99)
+
+    class Profiling:
+        # Opt-in: sample stacks of /api/chat requests, keep profiles of slow ones
+        ENABLED = os.getenv("PROFILE_SLOW_REQUESTS", "0") == "1"
+        SLOW_REQUEST_SECONDS = float(os.getenv("PROFILE_SLOW_REQUEST_SECONDS", "5"))
+        SAMPLE_INTERVAL_MS = 10
+        MAX_PROFILES = 50
+
+    class Admin:
+        # /api/admin/* needs this token in the X-Admin-Token header; without one
+        # configured, only requests from localhost are served
+        TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+    class WarmCache:
+        # Snapshot HyDE results, query embeddings and LLM routes at shutdown, restore at startup
+        ENABLED = os.getenv("WARM_CACHE", "1") == "1"
+        MAX_HYDE_RESULTS = 2000
+        MAX_QUERY_EMBEDDINGS = 1000
+        MAX_ROUTES = 5000
+        # Run through the embedding model and reranker before /ready turns green
+        WARMUP_QUERY = "Dạo này mình hay mất ngủ và thấy căng thẳng, mình nên làm gì?"
+
     DEBUG = False
     CONVERSATION_MESSAGES_LIMIT = 10
+    CONVERSATIONS_PAGE_SIZE = 20
 
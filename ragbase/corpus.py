@@ -0,0 +1,166 @@
+"""
+Compiled corpus: a columnar copy of an Excel dataset, parsed once.
+
+Parsing the workbook, the `answers` column and the Q&A formatting is done
+once and stored as an uncompressed Arrow IPC file in Config.Path.CORPUS_DIR,
+named after the workbook and a hash of its resolved path. Readers
+memory-map it (concurrent processes share the pages) and decode one record
+batch at a time. Building the Documents is not zero-copy: each row becomes
+Python strings; what is saved is parsing the workbook and the answers.
+
+Columns:
+    question, answers (list of strings), best_answer, best_answer_index
+    (-1 when the best answer is not in the list), summary, labels (the
+    cell value as JSON, so text and numbers read back unchanged),
+    page_content (as ingested), content_hash (see ragbase.utils.content_hash).
+
+Documents read back are identical (page_content and metadata) to the ones
+ragbase.utils streams from the workbook.
+
+The file records the size and mtime of its workbook and is rebuilt when
+they change. Documents read back carry their point id (Document.id), so
+ingestion does not hash them again.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Iterator, List
+
+import pyarrow as pa
+
+from langchain_core.documents import Document
+
+from ragbase.config import Config
+from ragbase.utils import (cell_text, content_hash, find_best_answer_index,
+                           format_qa_content, iter_excel_rows,
+                           point_id_from_hash, safe_parse_answers)
+
+CORPUS_VERSION = "2"
+
+SCHEMA = pa.schema([
+    ("question", pa.string()),
+    ("answers", pa.list_(pa.string())),
+    ("best_answer", pa.string()),
+    ("best_answer_index", pa.int32()),
+    ("summary", pa.string()),
+    ("labels", pa.string()),
+    ("page_content", pa.string()),
+    ("content_hash", pa.string()),
+])
+
+
+def corpus_path(excel_path: Path, summary: bool = False) -> Path:
+    # Workbooks with the same name in different directories get their own file
+    path_hash = hashlib.sha1(str(Path(excel_path).resolve()).encode("utf-8")).hexdigest()[:12]
+    return Config.Path.CORPUS_DIR / f"{Path(excel_path).stem}-{path_hash}{'.summary' if summary else ''}.arrow"
+
+
+def _source_stamp(excel_path: Path) -> dict:
+    stat = Path(excel_path).stat()
+    return {
+        "version": CORPUS_VERSION,
+        "source": str(excel_path),
+        "source_size": str(stat.st_size),
+        "source_mtime_ns": str(stat.st_mtime_ns),
+    }
+
+
+def _rows(excel_path: Path, summary: bool) -> Iterator[dict]:
+    source = str(excel_path)
+    for row in iter_excel_rows(excel_path):
+        if summary:
+            if 'summary' not in row or 'labels' not in row:
+                raise ValueError("Excel file must contain 'summary' and 'labels' columns.")
+            page_content = cell_text(row['summary']).strip()
+            question = row.get('question')
+            record = {"summary": page_content, "question": None if question is None else cell_text(question)}
+        else:
+            question = cell_text(row.get('question'))
+            answers = safe_parse_answers(row.get('answers'))
+            best_answer = cell_text(row.get('best_answer')).strip()
+            page_content = format_qa_content(question, answers, best_answer)
+            answers = [str(answer) for answer in answers] if isinstance(answers, (list, tuple)) else []
+            record = {
+                "question": question,
+                "answers": answers,
+                "best_answer": best_answer,
+                "best_answer_index": find_best_answer_index(answers, best_answer),
+            }
+        # Hashed with the metadata the Documents are read back with
+        labels = row.get('labels')
+        document = Document(page_content=page_content, metadata={"labels": labels, "source": source})
+        record.update(
+            labels=json.dumps(labels, ensure_ascii=False, default=str),
+            page_content=page_content,
+            content_hash=content_hash(document),
+        )
+        yield record
+
+
+def compile_corpus(excel_path: Path, summary: bool = False, batch_size: int = 5000) -> Path:
+    """Parse the workbook once and write its Arrow corpus file"""
+    excel_path = Path(excel_path)
+    path = corpus_path(excel_path, summary)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    schema = SCHEMA.with_metadata(_source_stamp(excel_path))
+
+    # Written under a temporary name, so readers never map a partial file
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    rows = 0
+    with pa.OSFile(str(tmp_path), "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+        batch: List[dict] = []
+        for record in _rows(excel_path, summary):
+            batch.append(record)
+            if len(batch) >= batch_size:
+                writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+                rows += len(batch)
+                batch = []
+        if batch:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            rows += len(batch)
+    os.replace(tmp_path, path)
+    logging.info(f"Compiled {rows} rows of {excel_path.name} into {path}")
+    return path
+
+
+def open_corpus(excel_path: Path, summary: bool = False) -> pa.ipc.RecordBatchFileReader:
+    """Reader over the memory-mapped corpus of a workbook, compiled first if missing or stale"""
+    excel_path = Path(excel_path)
+    path = corpus_path(excel_path, summary)
+    if path.exists():
+        reader = pa.ipc.open_file(pa.memory_map(str(path)))
+        if corpus_stamp(reader) == _source_stamp(excel_path):
+            return reader
+        logging.info(f"{excel_path.name} changed, recompiling its corpus")
+    compile_corpus(excel_path, summary)
+    return pa.ipc.open_file(pa.memory_map(str(path)))
+
+
+def corpus_stamp(reader: pa.ipc.RecordBatchFileReader) -> dict:
+    """Version and source workbook recorded in a corpus file"""
+    return {key.decode(): value.decode() for key, value in (reader.schema.metadata or {}).items()}
+
+
+def iter_corpus_documents(reader: pa.ipc.RecordBatchFileReader) -> Iterator[Document]:
+    """Documents of a corpus file, with the content-hash point id as Document.id.
+
+    Record batches are read one at a time; only the columns Documents need
+    are decoded.
+    """
+    source = corpus_stamp(reader)["source"]
+    for i in range(reader.num_record_batches):
+        batch = reader.get_batch(i)
+        columns = (batch.column(name).to_pylist() for name in ("page_content", "labels", "content_hash"))
+        for page_content, labels, digest in zip(*columns):
+            yield Document(
+                id=point_id_from_hash(digest),
+                page_content=page_content,
+                metadata={"labels": json.loads(labels), "source": source},
+            )
+
+
+def load_corpus_documents(excel_path: Path, summary: bool = False) -> List[Document]:
+    return list(iter_corpus_documents(open_corpus(excel_path, summary)))
@@ -1,13 +1,16 @@
+import asyncio
 import logging
 import os
 import time
 import hashlib
 from typing import Optional
 
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from ragbase.cache import LRUCache
 from ragbase.config import Config
+from ragbase.limits import get_stage_limiter
+from ragbase.tracing import span
 
 load_dotenv()
 
@@ -36,10 +39,14 @@ class QueryTransformationHyDE:
         self.model = None
         self.current_key_index = 0
         self._configure_model(self.keys[self.current_key_index])
-        # Simple in-memory cache for HyDE transformations
-        self._cache = {}
+        # In-memory cache of HyDE transformations, kept across restarts by the warm-cache snapshot
+        self.cache = LRUCache(Config.WarmCache.MAX_HYDE_RESULTS)
 
     def _configure_model(self, api_key: str):
+        # Imported here: the Gemini SDK (grpc, protobuf) is slow to import and
+        # the transformer is only built by the background model loader
+        import google.generativeai as genai
+
         genai.configure(api_key=api_key)
         self.model = genai.GenerativeModel("gemini-2.0-flash")
         # logging.info(f"✅ Using API key index {self.current_key_index}")
@@ -55,7 +62,8 @@ class QueryTransformationHyDE:
         """Generate a cache key for the query"""
         return hashlib.md5(query.encode()).hexdigest()
 
-    def transform_query(self, query: str, fast_mode: bool = False) -> str:
+    def _cached_or_skipped(self, query: str, fast_mode: bool) -> Optional[str]:
+        """Return the query itself (fast mode) or a cached transformation, else None"""
         # Fast mode: skip transformation for simple queries
         if fast_mode:
             simple_patterns = [
@@ -67,11 +75,13 @@ class QueryTransformationHyDE:
                 return query
         
         # Check cache first
-        cache_key = self._get_cache_key(query)
-        if cache_key in self._cache:
+        cached = self.cache.get(self._get_cache_key(query))
+        if cached is not None:
             print(f"🚀 HyDE cache hit for query")
-            return self._cache[cache_key]
-        prompt = f"""
+        return cached
+
+    def _build_prompt(self, query: str) -> str:
+        return f"""
         Bạn là một người bạn tâm giao, luôn lắng nghe và chia sẻ những kinh nghiệm sống chân thành.
 
         Hãy viết một đoạn văn ngắn gọn (2-3 câu) phản ánh về câu hỏi sau, như thể bạn đang chia sẻ kinh nghiệm hoặc suy nghĩ cá nhân:
@@ -86,31 +96,61 @@ class QueryTransformationHyDE:
         **Trả lời bằng tiếng Việt**.
         """
 
+    def _store_result(self, query: str, response_text: str) -> str:
+        result = f"Câu hỏi: {query}\nCâu trả lời tham khảo: {response_text.strip()}"
+        
+        # Cache the result
+        self.cache.put(self._get_cache_key(query), result)
+        return result
+
+    def _handle_failure(self, error: Exception, attempt: int) -> bool:
+        """Rotate the API key on rate limiting; True if the caller should wait and retry"""
+        error_message = str(error)
+        logging.warning(f"❌ Attempt {attempt + 1} failed: {error_message}")
+        if "429" in error_message or "Rate limit" in error_message:
+            if not self._retry_with_next_key():
+                logging.error("🚫 All API keys exhausted.")
+                raise RuntimeError("⚠️ All Gemini API keys failed due to rate limiting.")
+            return True
+        raise RuntimeError(f"⚠️ Gemini failed: {error}")
+
+    def transform_query(self, query: str, fast_mode: bool = False) -> str:
+        shortcut = self._cached_or_skipped(query, fast_mode)
+        if shortcut is not None:
+            return shortcut
+        prompt = self._build_prompt(query)
+
         retry_attempts = 0
         max_attempts = len(self.keys)
 
         while retry_attempts < max_attempts:
             try:
-                start_time = time.time()
-                response = self.model.generate_content(prompt)
-                generated_response = response.text.strip()
-                result = f"Câu hỏi: {query}\nCâu trả lời tham khảo: {generated_response}"
-                
-                # Cache the result
-                self._cache[cache_key] = result
-                
-                end_time = time.time()
-                print(f"⚡ HyDE transformation took: {end_time - start_time:.2f}s")
-                return result
+                with get_stage_limiter("llm"), span("hyde_llm"):
+                    response = self.model.generate_content(prompt)
+                return self._store_result(query, response.text)
             except Exception as e:
-                error_message = str(e)
-                logging.warning(f"❌ Attempt {retry_attempts + 1} failed: {error_message}")
-                if "429" in error_message or "Rate limit" in error_message:
-                    time.sleep(2)  # Delay to avoid hammering
-                    if not self._retry_with_next_key():
-                        logging.error("🚫 All API keys exhausted.")
-                        raise RuntimeError("⚠️ All Gemini API keys failed due to rate limiting.")
-                    retry_attempts += 1
-                else:
-                    raise RuntimeError(f"⚠️ Gemini failed: {e}")
+                self._handle_failure(e, retry_attempts)
+                time.sleep(2)  # Delay to avoid hammering
+                retry_attempts += 1
+
+    async def atransform_query(self, query: str, fast_mode: bool = False) -> str:
+        """Async transform_query: does not block the event loop and can be
+        cancelled mid-request (e.g. when the client disconnects)."""
+        shortcut = self._cached_or_skipped(query, fast_mode)
+        if shortcut is not None:
+            return shortcut
+        prompt = self._build_prompt(query)
+
+        retry_attempts = 0
+        max_attempts = len(self.keys)
 
+        while retry_attempts < max_attempts:
+            try:
+                async with get_stage_limiter("llm"):
+                    with span("hyde_llm"):
+                        response = await self.model.generate_content_async(prompt)
+                return self._store_result(query, response.text)
+            except Exception as e:
+                self._handle_failure(e, retry_attempts)
+                await asyncio.sleep(2)  # Delay to avoid hammering
+                retry_attempts += 1
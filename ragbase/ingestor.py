@@ -4,17 +4,24 @@ Simple and effective ingestor without over-splitting
 import ast
 import logging
 import os
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import List
+from typing import Callable, List
 
 import pandas as pd
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
 from langchain_qdrant import Qdrant
 from langchain_text_splitters import RecursiveCharacterTextSplitter
+from qdrant_client import QdrantClient
+from qdrant_client.models import Distance, PointIdsList, PointStruct, VectorParams
 
 from ragbase.config import Config
+from ragbase.utils import content_point_id
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
@@ -62,182 +69,276 @@ class Ingestor:
     def ingest(self, documents: list[Document] = None, chunk_size: int = 1000, resume: bool = True) -> VectorStore:
         """
         Ingest documents với logic đơn giản và hiệu quả
+
+        With resume (incremental), only documents whose content hash is not in the
+        collection's manifest are embedded, and points of documents no longer in
+        `documents` are deleted; pass the whole corpus. Without it, everything is
+        embedded again.
         """
         if documents:
             logging.info(f"Starting ingestion of {len(documents)} documents")
-            
-            # Statistics before processing
-            total_chars = sum(len(doc.page_content) for doc in documents)
-            avg_chars = total_chars / len(documents)
-            logging.info(f"Average document length: {avg_chars:.1f} characters")
-            
-            # Determine the number of chunks
-            total_chunks = (len(documents) + chunk_size - 1) // chunk_size
-            processed_chunks_file = "processed_chunks_simple.log"
-
-            # Load processed chunks if resuming
-            processed_chunks = set()
-            if resume and os.path.exists(processed_chunks_file):
-                with open(processed_chunks_file, "r") as f:
-                    processed_chunks = set(map(int, f.read().splitlines()))
-                logging.info(f"Resuming from {len(processed_chunks)} already processed chunks")
-            
-            # Process documents in chunks
-            total_splits = 0
-            for chunk_index in range(total_chunks):
-                if chunk_index in processed_chunks:
-                    logging.info(f"Skipping already processed chunk {chunk_index + 1}/{total_chunks}")
-                    continue
-                
-                # Get the current chunk
-                start = chunk_index * chunk_size
-                end = min(start + chunk_size, len(documents))
-                chunk = documents[start:end]
-                logging.info(f"Processing chunk {chunk_index + 1}/{total_chunks} ({len(chunk)} documents)...")
-                
-                # Process each document in the chunk
-                all_split_docs = []
-                kept_original = 0
-                split_count = 0
-                
-                for i, doc in enumerate(chunk):
-                    try:
-                        split_docs = self._smart_split_document(doc)
-                        all_split_docs.extend(split_docs)
-                        
-                        if len(split_docs) == 1:
-                            kept_original += 1
-                        else:
-                            split_count += len(split_docs)
-                            
-                    except Exception as e:
-                        logging.error(f"Failed to process document {i}: {e}")
-                        all_split_docs.append(doc)  # Fallback
-                        kept_original += 1
-
-                total_splits += len(all_split_docs)
-                logging.info(f"Chunk {chunk_index + 1}: Kept {kept_original} original, created {split_count} new splits")
-                
-                # Ingest the chunk into the vector store
-                logging.info(f"Ingesting chunk {chunk_index + 1}/{total_chunks} ({len(all_split_docs)} total docs) into vector store...")
-                try:
-                    Qdrant.from_documents(
-                        documents=all_split_docs,
-                        embedding=self.embeddings,
-                        path=Config.Path.DATABASE_DIR,
-                        collection_name=Config.Database.DOCUMENTS_COLLECTION,
-                    )
-                    
-                    # Mark the chunk as processed
-                    with open(processed_chunks_file, "a") as f:
-                        f.write(f"{chunk_index}\n")
-                    
-                    logging.info(f"Successfully ingested chunk {chunk_index + 1}/{total_chunks}")
-                    
-                except Exception as e:
-                    logging.error(f"Failed to ingest chunk {chunk_index + 1}: {e}")
-                    raise
-
-            logging.info(f"Ingestion completed! {len(documents)} original docs -> {total_splits} final chunks")
-            return Qdrant.from_existing_collection(
-                embedding=self.embeddings,
+            self._run_pipeline(
+                documents,
                 collection_name=Config.Database.DOCUMENTS_COLLECTION,
-                path=Config.Path.DATABASE_DIR,
+                split=self._smart_split_document,
+                chunk_size=chunk_size,
+                resume=resume,
             )
         else:
             # Load existing vector store
             logging.info("Loading existing vector store...")
-            return Qdrant.from_existing_collection(
-                embedding=self.embeddings,
-                collection_name=Config.Database.DOCUMENTS_COLLECTION,
-                path=Config.Path.DATABASE_DIR,
-            )
+        return Qdrant.from_existing_collection(
+            embedding=self.embeddings,
+            collection_name=Config.Database.DOCUMENTS_COLLECTION,
+            path=Config.Path.DATABASE_DIR,
+        )
 
     def ingest_summary(self, documents: list[Document] = None, chunk_size: int = 1000, resume: bool = True) -> VectorStore:
         """
         Ingest summary documents - thường ngắn hơn nên ít cần split
         """
+        def split_summary(doc: Document) -> List[Document]:
+            # Most summaries should be kept as-is; only split if really necessary
+            if len(doc.page_content) <= 3000:
+                return [doc]
+            return self._smart_split_document(doc)
+
         if documents:
             logging.info(f"Starting summary ingestion of {len(documents)} documents")
-            
-            # Statistics
-            total_chars = sum(len(doc.page_content) for doc in documents)
-            avg_chars = total_chars / len(documents)
-            logging.info(f"Average summary length: {avg_chars:.1f} characters")
-            
-            # Determine the number of chunks
-            total_chunks = (len(documents) + chunk_size - 1) // chunk_size
-            processed_chunks_file = "processed_summary_chunks_simple.log"
-
-            # Load processed chunks if resuming
-            processed_chunks = set()
-            if resume and os.path.exists(processed_chunks_file):
-                with open(processed_chunks_file, "r") as f:
-                    processed_chunks = set(map(int, f.read().splitlines()))
-                logging.info(f"Resuming summary ingestion from {len(processed_chunks)} already processed chunks")
-
-            # Process documents in chunks
-            total_splits = 0
-            for chunk_index in range(total_chunks):
-                if chunk_index in processed_chunks:
-                    logging.info(f"Skipping already processed summary chunk {chunk_index + 1}/{total_chunks}")
+            self._run_pipeline(
+                documents,
+                collection_name=Config.Database.SUMMARY_COLLECTION,
+                split=split_summary,
+                chunk_size=chunk_size,
+                resume=resume,
+            )
+        else:
+            # Load existing summary vector store
+            logging.info("Loading existing summary vector store...")
+        return Qdrant.from_existing_collection(
+            embedding=self.embeddings,
+            collection_name=Config.Database.SUMMARY_COLLECTION,
+            path=Config.Path.DATABASE_DIR,
+        )
+
+    def _embedding_workers(self, count: int) -> List[Embeddings]:
+        """One embeddings instance per worker: the HF tokenizer is not safe to share across threads"""
+        if count == 1:
+            return [self.embeddings]
+        import torch
+
+        # Split the cores between the workers instead of each one using all of them
+        torch.set_num_threads(max(1, (os.cpu_count() or count) // count))
+        return [self.embeddings] + [
+            HuggingFaceEmbeddings(model_name=Config.Model.EMBEDDINGS) for _ in range(count - 1)
+        ]
+
+    def _run_pipeline(
+        self,
+        documents: List[Document],
+        collection_name: str,
+        split: Callable[[Document], List[Document]],
+        chunk_size: int,
+        resume: bool,
+    ):
+        """
+        Split, embed and upsert `documents` in chunks of `chunk_size`, as a pipeline:
+        the calling thread splits, Config.Ingestion.EMBED_WORKERS threads embed and
+        UPSERT_WORKERS threads write to Qdrant, with bounded queues in between so
+        all stages run at once.
+
+        Point ids are derived from the content hash of each split, and the ids in
+        the collection are tracked in its manifest (written as chunks land), so a
+        resumed or repeated run skips unchanged content and then deletes the
+        points whose content is gone.
+        """
+        # Statistics before processing
+        total_chars = sum(len(doc.page_content) for doc in documents)
+        logging.info(f"Average document length: {total_chars / len(documents):.1f} characters")
+
+        total_chunks = (len(documents) + chunk_size - 1) // chunk_size
+        client = QdrantClient(path=Config.Path.DATABASE_DIR)
+        manifest_file = Config.Path.DATABASE_DIR / f"{collection_name}.manifest"
+
+        ingested = set()
+        if manifest_file.exists():
+            if client.collection_exists(collection_name):
+                ingested = set(manifest_file.read_text().splitlines())
+            else:
+                manifest_file.unlink()  # The collection was dropped; its manifest is stale
+        elif client.collection_exists(collection_name) and client.count(collection_name).count:
+            # Points from before content-hash ids cannot be matched. List them in the
+            # manifest: they stay searchable until a completed run has written the new
+            # points, and are then deleted as vanished (by a later run, if this one fails)
+            ingested = self._point_ids(client, collection_name)
+            manifest_file.write_text("".join(f"{point_id}\n" for point_id in sorted(ingested)))
+            logging.warning(
+                f"Collection {collection_name} has no manifest; its {len(ingested)} points "
+                f"are replaced after a complete run"
+            )
+        if resume:
+            logging.info(f"Manifest lists {len(ingested)} ingested chunks; unchanged ones are skipped")
+
+        embed_queue: queue.Queue = queue.Queue(maxsize=Config.Ingestion.QUEUE_SIZE)
+        upsert_queue: queue.Queue = queue.Queue(maxsize=Config.Ingestion.QUEUE_SIZE)
+        failed = threading.Event()
+        errors: List[Exception] = []
+        progress_lock = threading.Lock()
+        progress = {"documents": 0, "splits": 0}
+        current_ids = set()
+        collection_lock = threading.Lock()
+        started = time.perf_counter()
+
+        def fail(stage: str, chunk_index: int, error: Exception):
+            logging.error(f"Failed to {stage} chunk {chunk_index + 1}: {error}")
+            errors.append(error)
+            failed.set()
+
+        def embed_worker(embeddings: Embeddings):
+            while (item := embed_queue.get()) is not None:
+                chunk_index, source_count, split_docs = item
+                if failed.is_set():
+                    continue  # Drain the queue so the producer never blocks
+                try:
+                    vectors = embeddings.embed_documents([doc.page_content for _, doc in split_docs])
+                except Exception as e:
+                    fail("embed", chunk_index, e)
                     continue
+                upsert_queue.put((chunk_index, source_count, split_docs, vectors))
 
-                # Get the current chunk
-                start = chunk_index * chunk_size
-                end = min(start + chunk_size, len(documents))
-                chunk = documents[start:end]
-                logging.info(f"Processing summary chunk {chunk_index + 1}/{total_chunks} ({len(chunk)} documents)...")
+        def upsert_worker():
+            while (item := upsert_queue.get()) is not None:
+                chunk_index, source_count, split_docs, vectors = item
+                if failed.is_set():
+                    continue
+                try:
+                    with collection_lock:
+                        if not client.collection_exists(collection_name):
+                            client.create_collection(
+                                collection_name,
+                                vectors_config=VectorParams(size=len(vectors[0]), distance=Distance.COSINE),
+                            )
+                    # Same payload layout as langchain's Qdrant vector store
+                    points = [
+                        PointStruct(
+                            id=point_id,
+                            vector=vector,
+                            payload={"page_content": doc.page_content, "metadata": doc.metadata},
+                        )
+                        for (point_id, doc), vector in zip(split_docs, vectors)
+                    ]
+                    batch_size = Config.Ingestion.UPSERT_BATCH_SIZE
+                    for start in range(0, len(points), batch_size):
+                        client.upsert(collection_name, points[start:start + batch_size])
+                except Exception as e:
+                    fail("ingest", chunk_index, e)
+                    continue
+
+                with progress_lock:
+                    # Record the written points, so an interrupted run resumes after them
+                    with open(manifest_file, "a") as f:
+                        f.writelines(f"{point_id}\n" for point_id, _ in split_docs)
+                    progress["documents"] += source_count
+                    progress["splits"] += len(split_docs)
+                    elapsed = time.perf_counter() - started
+                    logging.info(
+                        f"Ingested chunk {chunk_index + 1}/{total_chunks}: "
+                        f"{progress['splits']} chunks embedded, "
+                        f"{progress['documents']} changed documents, "
+                        f"{progress['documents'] / elapsed:.1f} docs/s"
+                    )
+
+        embed_threads = [
+            threading.Thread(target=embed_worker, args=(embeddings,), name=f"ingest-embed-{i}", daemon=True)
+            for i, embeddings in enumerate(self._embedding_workers(max(1, Config.Ingestion.EMBED_WORKERS)))
+        ]
+        upsert_threads = [
+            threading.Thread(target=upsert_worker, name=f"ingest-upsert-{i}", daemon=True)
+            for i in range(max(1, Config.Ingestion.UPSERT_WORKERS))
+        ]
+        for thread in embed_threads + upsert_threads:
+            thread.start()
 
-                # For summary, usually keep original since they're already summaries
-                all_split_docs = []
+        completed = False
+        try:
+            # Split on this thread while earlier chunks are embedded and written
+            for chunk_index in range(total_chunks):
+                if failed.is_set():
+                    break
+
+                start = chunk_index * chunk_size
+                chunk = documents[start:start + chunk_size]
+                split_docs = []
+                changed_documents = 0
                 for i, doc in enumerate(chunk):
                     try:
-                        # Most summaries should be kept as-is
-                        if len(doc.page_content) <= 3000:
-                            all_split_docs.append(doc)
-                        else:
-                            # Only split if really necessary
-                            split_docs = self._smart_split_document(doc)
-                            all_split_docs.extend(split_docs)
-                            
+                        splits = split(doc)
                     except Exception as e:
-                        logging.error(f"Failed to process summary document {i}: {e}")
-                        all_split_docs.append(doc)
+                        logging.error(f"Failed to process document {start + i}: {e}")
+                        splits = [doc]  # Fallback
+                    new_splits = []
+                    for split_doc in splits:
+                        # Unsplit documents from the compiled corpus already carry their id
+                        point_id = doc.id if split_doc is doc and doc.id else content_point_id(split_doc)
+                        if point_id in current_ids:
+                            continue  # Duplicate content
+                        current_ids.add(point_id)
+                        if not (resume and point_id in ingested):
+                            new_splits.append((point_id, split_doc))
+                    split_docs.extend(new_splits)
+                    changed_documents += bool(new_splits)
+                if split_docs:
+                    embed_queue.put((chunk_index, changed_documents, split_docs))
+            completed = True
+        finally:
+            for _ in embed_threads:
+                embed_queue.put(None)
+            for thread in embed_threads:
+                thread.join()
+            for _ in upsert_threads:
+                upsert_queue.put(None)
+            for thread in upsert_threads:
+                thread.join()
+            # Only a full pass knows which content is gone
+            if completed and not errors:
+                self._delete_vanished(client, collection_name, ingested - current_ids)
+                # Compact the manifest to exactly the points now in the collection
+                manifest_file.write_text("".join(f"{point_id}\n" for point_id in sorted(current_ids)))
+            # Local Qdrant locks its folder; release it for from_existing_collection
+            client.close()
 
-                total_splits += len(all_split_docs)
+        if errors:
+            raise errors[0]
 
-                # Ingest the chunk into the summary vector store
-                logging.info(f"Ingesting summary chunk {chunk_index + 1}/{total_chunks} ({len(all_split_docs)} docs)...")
-                try:
-                    Qdrant.from_documents(
-                        documents=all_split_docs,
-                        embedding=self.embeddings,
-                        path=Config.Path.DATABASE_DIR,
-                        collection_name=Config.Database.SUMMARY_COLLECTION,
-                    )
-
-                    # Mark the chunk as processed
-                    with open(processed_chunks_file, "a") as f:
-                        f.write(f"{chunk_index}\n")
-                        
-                    logging.info(f"Successfully ingested summary chunk {chunk_index + 1}/{total_chunks}")
-                    
-                except Exception as e:
-                    logging.error(f"Failed to ingest summary chunk {chunk_index + 1}: {e}")
-                    raise
+        elapsed = time.perf_counter() - started
+        logging.info(
+            f"Ingestion completed! {len(documents)} original docs -> {len(current_ids)} final chunks, "
+            f"{progress['splits']} embedded ({progress['documents']} changed docs) and "
+            f"{len(ingested - current_ids)} deleted in {elapsed:.1f}s "
+            f"({progress['documents'] / elapsed if elapsed else 0:.1f} docs/s)"
+        )
 
-            logging.info(f"Summary ingestion completed! {len(documents)} original docs -> {total_splits} final chunks")
-            return Qdrant.from_existing_collection(
-                embedding=self.embeddings,
-                collection_name=Config.Database.SUMMARY_COLLECTION,
-                path=Config.Path.DATABASE_DIR,
-            )
-        else:
-            # Load existing summary vector store
-            logging.info("Loading existing summary vector store...")
-            return Qdrant.from_existing_collection(
-                embedding=self.embeddings,
-                collection_name=Config.Database.SUMMARY_COLLECTION,
-                path=Config.Path.DATABASE_DIR,
+    @staticmethod
+    def _point_ids(client: QdrantClient, collection_name: str) -> set:
+        """Ids (as strings, like the manifest) of all points in a collection"""
+        point_ids = set()
+        offset = None
+        while True:
+            points, offset = client.scroll(
+                collection_name, limit=Config.Ingestion.UPSERT_BATCH_SIZE, offset=offset,
+                with_payload=False, with_vectors=False,
             )
+            point_ids.update(str(point.id) for point in points)
+            if offset is None:
+                return point_ids
+
+    @staticmethod
+    def _delete_vanished(client: QdrantClient, collection_name: str, point_ids: set):
+        """Delete points whose content is no longer in the corpus"""
+        # Manifest ids are strings; integer ids of points from before content-hash ids are not
+        point_ids = sorted((int(point_id) if point_id.isdigit() else point_id for point_id in point_ids), key=str)
+        batch_size = Config.Ingestion.UPSERT_BATCH_SIZE
+        for start in range(0, len(point_ids), batch_size):
+            client.delete(collection_name, points_selector=PointIdsList(points=point_ids[start:start + batch_size]))
+        if point_ids:
+            logging.info(f"Deleted {len(point_ids)} chunks no longer in the corpus")
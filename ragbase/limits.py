@@ -0,0 +1,259 @@
+"""
+Per-stage concurrency limits for the RAG pipeline.
+
+Each expensive stage (query embedding, reranking, LLM calls) gets its own
+limiter so a burst of requests queues in front of the stage instead of
+oversubscribing the CPU models or the LLM provider. Limiters work from both
+worker threads (``with limiter:``) and coroutines (``async with limiter:``)
+and keep queue-depth and wait-time counters.
+
+A released slot goes straight to the longest waiter, thread or coroutine
+alike (one FIFO queue), so neither kind can starve the other. Waiting
+threads block on their own event; waiting coroutines await a future that
+the releasing thread resolves through its event loop (call_soon_threadsafe),
+so neither polls.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from langchain_core.callbacks import Callbacks
+from langchain_core.documents import BaseDocumentCompressor, Document
+from langchain_core.embeddings import Embeddings
+
+from ragbase.config import Config
+from ragbase.tracing import record, span
+
+
+class StageTimeout(RuntimeError):
+    """A stage slot did not become free within the wait timeout"""
+
+    def __init__(self, stage: str, waited: float):
+        super().__init__(f"Stage '{stage}' is busy (waited {waited:.1f}s)")
+        self.stage = stage
+        self.waited = waited
+
+
+class _ThreadWaiter:
+    """A thread waiting for a slot; `granted` is set (under the limiter lock) on handoff"""
+
+    __slots__ = ("event", "granted")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.granted = False
+
+    def notify(self):
+        self.event.set()
+
+
+class _AsyncWaiter:
+    """A coroutine waiting for a slot; `granted` is set (under the limiter lock) on handoff"""
+
+    __slots__ = ("loop", "future", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.granted = False
+
+    def notify(self):
+        # Raises RuntimeError if the waiter's event loop is closed
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        # Runs on the waiter's event loop
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class StageLimiter:
+    def __init__(
+        self,
+        name: str,
+        max_concurrent: int,
+        timeout: float = Config.Admission.STAGE_WAIT_TIMEOUT_SECONDS
+    ):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._free = max_concurrent
+        # Threads and coroutines waiting for a slot, in arrival order
+        self._waiters: deque = deque()
+        self.waiting = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def __enter__(self):
+        started = self._enqueue()
+        with self._lock:
+            acquired = self._take_free_slot()
+            if not acquired:
+                waiter = _ThreadWaiter()
+                self._waiters.append(waiter)
+        if not acquired:
+            waiter.event.wait(self.timeout)
+            with self._lock:
+                # A slot handed over just as the wait timed out is still ours
+                acquired = waiter.granted
+                if not acquired:
+                    self._waiters.remove(waiter)
+        self._dequeue(started, acquired)
+        return self
+
+    def __exit__(self, *exc):
+        self._release()
+
+    async def __aenter__(self):
+        started = self._enqueue()
+        with self._lock:
+            acquired = self._take_free_slot()
+            if not acquired:
+                waiter = _AsyncWaiter(asyncio.get_running_loop())
+                self._waiters.append(waiter)
+        if not acquired:
+            # Never block the event loop: a releasing thread hands the slot over and wakes us
+            try:
+                await asyncio.wait_for(waiter.future, self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            except BaseException:
+                # Cancelled: give back a slot handed over in the meantime
+                with self._lock:
+                    granted = waiter.granted
+                    if not granted:
+                        self._waiters.remove(waiter)
+                if granted:
+                    self._release_slot()
+                with self._lock:
+                    self.waiting -= 1
+                raise
+            with self._lock:
+                # A slot handed over just as the wait timed out is still ours
+                acquired = waiter.granted
+                if not acquired:
+                    self._waiters.remove(waiter)
+        self._dequeue(started, acquired)
+        return self
+
+    async def __aexit__(self, *exc):
+        self._release()
+
+    def _take_free_slot(self) -> bool:
+        # Called under the lock. Slots are handed over on release, so a free
+        # slot means nobody is queued ahead of the caller.
+        if self._free > 0:
+            self._free -= 1
+            return True
+        return False
+
+    def _enqueue(self) -> float:
+        with self._lock:
+            self.waiting += 1
+        return time.monotonic()
+
+    def _dequeue(self, started: float, acquired: bool):
+        waited = time.monotonic() - started
+        with self._lock:
+            self.waiting -= 1
+            if acquired:
+                self.in_flight += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+            else:
+                self.timeouts += 1
+        if not acquired:
+            raise StageTimeout(self.name, waited)
+        # Summed over all stages of the request
+        record("queue_wait", waited)
+
+    def _release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self.completed += 1
+        self._release_slot()
+
+    def _release_slot(self):
+        """Hand the slot to the longest waiter, thread or coroutine, else free it"""
+        with self._lock:
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+            else:
+                waiter = None
+                self._free += 1
+        if waiter is not None:
+            try:
+                waiter.notify()
+            except RuntimeError:
+                self._release_slot()  # Its event loop is closed; nobody will take the slot
+
+    def metrics(self) -> dict:
+        """Snapshot of queue depth and wait-time counters"""
+        with self._lock:
+            admitted = self.completed + self.in_flight
+            return {
+                "max_concurrent": self.max_concurrent,
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "completed": self.completed,
+                "timeouts": self.timeouts,
+                "wait_seconds_avg": self.wait_seconds_total / admitted if admitted else 0.0,
+                "wait_seconds_max": self.wait_seconds_max,
+            }
+
+
+_limiters: Dict[str, StageLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_stage_limiter(stage: str) -> StageLimiter:
+    """Get the shared limiter for a stage configured in Config.Admission.STAGE_CONCURRENCY"""
+    with _limiters_lock:
+        if stage not in _limiters:
+            _limiters[stage] = StageLimiter(stage, Config.Admission.STAGE_CONCURRENCY[stage])
+        return _limiters[stage]
+
+
+def stage_metrics() -> Dict[str, dict]:
+    """Metrics for every configured stage"""
+    return {stage: get_stage_limiter(stage).metrics() for stage in Config.Admission.STAGE_CONCURRENCY}
+
+
+class LimitedEmbeddings(Embeddings):
+    """Embeddings wrapper that runs (and times) every call under the "embed" stage limit"""
+
+    def __init__(self, embeddings: Embeddings, stage: str = "embed"):
+        self.embeddings = embeddings
+        self.stage = stage
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with get_stage_limiter(self.stage), span(self.stage):
+            return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with get_stage_limiter(self.stage), span(self.stage):
+            return self.embeddings.embed_query(text)
+
+
+class LimitedCompressor(BaseDocumentCompressor):
+    """Document compressor wrapper that runs (and times) under the "rerank" stage limit"""
+
+    base_compressor: BaseDocumentCompressor
+    stage: str = "rerank"
+
+    def compress_documents(
+        self,
+        documents: Sequence[Document],
+        query: str,
+        callbacks: Optional[Callbacks] = None,
+    ) -> Sequence[Document]:
+        with get_stage_limiter(self.stage), span(self.stage):
+            return self.base_compressor.compress_documents(documents, query, callbacks)
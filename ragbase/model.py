@@ -7,20 +7,25 @@ try:
 except ImportError:
     pass
 
-from langchain_community.chat_models import ChatOllama
-from langchain_community.document_compressors.flashrank_rerank import \
-    FlashrankRerank
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
+from typing import TYPE_CHECKING
+
 from langchain_core.language_models import BaseLanguageModel
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_groq import ChatGroq
 
 from ragbase.config import Config
 
+# Provider packages (and the torch / onnxruntime stacks behind them) are
+# imported inside the factories, so importing this module stays cheap and
+# only the provider selected by Config is ever loaded.
+if TYPE_CHECKING:
+    from langchain_community.document_compressors.flashrank_rerank import \
+        FlashrankRerank
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
 
 def create_llm() -> BaseLanguageModel:
     if Config.Model.USE_LOCAL:
+        from langchain_community.chat_models import ChatOllama
+
         return ChatOllama(
             model=Config.Model.LOCAL_LLM,
             temperature=Config.Model.TEMPERATURE,
@@ -28,11 +33,14 @@ def create_llm() -> BaseLanguageModel:
             max_tokens=Config.Model.MAX_TOKENS,
         )
     else:
+         from langchain_google_genai import ChatGoogleGenerativeAI
+
          return ChatGoogleGenerativeAI(
         model="gemini-2.0-flash", 
         temperature=0.4,
         max_output_tokens=Config.Model.MAX_TOKENS,
     )
+        # from langchain_groq import ChatGroq
         # return ChatGroq(
         #     temperature=Config.Model.TEMPERATURE,
         #     model_name=Config.Model.REMOTE_LLM,
@@ -41,7 +49,9 @@ def create_llm() -> BaseLanguageModel:
 
 
 
-def create_embeddings() -> HuggingFaceEmbeddings:
+def create_embeddings() -> "HuggingFaceEmbeddings":
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
     # Cache embeddings model to avoid reloading
     return HuggingFaceEmbeddings(
         model_name=Config.Model.EMBEDDINGS,
@@ -50,5 +60,8 @@ def create_embeddings() -> HuggingFaceEmbeddings:
     )
 
 
-def create_reranker() -> FlashrankRerank:
+def create_reranker() -> "FlashrankRerank":
+    from langchain_community.document_compressors.flashrank_rerank import \
+        FlashrankRerank
+
     return FlashrankRerank(model=Config.Model.RERANKER)
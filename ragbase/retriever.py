@@ -1,8 +1,6 @@
 from typing import Optional
 
 from langchain.retrievers import EnsembleRetriever
-from langchain.retrievers.document_compressors.chain_filter import \
-    LLMChainFilter
 from langchain_community.retrievers import BM25Retriever
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseLanguageModel
@@ -10,7 +8,7 @@ from langchain_core.vectorstores import VectorStore, VectorStoreRetriever
 from langchain_qdrant import Qdrant
 
 from ragbase.config import Config
-from ragbase.model import create_embeddings, create_reranker
+from ragbase.model import create_embeddings
 
 
 # Cache for BM25 retrievers to avoid re-creating them
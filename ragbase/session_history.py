@@ -5,7 +5,7 @@ import sys
 
 # Add parent directory to path to import shared modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from shared.chat_storage import ChatStorage
+from shared.chat_storage import ChatStorage, default_db_file
 
 # Global storage cho chain history
 chain_histories = {}
@@ -28,12 +28,9 @@ def load_history_from_db(conversation_id: str):
     Load lịch sử từ database vào chain history
     """
     try:
-        # Get project root path
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        db_path = os.path.join(project_root, "chat_history.db")
-        
-        if os.path.exists(db_path):
-            storage = ChatStorage(db_path)
+        db_file = default_db_file()
+        if os.path.exists(db_file):
+            storage = ChatStorage(db_file)
             messages = storage.get_conversation_messages(conversation_id)
             
             if conversation_id not in chain_histories:
@@ -45,40 +42,47 @@ def load_history_from_db(conversation_id: str):
             # Add messages from database
             for msg in messages:
                 if msg['role'] == 'user':
-                    chain_histories[conversation_id].add_message(HumanMessage(content=msg['content']))
+                    chain_histories[conversation_id].add_message(HumanMessage(content=msg['content'], id=msg.get('id')))
                 elif msg['role'] == 'assistant':
-                    chain_histories[conversation_id].add_message(AIMessage(content=msg['content']))
+                    chain_histories[conversation_id].add_message(AIMessage(content=msg['content'], id=msg.get('id')))
     except Exception as e:
         print(f"Error loading history from DB: {e}")
 
-def save_message_to_db(conversation_id: str, role: str, content: str):
+def save_message_to_db(conversation_id: str, role: str, content: str, message_id: str = None):
     """
     Lưu tin nhắn vào database
     """
     try:
-        # Get project root path
-        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-        db_path = os.path.join(project_root, "chat_history.db")
-        storage = ChatStorage(db_path)
-        storage.save_message(conversation_id, role, content)
+        storage = ChatStorage()
+        storage.save_message(conversation_id, role, content, message_id=message_id)
     except Exception as e:
         print(f"Error saving message to DB: {e}")
 
-def add_message_to_history(conversation_id: str, role: str, content: str):
+def add_message_to_history(
+    conversation_id: str,
+    role: str,
+    content: str,
+    persist: bool = True,
+    message_id: str = None
+):
     """
-    Thêm tin nhắn vào cả chain history và database
+    Thêm tin nhắn vào chain history và (nếu persist=True) vào database.
+    Tin nhắn có message_id đã có trong history sẽ bị bỏ qua (idempotent)
     """
-    # Thêm vào chain history
-    if conversation_id not in chain_histories:
-        chain_histories[conversation_id] = ChatMessageHistory()
+    # Đảm bảo history đã được load từ database trước khi thêm tin nhắn mới
+    history = get_session_history(conversation_id)
+    if message_id and any(msg.id == message_id for msg in reversed(history.messages)):
+        return
     
+    # Thêm vào chain history
     if role == 'user':
-        chain_histories[conversation_id].add_message(HumanMessage(content=content))
+        history.add_message(HumanMessage(content=content, id=message_id))
     elif role == 'assistant':
-        chain_histories[conversation_id].add_message(AIMessage(content=content))
+        history.add_message(AIMessage(content=content, id=message_id))
     
     # Lưu vào database
-    save_message_to_db(conversation_id, role, content)
+    if persist:
+        save_message_to_db(conversation_id, role, content, message_id)
 
 def clear_session_history(session_id: str):
     """
@@ -0,0 +1,61 @@
+"""
+Incremental filter that removes <think>...</think> reasoning spans from a
+token stream, including tags split across chunk boundaries.
+"""
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+
+
+def _partial_tag_length(text: str, tag: str, start: int) -> int:
+    """Length of the longest proper prefix of `tag` that `text[start:]` ends with"""
+    for length in range(min(len(tag) - 1, len(text) - start), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkTagFilter:
+    """
+    State machine over the stream: outside a span text is passed through,
+    inside it is dropped. Only a possible partial tag (at most
+    len("</think>") - 1 chars) is carried between chunks, so the work per
+    chunk is proportional to the chunk, not to the response so far.
+    """
+
+    def __init__(self):
+        self._inside = False
+        self._pending = ""
+
+    def feed(self, chunk: str) -> str:
+        """Consume one chunk and return the visible text it completes"""
+        if not self._pending and "<" not in chunk:
+            # Fast path for ordinary tokens: no tag can start here
+            return "" if self._inside else chunk
+
+        text = self._pending + chunk
+        self._pending = ""
+        visible = []
+        pos = 0
+
+        while True:
+            tag = THINK_CLOSE if self._inside else THINK_OPEN
+            index = text.find(tag, pos)
+            if index == -1:
+                end = len(text) - _partial_tag_length(text, tag, pos)
+                if not self._inside:
+                    visible.append(text[pos:end])
+                self._pending = text[end:]
+                return "".join(visible)
+
+            if not self._inside:
+                visible.append(text[pos:index])
+            pos = index + len(tag)
+            self._inside = not self._inside
+
+    def flush(self) -> str:
+        """Return held-back text at end of stream; an unclosed span is dropped"""
+        rest = "" if self._inside else self._pending
+        self._pending = ""
+        self._inside = False
+        return rest
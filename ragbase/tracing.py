@@ -0,0 +1,197 @@
+"""
+Per-stage latency tracing for the chat pipeline.
+
+``span(stage)`` times a block, feeds the duration into a process-wide
+histogram for that stage and, if a request trace is active in the current
+context, adds it to the request's own breakdown. Worker threads started by
+langchain copy the context, so stages run in executors land in the right
+trace. Histograms are rendered in the Prometheus text format for /metrics,
+together with rolling percentiles of per-request figures (TTFT, total,
+queue wait, tokens/s) over the last PERCENTILE_WINDOW requests.
+"""
+
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List, Optional, Sequence
+
+from ragbase.config import Config
+
+METRIC_NAME = "healingbot_stage_duration_seconds"
+REQUEST_METRIC_PREFIX = "healingbot_request_"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, safe to observe from any thread"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)  # Last slot is +Inf
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> tuple:
+        """(cumulative bucket counts including +Inf, sum)"""
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        cumulative, running = [], 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, total
+
+
+class Trace:
+    """Stage durations (seconds) and counters of a single request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def add(self, stage: str, seconds: float):
+        # A stage can run more than once per request (e.g. two LLM calls)
+        with self._lock:
+            self.timings[stage] = self.timings.get(stage, 0.0) + seconds
+
+    def get(self, stage: str) -> float:
+        return self.timings.get(stage, 0.0)
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def as_milliseconds(self) -> Dict[str, float]:
+        with self._lock:
+            return {stage: round(seconds * 1000, 1) for stage, seconds in self.timings.items()}
+
+
+class RollingPercentiles:
+    """Percentiles of named values over the most recent `window` observations"""
+
+    def __init__(self, window: int = Config.Metrics.PERCENTILE_WINDOW):
+        self.window = window
+        self._values: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float):
+        with self._lock:
+            if name not in self._values:
+                self._values[name] = deque(maxlen=self.window)
+            self._values[name].append(value)
+
+    def percentiles(
+        self, quantiles: Sequence[float] = Config.Metrics.PERCENTILES
+    ) -> Dict[str, Dict[float, float]]:
+        """{name: {quantile: value}} using the nearest-rank method"""
+        with self._lock:
+            snapshot = {name: sorted(values) for name, values in self._values.items()}
+        result = {}
+        for name, values in snapshot.items():
+            if values:
+                result[name] = {
+                    q: values[min(len(values) - 1, max(0, int(round(q * len(values))) - 1))]
+                    for q in quantiles
+                }
+        return result
+
+
+_histograms: Dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+_request_window = RollingPercentiles()
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+
+
+def start_trace() -> Trace:
+    """Start a trace for the request running in the current context"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def count(name: str, amount: int = 1):
+    """Add to a counter of the current request's trace, if any"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.count(name, amount)
+
+
+def record(stage: str, seconds: float):
+    """Record a stage duration measured elsewhere"""
+    with _histograms_lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+    histogram.observe(seconds)
+
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+def observe_request(values: Dict[str, Optional[float]]):
+    """Add one finished request's figures (e.g. ttft_seconds) to the rolling window"""
+    for name, value in values.items():
+        if value is not None:
+            _request_window.observe(name, value)
+
+
+def request_percentiles() -> Dict[str, Dict[float, float]]:
+    return _request_window.percentiles()
+
+
+@contextmanager
+def span(stage: str):
+    """Time the enclosed block as `stage`, including when it raises"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def render_prometheus() -> str:
+    """Stage histograms and request percentiles in the Prometheus text format"""
+    lines: List[str] = [
+        f"# HELP {METRIC_NAME} Duration of chat pipeline stages",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _histograms_lock:
+        histograms = sorted(_histograms.items())
+
+    for stage, histogram in histograms:
+        cumulative, total = histogram.snapshot()
+        bounds = [repr(float(bound)) for bound in histogram.buckets] + ["+Inf"]
+        for bound, count in zip(bounds, cumulative):
+            lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+        lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {total}')
+        lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {cumulative[-1]}')
+
+    for name, quantiles in sorted(request_percentiles().items()):
+        metric = REQUEST_METRIC_PREFIX + name
+        lines.append(f"# HELP {metric} Rolling percentiles of {name} over recent chat requests")
+        lines.append(f"# TYPE {metric} summary")
+        for q, value in quantiles.items():
+            lines.append(f'{metric}{{quantile="{q}"}} {value}')
+
+    return "\n".join(lines) + "\n"
@@ -1,15 +1,24 @@
 import ast
+import functools
+import hashlib
+import itertools
+import json
 import logging
+import uuid
 from pathlib import Path
-from typing import List
+from typing import Any, Dict, Iterator, List
 
-import pandas as pd
 from langchain_core.documents import Document
 
+from ragbase.config import Config
+
 
 def safe_parse_answers(x):
     try:
         if isinstance(x, str):
+            # Fast path: without backslashes or line breaks the escape round trip is a no-op
+            if "\\" not in x and "\n" not in x and "\r" not in x:
+                return ast.literal_eval(x)
             # Giữ lại \n nhưng escape đúng để literal_eval hiểu được
             escaped = x.encode('unicode_escape').decode('utf-8')
             return ast.literal_eval(escaped)
@@ -19,87 +28,176 @@ def safe_parse_answers(x):
         return []
 
 
-def load_documents_from_excel(excel_path: Path = None) -> List[Document]:
-    if excel_path:
-        # Read and process Excel file
-        if not excel_path.exists():
-            raise FileNotFoundError(f"Excel file not found at {excel_path}")
+def _json_default(value):
+    # numpy scalars (e.g. labels read by pandas) hash like the Python numbers they hold
+    return value.item() if hasattr(value, "item") else str(value)
+
+
+@functools.lru_cache(maxsize=256)
+def _hashed_source(source: str) -> str:
+    """The source as hashed: an existing file as its path relative to the project
+    (or absolute, outside it), so ids do not depend on the working directory"""
+    path = Path(source)
+    if not path.is_file():
+        return source
+    path = path.resolve()
+    try:
+        return path.relative_to(Path(Config.Path.APP_HOME).resolve()).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+def content_hash(doc: Document) -> str:
+    """Stable SHA-256 hex digest of a document's text and metadata"""
+    metadata = doc.metadata
+    if isinstance(metadata.get("source"), str):
+        metadata = {**metadata, "source": _hashed_source(metadata["source"])}
+    metadata = json.dumps(metadata, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(f"{doc.page_content}\x00{metadata}".encode("utf-8")).hexdigest()
+
+
+def point_id_from_hash(digest: str) -> str:
+    """Qdrant point id (a UUID) from a content hash"""
+    return str(uuid.UUID(digest[:32]))
+
+
+def content_point_id(doc: Document) -> str:
+    """Deterministic Qdrant point id (a UUID) from the document's content hash"""
+    return point_id_from_hash(content_hash(doc))
+
+
+def cell_text(value: Any) -> str:
+    # Empty cells read as "nan", like str() of the NaN pandas used to produce
+    return "nan" if value is None else str(value)
+
+
+def iter_excel_rows(excel_path: Path) -> Iterator[Dict[str, Any]]:
+    """Rows of the first sheet as {column: value} dicts, streamed with
+    openpyxl's read-only reader instead of materializing a DataFrame"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = ["" if name is None else str(name) for name in header]
+        for values in rows:
+            if all(value is None for value in values):
+                continue  # Blank row
+            yield dict(zip(columns, values))
+    finally:
+        workbook.close()
+
+
+def _check_excel_path(excel_path: Path):
+    if not excel_path:
+        raise ValueError("Excel path is required for loading documents.")
+    if not excel_path.exists():
+        raise FileNotFoundError(f"Excel file not found at {excel_path}")
+    logging.info(f"Reading Excel file: {excel_path}")
+
+
+def is_best_answer(answer: str, best_answer: str) -> bool:
+    """Whether a (stripped) answer is the best answer, or a long answer containing it"""
+    return answer == best_answer or (len(answer) > 50 and best_answer in answer)
+
+
+def find_best_answer_index(answers: List[str], best_answer: str) -> int:
+    """Index of the first answer marked best by format_qa_content, or -1"""
+    if not best_answer:
+        return -1
+    for index, answer in enumerate(answers):
+        if is_best_answer(str(answer).strip(), best_answer):
+            return index
+    return -1
+
+
+def format_qa_content(question: Any, answers_list: Any, best_answer: str) -> str:
+    """Q&A page content: every answer listed, the best one marked with ⭐ BEST"""
+    if answers_list and best_answer:
+        formatted_answers = []
+        best_found = False
         
-        logging.info(f"Reading Excel file: {excel_path}")
-        df = pd.read_excel(excel_path)
+        for answer in answers_list:
+            answer_str = str(answer).strip()
+            # Check if this answer matches the best answer
+            if is_best_answer(answer_str, best_answer):
+                formatted_answers.append(f"⭐ BEST: {answer_str}")
+                best_found = True
+            else:
+                formatted_answers.append(f"- {answer_str}")
         
-        df['answers'] = df['answers'].apply(safe_parse_answers)
+        # If best answer wasn't found in the list, add it at the top
+        if not best_found:
+            formatted_answers.insert(0, f"⭐ BEST: {best_answer}")
         
-        # Create documents
-        documents = []
-        batch_size = 1000  # Process 1000 rows at a time
-        for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i+batch_size]
-            for _, row in batch.iterrows():
-                # Format answers with best answer marking
-                answers_list = row['answers']
-                best_answer = str(row['best_answer']).strip()
-                
-                if answers_list and best_answer:
-                    formatted_answers = []
-                    best_found = False
-                    
-                    for answer in answers_list:
-                        answer_str = str(answer).strip()
-                        # Check if this answer matches the best answer
-                        if answer_str == best_answer or (len(answer_str) > 50 and best_answer in answer_str):
-                            formatted_answers.append(f"⭐ BEST: {answer_str}")
-                            best_found = True
-                        else:
-                            formatted_answers.append(f"- {answer_str}")
-                    
-                    # If best answer wasn't found in the list, add it at the top
-                    if not best_found:
-                        formatted_answers.insert(0, f"⭐ BEST: {best_answer}")
-                    
-                    answers_text = "\n".join(formatted_answers)
-                else:
-                    # Fallback if no answers list or best answer
-                    answers_text = f"⭐ BEST: {best_answer}" if best_answer else "No answers available"
-
-                content = f"""Question: {row['question']}
+        answers_text = "\n".join(formatted_answers)
+    else:
+        # Fallback if no answers list or best answer
+        answers_text = f"⭐ BEST: {best_answer}" if best_answer else "No answers available"
+
+    return f"""Question: {question}
 
 Answers:
 {answers_text}"""
-                doc = Document(
-                    page_content=content,
-                    metadata={"labels": row['labels'], "source": str(excel_path)}
-                )
-                documents.append(doc)
-                # logging.info(f"Processed {len(documents)} documents")
-        return documents
-    else:
-        raise ValueError("Excel path is required for loading documents.")
-        return []
+
+
+def iter_documents_from_excel(excel_path: Path = None) -> Iterator[Document]:
+    """Q&A documents, one per row, yielded as the workbook is read"""
+    _check_excel_path(excel_path)
+    source = str(excel_path)
+    for row in iter_excel_rows(excel_path):
+        content = format_qa_content(
+            cell_text(row.get('question')),
+            safe_parse_answers(row.get('answers')),
+            cell_text(row.get('best_answer')).strip(),
+        )
+        yield Document(page_content=content, metadata={"labels": row.get('labels'), "source": source})
+
+
+def _use_corpus() -> bool:
+    # The compiled corpus needs pyarrow; without it the workbook is parsed every time
+    if not Config.Corpus.ENABLED:
+        return False
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError as e:
+        logging.warning(f"CORPUS_CACHE is on but pyarrow cannot be imported ({e}), parsing the workbook")
+        return False
+    return True
+
+
+def load_documents_from_excel(excel_path: Path = None) -> List[Document]:
+    if _use_corpus():
+        _check_excel_path(excel_path)
+        from ragbase.corpus import load_corpus_documents
+        return load_corpus_documents(excel_path)
+    return list(iter_documents_from_excel(excel_path))
+
+
+def iter_summary_documents_from_excel(excel_path: Path = None) -> Iterator[Document]:
+    """Summary documents, one per row, yielded as the workbook is read"""
+    _check_excel_path(excel_path)
+    source = str(excel_path)
+    rows = iter_excel_rows(excel_path)
+    first = next(rows, None)
+    if first is None:
+        return
+    if 'summary' not in first or 'labels' not in first:
+        raise ValueError("Excel file must contain 'summary' and 'labels' columns.")
     
-def load_summary_documents_from_excel(excel_path: Path = None) -> List[Document]:
-    if excel_path:
-        if not excel_path.exists():
-            raise FileNotFoundError(f"Excel file not found at {excel_path}")
-        
-        logging.info(f"Reading Excel file: {excel_path}")
-        df = pd.read_excel(excel_path)
+    for row in itertools.chain([first], rows):
+        yield Document(
+            page_content=cell_text(row['summary']).strip(),
+            metadata={"labels": row['labels'], "source": source}
+        )
 
-        if 'summary' not in df.columns or 'labels' not in df.columns:
-            raise ValueError("Excel file must contain 'summary' and 'labels' columns.")
-        
-        documents = []
-        batch_size = 1000
-        for i in range(0, len(df), batch_size):
-            batch = df.iloc[i:i + batch_size]
-            for _, row in batch.iterrows():
-                summary_text = row['summary']
-                doc = Document(
-                    page_content=str(summary_text).strip(),
-                    metadata={"labels": row['labels'], "source": str(excel_path)}
-                )
-                documents.append(doc)
-
-        return documents
-    else:
-        raise ValueError("Excel path is required for loading documents.")
\ No newline at end of file
+
+def load_summary_documents_from_excel(excel_path: Path = None) -> List[Document]:
+    if _use_corpus():
+        _check_excel_path(excel_path)
+        from ragbase.corpus import load_corpus_documents
+        return load_corpus_documents(excel_path, summary=True)
+    return list(iter_summary_documents_from_excel(excel_path))
@@ -5,12 +5,22 @@ import os
 import uuid
 from pathlib import Path
 
+PROJECT_DB_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chat_history.db")
+
+
+def default_db_file():
+    """
+    Database mặc định: biến môi trường CHAT_DB_PATH, nếu không có thì chat_history.db ở thư mục gốc dự án
+    """
+    return os.getenv("CHAT_DB_PATH") or PROJECT_DB_FILE
+
+
 class ChatStorage:
-    def __init__(self, db_file="chat_history.db"):
+    def __init__(self, db_file=None):
         """
         Khởi tạo lưu trữ chat với database SQLite - cấu trúc mới đơn giản
         """
-        self.db_file = db_file
+        self.db_file = db_file or default_db_file()
         self._init_db()
         
     def _init_db(self):
@@ -26,7 +36,8 @@ class ChatStorage:
             id TEXT PRIMARY KEY,
             title TEXT NOT NULL,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            user_message_count INTEGER NOT NULL DEFAULT 0
         )
         ''')
         
@@ -39,6 +50,8 @@ class ChatStorage:
             content TEXT NOT NULL,
             timestamp TEXT,
             message_order INTEGER,
+            message_id TEXT,
+            is_partial INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY (conversation_id) REFERENCES conversations(id) ON DELETE CASCADE
         )
         ''')
@@ -48,6 +61,41 @@ class ChatStorage:
         CREATE INDEX IF NOT EXISTS idx_messages_conversation 
         ON messages(conversation_id, message_order)
         ''')
+
+        # Migrate database cũ: thêm cột đếm tin nhắn người dùng và tính lại từ bảng messages
+        cursor.execute("PRAGMA table_info(conversations)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'user_message_count' not in columns:
+            cursor.execute(
+                "ALTER TABLE conversations ADD COLUMN user_message_count INTEGER NOT NULL DEFAULT 0"
+            )
+            cursor.execute('''
+            UPDATE conversations SET user_message_count = (
+                SELECT COUNT(*) FROM messages
+                WHERE messages.conversation_id = conversations.id AND messages.role = 'user'
+            )
+            ''')
+
+        # Migrate database cũ: thêm cột message_id (id do client/service sinh ra, dùng để ghi idempotent)
+        cursor.execute("PRAGMA table_info(messages)")
+        columns = {row[1] for row in cursor.fetchall()}
+        if 'message_id' not in columns:
+            cursor.execute("ALTER TABLE messages ADD COLUMN message_id TEXT")
+        # is_partial = 1: câu trả lời bị dừng giữa chừng (client ngắt kết nối)
+        if 'is_partial' not in columns:
+            cursor.execute("ALTER TABLE messages ADD COLUMN is_partial INTEGER NOT NULL DEFAULT 0")
+
+        # Ghi lại cùng message_id sẽ bị bỏ qua (NULL không bị ràng buộc)
+        cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_message_id
+        ON messages(message_id)
+        ''')
+
+        # Index cho phân trang danh sách cuộc trò chuyện theo (updated_at, id)
+        cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_conversations_updated
+        ON conversations(updated_at, id)
+        ''')
         
         conn.commit()
         conn.close()
@@ -72,9 +120,10 @@ class ChatStorage:
         conn.close()
         return conv_id
     
-    def save_message(self, conversation_id, role, content, timestamp=None):
+    def save_message(self, conversation_id, role, content, timestamp=None, message_id=None):
         """
-        Lưu một tin nhắn vào cuộc trò chuyện
+        Lưu một tin nhắn vào cuộc trò chuyện.
+        Nếu message_id đã tồn tại thì không ghi lại (idempotent)
         """
         if not timestamp:
             timestamp = datetime.datetime.now().strftime("%H:%M")
@@ -90,19 +139,82 @@ class ChatStorage:
         message_order = cursor.fetchone()[0]
         
         cursor.execute(
-            "INSERT INTO messages (conversation_id, role, content, timestamp, message_order) VALUES (?, ?, ?, ?, ?)",
-            (conversation_id, role, content, timestamp, message_order)
+            "INSERT OR IGNORE INTO messages (conversation_id, role, content, timestamp, message_order, message_id) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (conversation_id, role, content, timestamp, message_order, message_id)
         )
+        if cursor.rowcount == 0:
+            conn.close()
+            return
         
-        # Cập nhật thời gian updated_at cho cuộc trò chuyện
+        # Cập nhật thời gian updated_at (và số tin nhắn người dùng) cho cuộc trò chuyện
         cursor.execute(
-            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE id = ?",
-            (conversation_id,)
+            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP, "
+            "user_message_count = user_message_count + ? WHERE id = ?",
+            (1 if role == 'user' else 0, conversation_id)
         )
         
         conn.commit()
         conn.close()
-    
+
+    def save_messages(self, messages):
+        """
+        Lưu nhiều tin nhắn trong một transaction duy nhất (group commit).
+        messages: danh sách (conversation_id, role, content, timestamp, first_user_title,
+        message_id, is_partial) theo thứ tự ghi. Nếu first_user_title khác None và đây là tin nhắn người dùng
+        đầu tiên của cuộc trò chuyện thì tiêu đề được cập nhật trong cùng transaction.
+        Tin nhắn có message_id đã tồn tại sẽ bị bỏ qua.
+        """
+        if not messages:
+            return
+
+        conn = sqlite3.connect(self.db_file)
+        cursor = conn.cursor()
+
+        # Thứ tự tin nhắn tiếp theo của từng cuộc trò chuyện, chỉ truy vấn một lần mỗi batch
+        next_orders = {}
+        user_counts = {}
+        for conversation_id, role, content, timestamp, first_user_title, message_id, is_partial in messages:
+            if conversation_id not in next_orders:
+                cursor.execute(
+                    "SELECT COALESCE(MAX(message_order), 0) + 1 FROM messages WHERE conversation_id = ?",
+                    (conversation_id,)
+                )
+                next_orders[conversation_id] = cursor.fetchone()[0]
+                user_counts[conversation_id] = 0
+
+            if not timestamp:
+                timestamp = datetime.datetime.now().strftime("%H:%M")
+            cursor.execute(
+                "INSERT OR IGNORE INTO messages "
+                "(conversation_id, role, content, timestamp, message_order, message_id, is_partial) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (conversation_id, role, content, timestamp, next_orders[conversation_id], message_id, int(is_partial))
+            )
+            if cursor.rowcount == 0:
+                # Đã lưu trước đó với cùng message_id
+                continue
+            next_orders[conversation_id] += 1
+
+            if role == 'user':
+                # Chỉ đặt tiêu đề khi chưa có tin nhắn người dùng nào, kể cả trong batch này
+                if first_user_title and user_counts[conversation_id] == 0:
+                    cursor.execute(
+                        "UPDATE conversations SET title = ? WHERE id = ? AND user_message_count = 0",
+                        (first_user_title, conversation_id)
+                    )
+                user_counts[conversation_id] += 1
+
+        # Cập nhật thời gian updated_at và số tin nhắn người dùng cho các cuộc trò chuyện liên quan
+        cursor.executemany(
+            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP, "
+            "user_message_count = user_message_count + ? WHERE id = ?",
+            [(count, conversation_id) for conversation_id, count in user_counts.items()]
+        )
+
+        conn.commit()
+        conn.close()
+
     def get_conversation_messages(self, conversation_id):
         """
         Lấy tất cả tin nhắn của một cuộc trò chuyện theo thứ tự
@@ -112,21 +224,128 @@ class ChatStorage:
         cursor = conn.cursor()
         
         cursor.execute(
-            "SELECT role, content, timestamp FROM messages WHERE conversation_id = ? ORDER BY message_order ASC",
+            "SELECT role, content, timestamp, message_id, is_partial FROM messages "
+            "WHERE conversation_id = ? ORDER BY message_order ASC",
             (conversation_id,)
         )
         
         messages = []
         for row in cursor.fetchall():
             messages.append({
+                'id': row['message_id'],
                 'role': row['role'],
                 'content': row['content'],
-                'timestamp': row['timestamp']
+                'timestamp': row['timestamp'],
+                'is_partial': bool(row['is_partial'])
             })
         
         conn.close()
         return messages
     
+    def get_conversation_messages_page(self, conversation_id, limit, after_order=None):
+        """
+        Lấy một trang tin nhắn theo keyset message_order.
+        Trả về (messages, next_order) - next_order là None nếu đã hết tin nhắn
+        """
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT role, content, timestamp, message_order, message_id, is_partial FROM messages
+            WHERE conversation_id = ? AND message_order > ?
+            ORDER BY message_order ASC
+            LIMIT ?
+            """,
+            (conversation_id, after_order or 0, limit + 1)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        messages = [
+            {
+                'id': row['message_id'],
+                'role': row['role'],
+                'content': row['content'],
+                'timestamp': row['timestamp'],
+                'is_partial': bool(row['is_partial'])
+            }
+            for row in rows
+        ]
+        next_order = rows[-1]['message_order'] if has_more else None
+        return messages, next_order
+
+    def get_conversation(self, conversation_id):
+        """
+        Lấy thông tin một cuộc trò chuyện theo id (tra cứu theo khóa chính)
+        """
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        cursor.execute(
+            "SELECT id, title, created_at, updated_at FROM conversations WHERE id = ?",
+            (conversation_id,)
+        )
+        row = cursor.fetchone()
+        conn.close()
+
+        if row is None:
+            return None
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at']
+        }
+
+    def get_conversation_with_messages(self, conversation_id):
+        """
+        Lấy cuộc trò chuyện kèm toàn bộ tin nhắn bằng một truy vấn JOIN duy nhất
+        """
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        cursor.execute(
+            """
+            SELECT c.id, c.title, c.created_at, c.updated_at,
+                   m.role, m.content, m.timestamp, m.message_id, m.is_partial
+            FROM conversations c
+            LEFT JOIN messages m ON m.conversation_id = c.id
+            WHERE c.id = ?
+            ORDER BY m.message_order ASC
+            """,
+            (conversation_id,)
+        )
+        rows = cursor.fetchall()
+        conn.close()
+
+        if not rows:
+            return None
+
+        first = rows[0]
+        return {
+            'id': first['id'],
+            'title': first['title'],
+            'created_at': first['created_at'],
+            'updated_at': first['updated_at'],
+            'messages': [
+                {
+                    'id': row['message_id'],
+                    'role': row['role'],
+                    'content': row['content'],
+                    'timestamp': row['timestamp'],
+                    'is_partial': bool(row['is_partial'])
+                }
+                for row in rows
+                if row['role'] is not None
+            ]
+        }
+
     def get_all_conversations(self):
         """
         Lấy danh sách tất cả cuộc trò chuyện
@@ -151,6 +370,54 @@ class ChatStorage:
         conn.close()
         return conversations
     
+    def get_conversations_page(self, limit, after=None):
+        """
+        Lấy một trang cuộc trò chuyện mới nhất trước, phân trang keyset theo (updated_at, id).
+        after: (updated_at, id) của phần tử cuối trang trước.
+        Trả về (conversations, next_key) - next_key là None nếu đã hết
+        """
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+
+        if after is None:
+            cursor.execute(
+                """
+                SELECT id, title, created_at, updated_at FROM conversations
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+                """,
+                (limit + 1,)
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT id, title, created_at, updated_at FROM conversations
+                WHERE (updated_at, id) < (?, ?)
+                ORDER BY updated_at DESC, id DESC
+                LIMIT ?
+                """,
+                (after[0], after[1], limit + 1)
+            )
+        rows = cursor.fetchall()
+        conn.close()
+
+        has_more = len(rows) > limit
+        conversations = [
+            {
+                'id': row['id'],
+                'title': row['title'],
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at']
+            }
+            for row in rows[:limit]
+        ]
+        next_key = None
+        if has_more:
+            last = conversations[-1]
+            next_key = (last['updated_at'], last['id'])
+        return conversations, next_key
+
     def update_conversation_title(self, conversation_id, title):
         """
         Cập nhật tiêu đề cuộc trò chuyện
@@ -187,6 +454,10 @@ class ChatStorage:
         cursor = conn.cursor()
         
         cursor.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+        cursor.execute(
+            "UPDATE conversations SET user_message_count = 0 WHERE id = ?",
+            (conversation_id,)
+        )
         
         conn.commit()
         conn.close()
@@ -17,12 +17,14 @@ class StreamChunkType(str, Enum):
     SOURCES = "sources"
     ERROR = "error"
     END = "end"
+    CANCELLED = "cancelled"
 
 class APIEndpoints:
     """API endpoint constants"""
     CHAT_STREAM = "/api/chat/stream"
     CHAT_MESSAGE = "/api/chat/message"
     CONVERSATIONS = "/api/conversations/"
+    CHAT_WEBSOCKET = "/ws/chat"
     HEALTH = "/health"
     READY = "/ready"
 
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Tests import the project packages (ragbase, backend, shared) from the repo root
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+"""Admin endpoints: admin token, or localhost only without one."""
+
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from backend.api.admin import require_admin
+from ragbase.config import Config
+
+
+def _request(host):
+    return SimpleNamespace(client=SimpleNamespace(host=host))
+
+
+def _status(request, token=None):
+    try:
+        require_admin(request, token)
+    except HTTPException as e:
+        return e.status_code
+    return 200
+
+
+def test_without_token_only_localhost_is_served(monkeypatch):
+    monkeypatch.setattr(Config.Admin, "TOKEN", "")
+    assert _status(_request("127.0.0.1")) == 200
+    assert _status(_request("::1")) == 200
+    assert _status(_request("203.0.113.7")) == 403
+    assert _status(SimpleNamespace(client=None)) == 403
+
+
+def test_with_token_every_client_needs_it(monkeypatch):
+    monkeypatch.setattr(Config.Admin, "TOKEN", "s3cret")
+    assert _status(_request("203.0.113.7"), "s3cret") == 200
+    assert _status(_request("127.0.0.1")) == 401
+    assert _status(_request("127.0.0.1"), "wrong") == 401
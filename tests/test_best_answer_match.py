@@ -0,0 +1,76 @@
+"""The rebuild tool's best-answer matchers pick what scoring every answer picked."""
+
+import random
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("qdrant_client")
+
+from backup.maintenance.rebuild_database_improved import ImprovedIngestor
+from benchmarks.best_answer_match import mismatches, reference_find_best_answer_match
+from ragbase.config import Config
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    # Matching needs neither the embedding model nor Qdrant, so skip __init__
+    return ImprovedIngestor.__new__(ImprovedIngestor)
+
+
+@pytest.fixture(scope="module")
+def sample(matcher):
+    df = pd.read_excel(Config.Path.MINI_EXCEL_FILE)
+    answers_lists = [matcher.parse_answers(row) for _, row in df.iterrows()]
+    return [str(value) for value in df['best_answer']], answers_lists
+
+
+def test_sample_dataset_matches_reference(matcher, sample):
+    best_answers, answers_lists = sample
+    expected = [
+        reference_find_best_answer_match(matcher, best, answers)
+        for best, answers in zip(best_answers, answers_lists)
+    ]
+    per_row = [matcher.find_best_answer_match(best, answers) for best, answers in zip(best_answers, answers_lists)]
+    vectorized = matcher.match_best_answers(best_answers, answers_lists)
+
+    assert mismatches(expected, per_row) == []
+    assert mismatches(expected, vectorized) == []
+    assert all(isinstance(index, int) for index, _ in vectorized)
+
+
+@pytest.mark.parametrize("threshold", [0.0, 0.5, 0.8])
+def test_random_rows_match_reference(matcher, threshold):
+    rng = random.Random(7)
+    words = "mình bạn cảm thấy buồn vui lo lắng hãy nghỉ ngơi nhé".split()
+
+    def sentence():
+        return " ".join(rng.choice(words) for _ in range(rng.randint(0, 30)))
+
+    best_answers, answers_lists = [], []
+    for _ in range(500):
+        best = sentence()
+        answers = [sentence() for _ in range(rng.randint(0, 5))]
+        if answers and rng.random() < 0.4:
+            # A near copy of the best answer, so some rows pass the threshold
+            near = best.split()
+            if near:
+                near[rng.randrange(len(near))] = "khác"
+            answers.insert(rng.randint(0, len(answers)), " ".join(near))
+        if answers and rng.random() < 0.2:
+            answers.append(answers[rng.randrange(len(answers))])   # Tie
+        if rng.random() < 0.1:
+            answers.insert(rng.randint(0, len(answers)), best)     # Exact
+        best_answers.append(best)
+        answers_lists.append(answers)
+
+    expected = [
+        reference_find_best_answer_match(matcher, best, answers, threshold)
+        for best, answers in zip(best_answers, answers_lists)
+    ]
+    per_row = [
+        matcher.find_best_answer_match(best, answers, threshold)
+        for best, answers in zip(best_answers, answers_lists)
+    ]
+    assert mismatches(expected, per_row) == []
+    assert mismatches(expected, matcher.match_best_answers(best_answers, answers_lists, threshold)) == []
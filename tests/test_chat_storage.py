@@ -0,0 +1,15 @@
+"""ChatStorage picks its default database from CHAT_DB_PATH."""
+
+from shared.chat_storage import PROJECT_DB_FILE, ChatStorage, default_db_file
+
+
+def test_default_database_follows_chat_db_path(tmp_path, monkeypatch):
+    monkeypatch.delenv("CHAT_DB_PATH", raising=False)
+    assert default_db_file() == PROJECT_DB_FILE
+
+    db_file = str(tmp_path / "chat_history.db")
+    monkeypatch.setenv("CHAT_DB_PATH", db_file)
+    storage = ChatStorage()
+    assert storage.db_file == db_file
+    conversation_id = storage.create_conversation("Chào bạn")
+    assert ChatStorage(db_file).get_conversation(conversation_id)["title"] == "Chào bạn"
@@ -0,0 +1,65 @@
+"""Resending a chat stream request: resume or replay, never a second generation."""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+import backend.api.chat as chat_api
+from backend.models import ChatRequest, StreamChunk
+from backend.services.streaming import StreamRegistry
+
+
+async def _chunks(release: asyncio.Event):
+    yield StreamChunk(type="token", content="Xin ", conversation_id="c1")
+    yield StreamChunk(type="token", content="chào", conversation_id="c1")
+    await release.wait()
+    yield StreamChunk(type="end", content="", conversation_id="c1")
+
+
+async def _events(response) -> list:
+    """(id, data) pairs of an SSE response, without the retry and [DONE] lines"""
+    body = "".join([part async for part in response.body_iterator])
+    events = []
+    for block in body.split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "id" in lines:
+            events.append((int(lines["id"]), lines["data"]))
+    return events
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    registry = StreamRegistry()
+    monkeypatch.setattr(chat_api, "get_stream_registry", lambda: registry)
+
+    def no_new_generation():
+        raise AssertionError("a resend must not start a new generation")
+    monkeypatch.setattr(chat_api, "get_chat_service", no_new_generation)
+    return registry
+
+
+@pytest.mark.asyncio
+async def test_resume_of_unknown_stream_is_gone(registry):
+    request = ChatRequest(message="Chào bạn", message_id="evicted")
+    with pytest.raises(HTTPException) as raised:
+        await chat_api.chat_stream(request, last_event_id=3)
+    assert raised.value.status_code == 410
+
+
+@pytest.mark.asyncio
+async def test_resend_subscribes_to_the_live_stream(registry):
+    release = asyncio.Event()
+    live = registry.start("m1", _chunks(release))
+
+    resent = await chat_api.chat_stream(ChatRequest(message="Chào bạn", message_id="m1"), last_event_id=None)
+    resumed = await chat_api.chat_stream(ChatRequest(message="Chào bạn", message_id="m1"), last_event_id=1)
+    assert registry.get("m1") is live
+
+    release.set()
+    full, tail = await asyncio.gather(_events(resent), _events(resumed))
+    assert [event_id for event_id, _ in full] == [1, 2, 3]
+    assert tail == full[1:]
@@ -0,0 +1,93 @@
+"""The compiled corpus must give the same Documents as streaming the workbook."""
+
+import sys
+
+import pytest
+
+pytest.importorskip("pyarrow")
+openpyxl = pytest.importorskip("openpyxl")
+
+from ragbase.config import Config
+from ragbase.corpus import corpus_path, load_corpus_documents
+from ragbase.utils import (content_point_id, iter_documents_from_excel,
+                           iter_summary_documents_from_excel,
+                           load_documents_from_excel)
+
+
+@pytest.fixture(autouse=True)
+def corpus_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config.Path, "CORPUS_DIR", tmp_path / "corpus")
+
+
+def _as_tuples(documents):
+    return [(doc.page_content, doc.metadata) for doc in documents]
+
+
+def _assert_same_documents(loaded, streamed):
+    assert _as_tuples(loaded) == _as_tuples(streamed)
+    assert [doc.id for doc in loaded] == [content_point_id(doc) for doc in streamed]
+
+
+def test_corpus_matches_streaming_loader():
+    excel_path = Config.Path.MINI_EXCEL_FILE
+    streamed = list(iter_documents_from_excel(excel_path))
+    assert streamed
+
+    compiled = load_corpus_documents(excel_path)   # compiles
+    assert corpus_path(excel_path).exists()
+    mapped = load_corpus_documents(excel_path)     # reads the compiled file back
+    _assert_same_documents(compiled, streamed)
+    _assert_same_documents(mapped, streamed)
+
+
+def test_summary_labels_keep_their_type(tmp_path):
+    excel_path = tmp_path / "summary.xlsx"
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(["question", "summary", "labels"])
+    sheet.append(["q1", "Tóm tắt một", "Cảm xúc"])
+    sheet.append(["q2", "Tóm tắt hai", 3])
+    sheet.append(["q3", "Tóm tắt ba", None])
+    workbook.save(excel_path)
+
+    streamed = list(iter_summary_documents_from_excel(excel_path))
+    loaded = load_corpus_documents(excel_path, summary=True)
+    assert [doc.metadata["labels"] for doc in loaded] == ["Cảm xúc", 3, None]
+    _assert_same_documents(loaded, streamed)
+
+
+def test_changed_workbook_is_recompiled(tmp_path):
+    excel_path = tmp_path / "qa.xlsx"
+    for labels in ("Chữa lành", "Cảm xúc"):
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["question", "answers", "best_answer", "labels"])
+        workbook.active.append(["Câu hỏi?", "['Trả lời']", "Trả lời", labels])
+        workbook.save(excel_path)
+        assert [doc.metadata["labels"] for doc in load_corpus_documents(excel_path)] == [labels]
+
+
+def test_same_named_workbooks_get_their_own_corpus(tmp_path):
+    paths = []
+    for directory, labels in (("a", "Chữa lành"), ("b", "Cảm xúc")):
+        (tmp_path / directory).mkdir()
+        excel_path = tmp_path / directory / "qa.xlsx"
+        workbook = openpyxl.Workbook()
+        workbook.active.append(["question", "answers", "best_answer", "labels"])
+        workbook.active.append(["Câu hỏi?", "['Trả lời']", "Trả lời", labels])
+        workbook.save(excel_path)
+        paths.append(excel_path)
+
+    assert corpus_path(paths[0]) != corpus_path(paths[1])
+    # Alternating loads read each workbook's own file instead of recompiling over the other
+    for _ in range(2):
+        assert [doc.metadata["labels"] for doc in load_corpus_documents(paths[0])] == ["Chữa lành"]
+        assert [doc.metadata["labels"] for doc in load_corpus_documents(paths[1])] == ["Cảm xúc"]
+
+
+def test_without_pyarrow_the_workbook_is_parsed(monkeypatch):
+    monkeypatch.setattr(Config.Corpus, "ENABLED", True)
+    monkeypatch.setitem(sys.modules, "pyarrow", None)  # import pyarrow raises ImportError
+
+    excel_path = Config.Path.MINI_EXCEL_FILE
+    assert _as_tuples(load_documents_from_excel(excel_path)) == _as_tuples(iter_documents_from_excel(excel_path))
+    assert not Config.Path.CORPUS_DIR.exists()
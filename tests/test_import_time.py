@@ -0,0 +1,65 @@
+"""`import backend.main` stays within the import-time budget, with no eager provider imports."""
+
+import pytest
+
+from benchmarks.import_time import (EAGER_FORBIDDEN, IMPORT_BUDGET_SECONDS,
+                                    forbidden_imports, measure,
+                                    parse_importtime, total_seconds)
+
+SAMPLE_STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:       300 |        420 | io
+import time:       274 |        274 |   flashrank
+import time:      2254 |       2630 | ragbase.model
+"""
+
+
+def test_parse_importtime():
+    records = parse_importtime(SAMPLE_STDERR)
+    assert [(r.module, r.depth, r.self_us, r.cumulative_us) for r in records] == [
+        ("_io", 1, 120, 120),
+        ("io", 0, 300, 420),
+        ("flashrank", 1, 274, 274),
+        ("ragbase.model", 0, 2254, 2630),
+    ]
+    assert total_seconds(records) == pytest.approx(0.00305)
+
+
+def test_failed_and_absent_imports_are_not_counted(tmp_path):
+    (tmp_path / "broken_provider.py").write_text('raise ImportError("missing native library")\n')
+    (tmp_path / "probe.py").write_text(
+        "try:\n    import broken_provider\nexcept ImportError:\n    pass\n"
+        "try:\n    import not_installed_provider\nexcept ImportError:\n    pass\n"
+        "import loaded_provider\n"
+    )
+    (tmp_path / "loaded_provider.py").write_text("")
+
+    records, loaded = measure("probe", cwd=str(tmp_path))
+    # -X importtime lists all three attempts...
+    assert {"broken_provider", "not_installed_provider", "loaded_provider"} <= {r.module for r in records}
+    # ...but only the successful one counts as imported
+    forbidden = ("broken_provider", "not_installed_provider", "loaded_provider")
+    assert forbidden_imports(loaded, forbidden) == ["loaded_provider"]
+
+
+@pytest.fixture(scope="module")
+def backend_import():
+    """Best of three `import backend.main` runs"""
+    try:
+        runs = [measure("backend.main") for _ in range(3)]
+    except RuntimeError as e:
+        if "ModuleNotFoundError" in str(e):
+            pytest.skip(f"backend dependencies not installed: {e}")
+        raise
+    return min(runs, key=lambda run: total_seconds(run[0]))
+
+
+def test_backend_has_no_eager_provider_imports(backend_import):
+    _, loaded = backend_import
+    assert forbidden_imports(loaded) == [], f"should load inside the model factories: {EAGER_FORBIDDEN}"
+
+
+def test_backend_import_within_budget(backend_import):
+    records, _ = backend_import
+    assert total_seconds(records) <= IMPORT_BUDGET_SECONDS
@@ -0,0 +1,142 @@
+"""StageLimiter shared by worker threads and coroutines."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from ragbase.limits import StageLimiter, StageTimeout
+
+
+def test_threads_respect_the_limit():
+    limiter = StageLimiter("test", max_concurrent=2)
+    active, peak = 0, 0
+    lock = threading.Lock()
+
+    def work():
+        nonlocal active, peak
+        with limiter:
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert peak == 2
+    assert limiter.metrics()["completed"] == 8
+
+
+@pytest.mark.asyncio
+async def test_coroutine_is_woken_by_thread_release():
+    limiter = StageLimiter("test", max_concurrent=1)
+    release = threading.Event()
+
+    def hold():
+        with limiter:
+            release.wait()
+
+    thread = threading.Thread(target=hold)
+    thread.start()
+    while limiter.metrics()["in_flight"] == 0:
+        await asyncio.sleep(0.001)
+
+    async def enter():
+        async with limiter:
+            return time.monotonic()
+
+    task = asyncio.create_task(enter())
+    await asyncio.sleep(0.05)
+    assert not task.done()
+    released = time.monotonic()
+    release.set()
+    entered = await asyncio.wait_for(task, 1)
+    thread.join()
+    # Woken by the release itself, not by a polling interval
+    assert entered - released < 0.01
+    assert limiter.metrics()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_coroutines_respect_the_limit():
+    limiter = StageLimiter("test", max_concurrent=3)
+    active, peak = 0, 0
+
+    async def work():
+        nonlocal active, peak
+        async with limiter:
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+
+    await asyncio.gather(*(work() for _ in range(20)))
+    assert peak == 3
+    assert limiter.metrics()["completed"] == 20
+
+
+@pytest.mark.asyncio
+async def test_async_timeout_and_cancel_free_their_place():
+    limiter = StageLimiter("test", max_concurrent=1, timeout=0.05)
+    async with limiter:
+        with pytest.raises(StageTimeout):
+            async with limiter:
+                pass
+
+        task = asyncio.create_task(limiter.__aenter__())
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    metrics = limiter.metrics()
+    assert metrics["timeouts"] == 1
+    assert metrics["queue_depth"] == 0
+    # The slot is free again for both kinds of callers
+    with limiter:
+        pass
+    async with limiter:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_slots_go_to_threads_and_coroutines_in_arrival_order():
+    limiter = StageLimiter("test", max_concurrent=1)
+    order = []
+
+    def thread_work(name):
+        with limiter:
+            order.append(name)
+
+    async def coroutine_work(name):
+        async with limiter:
+            order.append(name)
+
+    async def queued(depth):
+        while limiter.metrics()["queue_depth"] < depth:
+            await asyncio.sleep(0.001)
+
+    limiter.__enter__()
+    first = threading.Thread(target=thread_work, args=("thread 1",))
+    first.start()
+    await queued(1)
+    task = asyncio.create_task(coroutine_work("coroutine"))
+    await queued(2)
+    second = threading.Thread(target=thread_work, args=("thread 2",))
+    second.start()
+    await queued(3)
+
+    limiter.__exit__(None, None, None)
+    await asyncio.wait_for(task, 1)
+    first.join()
+    second.join()
+    # Not every coroutine ahead of every thread
+    assert order == ["thread 1", "coroutine", "thread 2"]
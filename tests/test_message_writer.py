@@ -0,0 +1,94 @@
+"""Write-behind message queue: order, read-your-writes, shutdown drain and failed commits."""
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from backend.services.conversation_service import ConversationService
+from backend.services.message_writer import MessageWriteQueue, QueuedMessage
+from shared.chat_storage import ChatStorage
+
+# Long enough that nothing is committed before a flush or stop asks for it
+SLOW_INTERVAL_MS = 60_000
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return ChatStorage(db_file=str(tmp_path / "chat_history.db"))
+
+
+def _contents(storage, conversation_id):
+    return [message["content"] for message in storage.get_conversation_messages(conversation_id)]
+
+
+def test_messages_are_committed_in_queue_order(storage):
+    first, second = storage.create_conversation("a"), storage.create_conversation("b")
+    writer = MessageWriteQueue(storage, interval_ms=SLOW_INTERVAL_MS)
+    writer.start()
+    for i in range(5):
+        writer.put(QueuedMessage(first, "user", f"a{i}", message_id=f"a{i}"))
+        writer.put(QueuedMessage(second, "assistant", f"b{i}", message_id=f"b{i}"))
+
+    assert writer.flush(timeout=5)
+    assert writer.pending == 0
+    assert _contents(storage, first) == [f"a{i}" for i in range(5)]
+    assert _contents(storage, second) == [f"b{i}" for i in range(5)]
+    writer.stop()
+
+
+def test_reads_flush_queued_messages_first(tmp_path):
+    service = ConversationService(db_file=str(tmp_path / "chat_history.db"))
+    service.writer.interval = SLOW_INTERVAL_MS / 1000
+    conversation_id = service.create_conversation("Chào bạn")
+
+    assert service.save_message(conversation_id, "user", "Xin chào")
+    assert service.save_message(conversation_id, "assistant", "Chào bạn")
+
+    assert [m["content"] for m in service.get_conversation_messages(conversation_id)] == ["Xin chào", "Chào bạn"]
+    assert len(service.get_conversation(conversation_id).messages) == 2
+    service.close()
+
+
+def test_stop_drains_the_queue(storage):
+    conversation_id = storage.create_conversation()
+    writer = MessageWriteQueue(storage, interval_ms=SLOW_INTERVAL_MS)
+    writer.start()
+    for i in range(3):
+        writer.put(QueuedMessage(conversation_id, "user", str(i)))
+
+    writer.stop(timeout=5)
+    assert _contents(storage, conversation_id) == ["0", "1", "2"]
+    # Once stopped, messages are written through
+    writer.put(QueuedMessage(conversation_id, "assistant", "3"))
+    assert _contents(storage, conversation_id) == ["0", "1", "2", "3"]
+
+
+class FlakyStorage:
+    """Fails every group commit while `broken`"""
+
+    def __init__(self, storage):
+        self.storage = storage
+        self.broken = True
+
+    def save_messages(self, messages):
+        if self.broken:
+            raise RuntimeError("database is locked")
+        self.storage.save_messages(messages)
+
+
+def test_failed_commit_is_reported_and_retried_in_order(storage):
+    conversation_id = storage.create_conversation()
+    flaky = FlakyStorage(storage)
+    writer = MessageWriteQueue(flaky, interval_ms=10)
+    writer.start()
+    writer.put(QueuedMessage(conversation_id, "user", "0", message_id="m0"))
+
+    assert not writer.flush(timeout=5)
+    assert writer.pending == 1
+
+    flaky.broken = False
+    writer.put(QueuedMessage(conversation_id, "assistant", "1", message_id="m1"))
+    assert writer.flush(timeout=5)
+    assert writer.pending == 0
+    assert _contents(storage, conversation_id) == ["0", "1"]
+    writer.stop()
@@ -0,0 +1,98 @@
+"""ThinkTagFilter against the regex it replaced, over every chunk split."""
+
+import re
+
+import pytest
+
+from ragbase.stream_filter import ThinkTagFilter
+
+CLOSED_SPANS = [
+    "<think>lý do</think>Câu trả lời",
+    "Mở đầu <think>suy nghĩ\nnhiều dòng</think> kết thúc",
+    "a<think>1</think>b<think>2</think>c",
+    "x < y và <b>đậm</b> <thin k> </think> z",
+    "<think></think>",
+    "<<think>>x</think>>",
+]
+
+
+def strip_think(text: str) -> str:
+    """The previous non-streaming behavior, for closed spans"""
+    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL)
+
+
+def run(chunks) -> str:
+    think_filter = ThinkTagFilter()
+    return "".join(think_filter.feed(chunk) for chunk in chunks) + think_filter.flush()
+
+
+def splits(text: str):
+    """Two-chunk splits at every offset, plus one chunk per character"""
+    for offset in range(len(text) + 1):
+        yield [text[:offset], text[offset:]]
+    yield list(text)
+
+
+@pytest.mark.parametrize("text", CLOSED_SPANS)
+def test_tags_split_at_every_offset(text):
+    expected = strip_think(text)
+    for chunks in splits(text):
+        assert run(chunks) == expected, chunks
+
+
+def test_three_chunk_splits():
+    text = "trước<think>ẩn</think>sau"
+    expected = strip_think(text)
+    for first in range(len(text) + 1):
+        for second in range(first, len(text) + 1):
+            chunks = [text[:first], text[first:second], text[second:]]
+            assert run(chunks) == expected, chunks
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("câu trả lời<think>suy nghĩ chưa xong", "câu trả lời"),
+    ("<think>", ""),
+    ("a<think>b</think>c<think>d", "ac"),
+])
+def test_unclosed_span_is_dropped(text, expected):
+    for chunks in splits(text):
+        assert run(chunks) == expected, chunks
+
+
+def test_nested_open_tag_closes_at_first_close():
+    text = "<think>a<think>b</think>c</think>d"
+    assert strip_think(text) == "c</think>d"
+    for chunks in splits(text):
+        assert run(chunks) == "c</think>d", chunks
+
+
+def test_partial_open_tag_at_end_is_text():
+    for text in ("kết thúc <", "kết thúc <thi", "kết thúc <think"):
+        for chunks in splits(text):
+            assert run(chunks) == text, chunks
+
+
+def test_pass_through_is_immediate():
+    think_filter = ThinkTagFilter()
+    assert think_filter.feed("Xin chào, ") == "Xin chào, "
+    assert think_filter.feed("  ") == "  "
+    assert think_filter.feed("1 < 2") == "1 < 2"
+    assert think_filter.feed(" và 3 <") == " và 3 "   # "<" could start a tag
+    assert think_filter.feed("= 4") == "<= 4"
+    assert think_filter.flush() == ""
+
+
+def test_inside_span_yields_nothing_until_close():
+    think_filter = ThinkTagFilter()
+    assert think_filter.feed("<think>") == ""
+    assert think_filter.feed("suy nghĩ") == ""
+    assert think_filter.feed("</thi") == ""
+    assert think_filter.feed("nk>trả lời") == "trả lời"
+
+
+def test_flush_resets_state():
+    think_filter = ThinkTagFilter()
+    think_filter.feed("<think>chưa đóng")
+    assert think_filter.flush() == ""
+    assert think_filter.feed("mới") == "mới"
+    assert think_filter.flush() == ""
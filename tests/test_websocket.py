@@ -0,0 +1,54 @@
+"""Malformed frames and closed sockets must not take the chat WebSocket down."""
+
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import WebSocketDisconnect
+
+import backend.api.websocket as websocket_api
+from backend.models import ChatRequest
+
+
+class FakeWebSocket:
+    def __init__(self, frames=(), closed=False):
+        self.frames = list(frames)
+        self.closed = closed
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        if not self.frames:
+            raise WebSocketDisconnect(1000)
+        return self.frames.pop(0)
+
+    async def send_text(self, text):
+        if self.closed:
+            raise RuntimeError('Cannot call "send" once a close message has been sent.')
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_bad_frames_get_an_error_and_the_socket_stays_open():
+    socket = FakeWebSocket(["not json", "[1, 2]", "null", json.dumps({"type": "ping", "request_id": "r1"})])
+    await websocket_api.chat_websocket(socket)
+
+    assert [frame["type"] for frame in socket.sent] == ["error"] * 4
+    assert all(frame["content"].startswith("Invalid frame") for frame in socket.sent[:3])
+    # The frame after the bad ones was still read and answered
+    assert socket.sent[3] == {**socket.sent[3], "request_id": "r1", "content": "Unknown frame type: ping"}
+
+
+@pytest.mark.asyncio
+async def test_error_after_disconnect_is_not_raised(monkeypatch):
+    def broken_service():
+        raise RuntimeError("models unavailable")
+    monkeypatch.setattr(websocket_api, "get_chat_service", broken_service)
+
+    connection = websocket_api._ChatConnection(FakeWebSocket(closed=True))
+    await connection._run("r1", ChatRequest(message="Chào bạn"))
+    assert connection.tasks == {}